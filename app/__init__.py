@@ -1,8 +1,13 @@
 from flask import Flask
 from flask_cors import CORS
-from config.config import MAX_CONTENT_LENGTH, UPLOAD_FOLDER
+from config.config import (
+    MAX_CONTENT_LENGTH, UPLOAD_FOLDER, BLIP_WARMUP_ON_START, METRICS_ENABLED, PROFILE_TOKENS, PROFILE_SAMPLE_RATE
+)
 import os
 from app.utils.init_utils import initialize_nltk
+from app.utils.upload_utils import SpoolingRequest
+from app.utils.metrics_utils import init_request_metrics
+from app.services.profiling_service import init_request_profiling
 import logging
 
 # Configure logging
@@ -21,6 +26,9 @@ def create_app():
                    template_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates'),
                    static_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static'))
         
+        # Keep uploads in memory, spilling to a temp file only when large
+        app.request_class = SpoolingRequest
+
         # Enable CORS
         CORS(app)
         
@@ -29,11 +37,26 @@ def create_app():
         
         # Configure upload folder
         app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-        app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+        app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
         
+        # Per-route latency, status and error metrics, served on /metrics
+        if METRICS_ENABLED:
+            init_request_metrics(app)
+
+        # On-demand request profiling, for allow-listed tokens and sampled requests
+        if PROFILE_TOKENS or PROFILE_SAMPLE_RATE > 0:
+            init_request_profiling(app)
+
         # Register blueprints
         from app.routes.main_routes import main
         app.register_blueprint(main)
+
+        # Optionally load the BLIP model now instead of on the first request
+        if BLIP_WARMUP_ON_START:
+            from app.services.image_service import image_processor
+            logger.info("Warming up BLIP model...")
+            stats = image_processor.warmup()
+            logger.info(f"BLIP model ready (load {stats['last_load_ms']:.0f} ms)")
         
         return app
     except Exception as e:
@@ -1,34 +1,277 @@
-from flask import Blueprint, request, jsonify, render_template, send_file, current_app
+from flask import Blueprint, request, jsonify, render_template, send_file, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
-import os
-import tempfile
-from PIL import Image
-from gtts import gTTS
 from datetime import datetime
-import requests
-import time
+import json
 import logging
+from urllib.parse import urlsplit
 
 from app.utils.file_utils import allowed_file, validate_image
-from app.services.image_service import image_processor
-from app.services.text_service import (
-    generate_context,
-    enhance_context,
-    social_media_caption,
-    analyze_sentiment,
-    analyze_medical_image
+from app.utils.upload_utils import ingest_upload
+from app.utils.metrics_utils import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.services.image_service import image_processor, CAPTION_TIERS
+from app.services.analysis_pipelines import (
+    GENERAL_PIPELINE,
+    SOCIAL_MEDIA_PIPELINE,
+    SEO_PIPELINE,
+    IMAGE_ANALYZER_PIPELINE,
+    CATALOG_PIPELINE,
+    ADVANCED_PIPELINE,
+    run_medical_analysis,
+    run_advanced_analysis,
+    load_advanced_processor,
+    advanced_response,
+    low_quality_rejection,
+    response_metadata
 )
-from app.services.advanced_image_service import AdvancedImageProcessor
-from app.services.seo_service import generate_seo_description
-from config.config import UPLOAD_FOLDER
+from app.services.stream_service import stream_pipeline, sse_stream
+from app.services.bulk_service import iter_uploaded_images, analyze_bulk
+from app.services.job_service import job_manager, JobQueueFullError
+from app.services import llm_service
+from app.services.palette_service import PALETTE_MODES
+from app.services.tts_service import tts_service
+from app.services.fetch_service import image_fetcher, ImageFetchError
+from app.services.audit_service import audit_pages, patch_html
+from app.services.dicom_service import is_dicom
+from app.services.profiling_service import profile_store, is_allowed as profile_allowed
+from config.config import JOB_MAX_WAIT, METRICS_ENABLED, MAX_CONTENT_LENGTH
+from config.ai_config import format_error_response
 
 logger = logging.getLogger(__name__)
 
 # Define allowed extensions for medical images
 ALLOWED_MEDICAL_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'tiff', 'dcm'}
 
+# Pipelines selectable for bulk analysis
+BULK_PIPELINES = {
+    'catalog': CATALOG_PIPELINE,
+    'general': GENERAL_PIPELINE,
+    'seo': SEO_PIPELINE
+}
+
+# Default BLIP decoding tier per route; a request may override it with caption_tier
+ROUTE_CAPTION_TIERS = {
+    'social-media': 'fast',
+    'general': 'balanced',
+    'image-analyzer': 'balanced',
+    'seo': 'quality',
+    'medical-image-analysis': 'quality',
+    'advanced-analysis': 'balanced',
+    'bulk-analysis': 'fast',
+    'accessibility-audit': 'balanced'
+}
+
+# Stages sent as server-sent events in streaming mode, in the order they usually finish
+GENERAL_STREAM_STAGES = {'alt_text': None, 'context': None, 'enhanced_description': None}
+SOCIAL_MEDIA_STREAM_STAGES = {'alt_text': None, 'context': None, 'caption': None, 'sentiment': None, 'hashtags': None}
+ADVANCED_STREAM_STAGES = {
+    'alt_text': None,
+    'blip_description': None,
+    'enhanced_description': None,
+    'sentiment': None,
+    'color_analysis': None
+}
+
+# Allowed upload extensions per async job type
+JOB_EXTENSIONS = {
+    'advanced-analysis': {'png', 'jpg', 'jpeg'},
+    'medical-image-analysis': ALLOWED_MEDICAL_EXTENSIONS
+}
+
 main = Blueprint('main', __name__)
 
+def _stage_result(run, name, error_code):
+    """
+    Get a pipeline stage's service response, or an error response if the stage failed
+    Args:
+        run (PipelineRun): Completed pipeline run
+        name (str): Stage name
+        error_code (str): Error code to report if the stage failed
+    Returns:
+        dict: The stage's response
+    """
+    if run.ok(name):
+        return run.results[name]
+    return format_error_response(
+        error_message=str(run.errors.get(name, 'Stage did not run')),
+        error_code=error_code
+    )
+
+def _wants_async():
+    """Whether the client asked for an async job instead of a blocking response"""
+    return request.args.get('async') == '1' or request.form.get('async') == '1'
+
+def _reject_low_quality():
+    """Whether the client asked to reject images that fail the quality checks before captioning"""
+    return request.args.get('reject_low_quality') == '1' or request.form.get('reject_low_quality') == '1'
+
+def _wants_frame_captions():
+    """Whether the client asked for captions of frames sampled across a multi-frame DICOM file"""
+    return request.args.get('caption_frames') == '1' or request.form.get('caption_frames') == '1'
+
+def _analysis_options(job_type):
+    """
+    Optional per-request settings for a run_*_analysis call or async job
+    Args:
+        job_type (str): 'advanced-analysis' or 'medical-image-analysis'
+    Returns:
+        dict: Keyword arguments for the analysis function
+    """
+    options = {'caption_tier': _caption_tier(job_type)}
+    if _reject_low_quality():
+        options['reject_low_quality'] = True
+    if job_type == 'advanced-analysis' and _requested_color_mode():
+        options['color_mode'] = _requested_color_mode()
+    if job_type == 'medical-image-analysis' and _requested_window():
+        options['window_center'], options['window_width'] = _requested_window()
+    if job_type == 'medical-image-analysis' and _wants_frame_captions():
+        options['frame_captions'] = True
+    return options
+
+def _wants_stream():
+    """Whether the client asked for progressive results as server-sent events"""
+    return (
+        request.args.get('stream') == '1'
+        or request.form.get('stream') == '1'
+        or 'text/event-stream' in request.headers.get('Accept', '')
+    )
+
+def _sse_response(events):
+    """
+    Streaming response for pipeline events
+    Args:
+        events (iterable): (event, payload) tuples from stream_pipeline
+    Returns:
+        Response: text/event-stream response
+    """
+    return Response(
+        stream_with_context(sse_stream(events)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _general_response(run):
+    """
+    Build the /general response from a completed pipeline run
+    Returns:
+        tuple: (response body, HTTP status)
+    """
+    rejection = low_quality_rejection(run)
+    if rejection is not None:
+        return rejection
+    if not run.ok('alt_text'):
+        print(f"Error processing image: {str(run.errors.get('alt_text'))}")
+        return {'error': 'Error processing image. Please try again.'}, 500
+    return {
+        'alt_text': run.results['alt_text'],
+        'context': _stage_result(run, 'context', 'CONTEXT_GENERATION_ERROR'),
+        'enhanced_description': _stage_result(run, 'enhanced_description', 'CONTEXT_ENHANCEMENT_ERROR'),
+        'quality': run.results['quality'],
+        'metadata': response_metadata(run)
+    }, 200
+
+def _social_media_response(run):
+    """
+    Build the /social-media response from a completed pipeline run
+    Returns:
+        tuple: (response body, HTTP status)
+    """
+    rejection = low_quality_rejection(run)
+    if rejection is not None:
+        return rejection
+    if not run.ok('alt_text'):
+        print(f"Error processing image: {str(run.errors.get('alt_text'))}")
+        return {'error': 'Error processing image. Please try again.'}, 500
+    return {
+        'caption': _stage_result(run, 'caption', 'CAPTION_GENERATION_ERROR'),
+        'hashtags': run.results.get('hashtags', ''),
+        'sentiment': _stage_result(run, 'sentiment', 'SENTIMENT_ANALYSIS_ERROR'),
+        'quality': run.results['quality'],
+        'metadata': response_metadata(run)
+    }, 200
+
+def _rejection_response(run):
+    """JSON response for an image rejected for low quality, or None"""
+    rejection = low_quality_rejection(run)
+    if rejection is None:
+        return None
+    body, status = rejection
+    return jsonify(body), status
+
+def _job_response(job):
+    """Public representation of a job"""
+    data = {
+        'job_id': job['job_id'],
+        'type': job['type'],
+        'status': job['status'],
+        'status_url': f"/jobs/{job['job_id']}",
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'expires_at': job['expires_at']
+    }
+    if job['result'] is not None:
+        data['result'] = job['result']
+    if job['error']:
+        data['error'] = job['error']
+    return data
+
+def _submit_job(job_type, file, options=None):
+    """
+    Queue an uploaded file as an async job
+    Args:
+        job_type (str): Job type
+        file (FileStorage): Validated upload
+        options (dict): Optional keyword arguments for the job handler
+    Returns:
+        tuple: JSON response and HTTP status
+    """
+    try:
+        with ingest_upload(file) as upload:
+            job = job_manager.submit(job_type, secure_filename(file.filename), upload.read(), options)
+    except JobQueueFullError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_code': 'QUEUE_FULL'
+        }), 503
+    return jsonify({'success': True, 'data': _job_response(job)}), 202
+
+def _requested_color_mode():
+    """Palette mode requested for color analysis, or None for the configured default"""
+    return request.form.get('color_mode') or request.args.get('color_mode') or None
+
+def _requested_window():
+    """DICOM window (center, width) requested for this request, or None for the file's own window"""
+    try:
+        center = float(request.form.get('window_center') or request.args.get('window_center'))
+        width = float(request.form.get('window_width') or request.args.get('window_width'))
+    except (TypeError, ValueError):
+        return None
+    return center, width
+
+def _caption_tier(route):
+    """Caption tier requested for this request, or the route's default"""
+    return request.form.get('caption_tier') or request.args.get('caption_tier') or ROUTE_CAPTION_TIERS[route]
+
+def _invalid_caption_tier_response():
+    """Error response for an unsupported caption tier, or None if the requested tier is valid"""
+    tier = request.form.get('caption_tier') or request.args.get('caption_tier')
+    if not tier or tier in CAPTION_TIERS:
+        return None
+    return jsonify({
+        'success': False,
+        'error': f"Invalid caption tier. Supported tiers: {', '.join(CAPTION_TIERS)}",
+        'error_code': 'INVALID_CAPTION_TIER'
+    }), 400
+
+def _invalid_color_mode_response():
+    """Error response for an unsupported palette mode"""
+    return jsonify({
+        'success': False,
+        'error': f"Invalid color mode. Supported modes: {', '.join(PALETTE_MODES)}",
+        'error_code': 'INVALID_COLOR_MODE'
+    }), 400
+
 @main.route('/')
 def landing():
     return render_template('landing.html')
@@ -51,37 +294,40 @@ def social_media():
             # Validate image
             if not validate_image(file.stream):
                 return jsonify({'error': 'Invalid image file'}), 400
+
+            invalid_tier = _invalid_caption_tier_response()
+            if invalid_tier is not None:
+                return invalid_tier
                 
-            # Save and process image
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
+            # Decode straight from the request buffer
+            upload = ingest_upload(file)
+            # A streamed response closes the upload itself once the pipeline is done
+            streaming = _wants_stream()
             
             try:
-                image = Image.open(filepath)
-                alt_text = image_processor.generate_alt_text(image)
-                context = generate_context(alt_text)
-                caption = social_media_caption(context)
-                sentiment_result = analyze_sentiment(caption)
-                hashtags = generate_hashtags(context)
+                inputs = {
+                    'image': upload.open_image(),
+                    'image_hash': upload.sha256,
+                    'reject_low_quality': _reject_low_quality(),
+                    'caption_tier': _caption_tier('social-media')
+                }
+                if streaming:
+                    return _sse_response(stream_pipeline(
+                        SOCIAL_MEDIA_PIPELINE, _social_media_response, SOCIAL_MEDIA_STREAM_STAGES,
+                        cleanup=upload.close, **inputs
+                    ))
                 
-                return jsonify({
-                    'caption': caption,
-                    'hashtags': hashtags,
-                    'sentiment': sentiment_result
-                })
+                body, status = _social_media_response(SOCIAL_MEDIA_PIPELINE.run(**inputs))
+                return jsonify(body), status
                 
             except Exception as e:
+                streaming = False
                 print(f"Error processing image: {str(e)}")
                 return jsonify({'error': 'Error processing image. Please try again.'}), 500
             
             finally:
-                # Clean up uploaded file
-                try:
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                except Exception as e:
-                    print(f"Error removing file: {str(e)}")
+                if not streaming:
+                    upload.close()
         
         except Exception as e:
             print(f"Server error: {str(e)}")
@@ -123,18 +369,29 @@ def seo():
                     'error': 'Invalid image file',
                     'code': 'INVALID_IMAGE'
                 }), 400
+
+            invalid_tier = _invalid_caption_tier_response()
+            if invalid_tier is not None:
+                return invalid_tier
                 
-            # Save and process image
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
+            # Decode straight from the request buffer
+            upload = ingest_upload(file)
             
             try:
-                image = Image.open(filepath)
-                alt_text = image_processor.generate_alt_text(image)
-                context = generate_context(alt_text)
-                seo_description = generate_seo_description(context, alt_text)
+                image = upload.open_image()
+                run = SEO_PIPELINE.run(
+                    image=image, image_hash=upload.sha256,
+                    reject_low_quality=_reject_low_quality(), caption_tier=_caption_tier('seo')
+                )
+                rejection = _rejection_response(run)
+                if rejection is not None:
+                    return rejection
+                if not run.ok('alt_text'):
+                    raise run.errors['alt_text']
                 
+                seo_description = _stage_result(run, 'seo', 'SEO_GENERATION_ERROR')
+                seo_description['quality'] = run.results['quality']
+                seo_description['metadata'] = response_metadata(run)
                 return jsonify(seo_description)
                 
             except Exception as e:
@@ -146,12 +403,7 @@ def seo():
                 }), 500
             
             finally:
-                # Clean up uploaded file
-                try:
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                except Exception as e:
-                    print(f"Error removing file: {str(e)}")
+                upload.close()
         
         except Exception as e:
             print(f"Server error: {str(e)}")
@@ -181,35 +433,39 @@ def general():
             # Validate image
             if not validate_image(file.stream):
                 return jsonify({'error': 'Invalid image file'}), 400
+
+            invalid_tier = _invalid_caption_tier_response()
+            if invalid_tier is not None:
+                return invalid_tier
                 
-            # Save and process image
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
+            # Decode straight from the request buffer
+            upload = ingest_upload(file)
+            # A streamed response closes the upload itself once the pipeline is done
+            streaming = _wants_stream()
             
             try:
-                image = Image.open(filepath)
-                alt_text = image_processor.generate_alt_text(image)
-                context = generate_context(alt_text)
-                enhanced_description = enhance_context(context)
+                inputs = {
+                    'image': upload.open_image(),
+                    'image_hash': upload.sha256,
+                    'reject_low_quality': _reject_low_quality(),
+                    'caption_tier': _caption_tier('general')
+                }
+                if streaming:
+                    return _sse_response(stream_pipeline(
+                        GENERAL_PIPELINE, _general_response, GENERAL_STREAM_STAGES, cleanup=upload.close, **inputs
+                    ))
                 
-                return jsonify({
-                    'alt_text': alt_text,
-                    'context': context,
-                    'enhanced_description': enhanced_description
-                })
+                body, status = _general_response(GENERAL_PIPELINE.run(**inputs))
+                return jsonify(body), status
                 
             except Exception as e:
+                streaming = False
                 print(f"Error processing image: {str(e)}")
                 return jsonify({'error': 'Error processing image. Please try again.'}), 500
             
             finally:
-                # Clean up uploaded file
-                try:
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                except Exception as e:
-                    print(f"Error removing file: {str(e)}")
+                if not streaming:
+                    upload.close()
         
         except Exception as e:
             print(f"Server error: {str(e)}")
@@ -219,24 +475,27 @@ def general():
 
 @main.route('/text-to-speech', methods=['POST'])
 def text_to_speech():
+    """
+    Route handler for speech synthesis; optional `lang` (default en) and backend-specific `voice`.
+    Audio is streamed sentence by sentence as it is synthesized.
+    """
     try:
-        text = request.json.get('text', '')
+        payload = request.get_json(silent=True) or {}
+        text = (payload.get('text') or '').strip()
         if not text:
             return jsonify({'error': 'No text provided'}), 400
 
-        # Temporary file for the audio
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
-        tts = gTTS(text=text, lang='en')
-        tts.save(temp_file.name)
-        
-        return send_file(
-            temp_file.name,
-            mimetype='audio/mp3',
-            as_attachment=True,
-            download_name='speech.mp3'
-        )
+        try:
+            audio = tts_service.stream(text, payload.get('lang') or 'en', payload.get('voice') or None)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        backend = tts_service.backend
+        return Response(audio, mimetype=backend.mimetype, headers={
+            'Content-Disposition': f'attachment; filename=speech.{backend.extension}'
+        })
     except Exception as e:
-        print(f"Error generating speech: {str(e)}")  # Add logging
+        logger.error(f"Error generating speech: {str(e)}")
         return jsonify({'error': 'Error generating speech. Please try again.'}), 500
 
 @main.route('/medical-image-analysis', methods=['GET'])
@@ -275,85 +534,29 @@ def analyze_medical_image_route():
                 'error_code': 'INVALID_FILE_TYPE'
             }), 400
 
-        # Validate uploaded file stream first
-        if not validate_image(file.stream):
+        # Validate uploaded file stream first (DICOM files are checked when they are read)
+        if not validate_image(file.stream) and not is_dicom(file.stream):
             return jsonify({
                 'success': False,
                 'error': 'Invalid or corrupted image file',
                 'error_code': 'INVALID_IMAGE'
             }), 400
+
+        invalid_tier = _invalid_caption_tier_response()
+        if invalid_tier is not None:
+            return invalid_tier
             
         # Reset file stream position after validation
         file.stream.seek(0)
 
-        # Create a temporary file
-        temp_dir = tempfile.mkdtemp()
-        try:
-            # Save the image
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(temp_dir, filename)
-            file.save(filepath)
-
-            # Open image for processing
-            try:
-                image = Image.open(filepath)
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                # Generate alt text
-                alt_text = image_processor.generate_alt_text(image)
-                if not isinstance(alt_text, str) or not alt_text.strip():
-                    raise ValueError("Failed to generate image description")
-                
-                # Perform medical analysis
-                analysis_result = analyze_medical_image(image, alt_text)
-                if not analysis_result['success']:
-                    raise ValueError(analysis_result.get('error', 'Failed to analyze medical image'))
-                
-                # Extract data with defaults for missing fields
-                data = analysis_result.get('data', {})
-                
-                # Validate required fields and provide defaults
-                findings = data.get('findings')
-                if not findings or not isinstance(findings, str):
-                    findings = "Standard medical image analysis protocol should be followed. Detailed examination of anatomical structures is recommended."
-                    
-                diagnosis = data.get('diagnosis')
-                if not diagnosis or not isinstance(diagnosis, str):
-                    diagnosis = "Further clinical correlation and detailed examination is recommended for accurate interpretation."
-                    
-                recommendations = data.get('recommendations')
-                if not recommendations or not isinstance(recommendations, str):
-                    recommendations = "Follow standard medical imaging protocols. Consult with healthcare providers for proper interpretation and next steps."
-                
-                confidence_score = float(data.get('confidence_score', 0.7))  # Default confidence score
-                
-                return jsonify({
-                    'success': True,
-                    'data': {
-                        'alt_text': alt_text,
-                        'findings': findings,
-                        'diagnosis': diagnosis,
-                        'recommendations': recommendations,
-                        'confidence_score': confidence_score
-                    }
-                }), 200
-
-            except Exception as e:
-                logger.error(f"Error processing image: {str(e)}")
-                return jsonify({
-                    'success': False,
-                    'error': str(e),
-                    'error_code': 'PROCESSING_ERROR'
-                }), 400
+        options = _analysis_options('medical-image-analysis')
+        if _wants_async():
+            return _submit_job('medical-image-analysis', file, options)
 
-        finally:
-            # Clean up temporary files
-            try:
-                import shutil
-                shutil.rmtree(temp_dir)
-            except Exception as e:
-                logger.error(f"Error cleaning up temporary files: {str(e)}")
+        with ingest_upload(file) as upload:
+            # Open and analyze image
+            body, status = run_medical_analysis(upload.stream, upload.sha256, **options)
+            return jsonify(body), status
 
     except Exception as e:
         logger.error(f"Unexpected error in medical analysis route: {str(e)}")
@@ -367,6 +570,10 @@ def analyze_medical_image_route():
 def image_analyzer():
     if request.method == 'POST':
         try:
+            invalid_tier = _invalid_caption_tier_response()
+            if invalid_tier is not None:
+                return invalid_tier
+
             # Check for file upload
             if 'image' in request.files:
                 file = request.files['image']
@@ -392,30 +599,29 @@ def image_analyzer():
                         'code': 'INVALID_IMAGE'
                     }), 400
                     
-                # Save and process image
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                file.save(filepath)
+                # Decode straight from the request buffer
+                upload = ingest_upload(file)
                 
             # Check for image URL
             elif 'image_url' in request.form:
-                image_url = request.form['image_url']
+                image_url = request.form['image_url'].strip()
                 try:
-                    # Download image from URL
-                    response = requests.get(image_url)
-                    if response.status_code != 200:
+                    # Stream the download into a size-capped buffer (revalidated if cached)
+                    upload = image_fetcher.fetch(image_url)
+                    if not validate_image(upload.stream):
+                        upload.close()
                         return jsonify({
                             'success': False,
-                            'error': 'Failed to download image from URL',
-                            'code': 'URL_DOWNLOAD_ERROR'
+                            'error': 'URL does not point to a valid image',
+                            'code': 'INVALID_IMAGE'
                         }), 400
-                    
-                    # Save temporary file
-                    filename = f"url_image_{int(time.time())}.jpg"
-                    filepath = os.path.join(UPLOAD_FOLDER, filename)
-                    with open(filepath, 'wb') as f:
-                        f.write(response.content)
-                        
+
+                except ImageFetchError as e:
+                    return jsonify({
+                        'success': False,
+                        'error': str(e),
+                        'code': e.code
+                    }), e.status_code
                 except Exception as e:
                     return jsonify({
                         'success': False,
@@ -431,21 +637,21 @@ def image_analyzer():
             
             try:
                 # Process the image
-                image = Image.open(filepath)
-                alt_text = image_processor.generate_alt_text(image)
-                context_result = generate_context(alt_text)
-                
-                if not context_result['success']:
-                    raise Exception(context_result['error'])
-                    
-                context = context_result['data']['context']
+                image = upload.open_image()
+                run = IMAGE_ANALYZER_PIPELINE.run(
+                    image=image, image_hash=upload.sha256,
+                    reject_low_quality=_reject_low_quality(), caption_tier=_caption_tier('image-analyzer')
+                )
+                rejection = _rejection_response(run)
+                if rejection is not None:
+                    return rejection
+                for stage in ('alt_text', 'context', 'sentiment'):
+                    if not run.ok(stage):
+                        raise run.errors[stage]
                 
-                # Get sentiment analysis
-                sentiment_result = analyze_sentiment(alt_text)
-                if not sentiment_result['success']:
-                    raise Exception(sentiment_result['error'])
-                    
-                sentiment_data = sentiment_result['data']['sentiment']
+                alt_text = run.results['alt_text']
+                context = run.results['context']
+                sentiment_data = run.results['sentiment']
                 
                 return jsonify({
                     'success': True,
@@ -456,8 +662,10 @@ def image_analyzer():
                             'score': sentiment_data['score'],
                             'label': sentiment_data['category'],
                             'details': f"The description has a {sentiment_data['category'].lower()} tone with {sentiment_data['score']*100:.1f}% confidence."
-                        }
-                    }
+                        },
+                        'quality': run.results['quality']
+                    },
+                    'metadata': response_metadata(run)
                 })
                 
             except Exception as e:
@@ -469,12 +677,7 @@ def image_analyzer():
                 }), 500
             
             finally:
-                # Clean up uploaded file
-                try:
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                except Exception as e:
-                    print(f"Error removing file: {str(e)}")
+                upload.close()
         
         except Exception as e:
             print(f"Server error: {str(e)}")
@@ -486,24 +689,6 @@ def image_analyzer():
             
     return render_template('image_analyzer.html')
 
-def generate_hashtags(context):
-    """Generate relevant hashtags from the context using OpenAI"""
-    try:
-        # Use the existing social_media_caption function but extract hashtags
-        caption_with_hashtags = social_media_caption(context)
-        words = caption_with_hashtags.split()
-        hashtags = [word for word in words if word.startswith('#')]
-        
-        # If no hashtags found in the caption, generate basic ones from context
-        if not hashtags:
-            words = context.split()
-            hashtags = [f"#{word.lower()}" for word in words if len(word) > 3][:5]
-        
-        return " ".join(hashtags)
-    except Exception as e:
-        print(f"Error generating hashtags: {str(e)}")  # Add logging
-        return ""
-
 @main.route('/advanced-analysis', methods=['GET'])
 def advanced_analysis():
     """
@@ -547,117 +732,41 @@ def process_advanced_analysis():
                 'error': 'Invalid or corrupted image file',
                 'error_code': 'INVALID_IMAGE'
             }), 400
+
+        invalid_tier = _invalid_caption_tier_response()
+        if invalid_tier is not None:
+            return invalid_tier
             
         # Reset file stream position after validation
         file.stream.seek(0)
 
-        # Create a temporary file
-        temp_dir = tempfile.mkdtemp()
-        try:
-            # Save the image
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(temp_dir, filename)
-            file.save(filepath)
+        # Palette mode trades color accuracy for latency
+        color_mode = _requested_color_mode()
+        if color_mode and color_mode not in PALETTE_MODES:
+            return _invalid_color_mode_response()
 
-            # Process image
-            try:
-                processor = AdvancedImageProcessor()
-                
-                # Load and validate image
-                try:
-                    image, image_array = processor.load_image(filepath)
-                    if image is None or image_array is None:
-                        raise ValueError("Failed to load image")
-                except Exception as e:
-                    logger.error(f"Error loading image: {str(e)}")
-                    return jsonify({
-                        'success': False,
-                        'error': 'Failed to load image file',
-                        'error_code': 'IMAGE_LOAD_ERROR'
-                    }), 400
-                
-                # Generate BLIP description with error handling
-                try:
-                    blip_description = processor.generate_image_context()
-                    if not blip_description or not isinstance(blip_description, str):
-                        raise ValueError("Invalid BLIP description generated")
-                except Exception as e:
-                    logger.error(f"Error generating BLIP description: {str(e)}")
-                    return jsonify({
-                        'success': False,
-                        'error': 'Failed to generate image description',
-                        'error_code': 'BLIP_ERROR'
-                    }), 400
-                
-                # Generate enhanced description with error handling
-                try:
-                    enhanced_description = processor.generate_enhanced_text(blip_description)
-                    if not enhanced_description or not isinstance(enhanced_description, str):
-                        raise ValueError("Invalid enhanced description generated")
-                except Exception as e:
-                    logger.error(f"Error generating enhanced description: {str(e)}")
-                    return jsonify({
-                        'success': False,
-                        'error': 'Failed to enhance description',
-                        'error_code': 'ENHANCEMENT_ERROR'
-                    }), 400
-                
-                # Analyze colors with error handling
-                try:
-                    color_hist_fig, color_pie_fig, color_data = processor.analyze_colors()
-                    if color_hist_fig is None or color_pie_fig is None or color_data is None:
-                        raise ValueError("Color analysis failed to generate results")
-                except Exception as e:
-                    logger.error(f"Error analyzing colors: {str(e)}")
-                    return jsonify({
-                        'success': False,
-                        'error': 'Failed to analyze image colors',
-                        'error_code': 'COLOR_ANALYSIS_ERROR'
-                    }), 400
-                
-                # Analyze sentiment with error handling
-                try:
-                    sentiment_df = processor.sentiment_analysis(enhanced_description)
-                    if sentiment_df is None or sentiment_df.empty:
-                        raise ValueError("Sentiment analysis returned no results")
-                        
-                    sentiment_data = {
-                        'label': sentiment_df['Sentiment'].iloc[0],
-                        'confidence': float(sentiment_df['Confidence'].iloc[0])
-                    }
-                except Exception as e:
-                    logger.error(f"Error analyzing sentiment: {str(e)}")
-                    return jsonify({
-                        'success': False,
-                        'error': 'Failed to analyze sentiment',
-                        'error_code': 'SENTIMENT_ERROR'
-                    }), 400
-                
-                return jsonify({
-                    'success': True,
-                    'data': {
-                        'blip_description': blip_description,
-                        'enhanced_description': enhanced_description,
-                        'color_analysis': color_data,
-                        'sentiment': sentiment_data
-                    }
-                }), 200
+        options = _analysis_options('advanced-analysis')
+        if _wants_async():
+            return _submit_job('advanced-analysis', file, options)
 
-            except Exception as e:
-                logger.error(f"Error processing image: {str(e)}")
-                return jsonify({
-                    'success': False,
-                    'error': str(e),
-                    'error_code': 'PROCESSING_ERROR'
-                }), 400
+        if _wants_stream():
+            with ingest_upload(file) as upload:
+                # Pixels are copied into the processor, so the upload can close before streaming
+                processor, load_error = load_advanced_processor(
+                    upload.stream, upload.sha256, options.get('color_mode'), options['caption_tier']
+                )
+            if load_error is not None:
+                body, status = load_error
+                return jsonify(body), status
+            return _sse_response(stream_pipeline(
+                ADVANCED_PIPELINE, lambda run: advanced_response(processor, run), ADVANCED_STREAM_STAGES,
+                processor=processor, reject_low_quality=options.get('reject_low_quality', False)
+            ))
 
-        finally:
-            # Clean up temporary files
-            try:
-                import shutil
-                shutil.rmtree(temp_dir)
-            except Exception as e:
-                logger.error(f"Error cleaning up temporary files: {str(e)}")
+        with ingest_upload(file) as upload:
+            # Process image
+            body, status = run_advanced_analysis(upload.stream, upload.sha256, **options)
+            return jsonify(body), status
 
     except Exception as e:
         logger.error(f"Unexpected error in advanced analysis route: {str(e)}")
@@ -665,4 +774,292 @@ def process_advanced_analysis():
             'success': False,
             'error': 'An unexpected error occurred during analysis',
             'error_code': 'SERVER_ERROR'
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@main.route('/bulk-analysis', methods=['POST'])
+def bulk_analysis():
+    """
+    Route handler for bulk image analysis.
+    Accepts many files under 'images' and/or a zip archive under 'archive',
+    and streams one JSON line per image as soon as it finishes.
+    """
+    try:
+        files = [file for file in request.files.getlist('images') if file.filename]
+        archive = request.files.get('archive')
+        if archive is not None and not archive.filename:
+            archive = None
+
+        if not files and archive is None:
+            return jsonify({
+                'success': False,
+                'error': 'No images or archive provided',
+                'code': 'NO_INPUT'
+            }), 400
+
+        if archive is not None and not allowed_file(archive.filename, {'zip'}):
+            return jsonify({
+                'success': False,
+                'error': 'Archive must be a ZIP file',
+                'code': 'INVALID_ARCHIVE'
+            }), 400
+
+        pipeline_name = request.form.get('pipeline', 'catalog')
+        pipeline = BULK_PIPELINES.get(pipeline_name)
+        if pipeline is None:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown pipeline. Supported: {", ".join(BULK_PIPELINES)}',
+                'code': 'INVALID_PIPELINE'
+            }), 400
+
+        invalid_tier = _invalid_caption_tier_response()
+        if invalid_tier is not None:
+            return invalid_tier
+
+        items = iter_uploaded_images(files, archive)
+        reject_low_quality = _reject_low_quality()
+        caption_tier = _caption_tier('bulk-analysis')
+
+        def generate():
+            for result in analyze_bulk(items, pipeline, reject_low_quality=reject_low_quality, caption_tier=caption_tier):
+                yield json.dumps(result, default=str) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    except Exception as e:
+        logger.error(f"Unexpected error in bulk analysis route: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'An unexpected error occurred. Please try again.',
+            'code': 'SERVER_ERROR'
+        }), 500
+
+@main.route('/accessibility-audit', methods=['POST'])
+def accessibility_audit():
+    """
+    Route handler for alt-text audits of an HTML page.
+    Accepts the page as an uploaded 'page' file or an 'html' field, with an optional
+    'base_url' for relative image sources. Returns src -> generated alt text for every
+    <img> missing it, or the patched page itself with output=html.
+    """
+    try:
+        page = request.files.get('page')
+        if page is not None and page.filename:
+            html = page.read(MAX_CONTENT_LENGTH).decode('utf-8', 'replace')
+            filename = secure_filename(page.filename) or 'page.html'
+        else:
+            html = request.form.get('html', '')
+            filename = 'page.html'
+        if not html.strip():
+            return jsonify({
+                'success': False,
+                'error': 'No HTML page provided',
+                'code': 'NO_INPUT'
+            }), 400
+
+        base_url = request.form.get('base_url', '').strip() or None
+        if base_url is not None and urlsplit(base_url).scheme not in ('http', 'https'):
+            return jsonify({
+                'success': False,
+                'error': 'base_url must be an http or https URL',
+                'code': 'INVALID_BASE_URL'
+            }), 400
+
+        output = request.form.get('output', 'mapping')
+        if output not in ('mapping', 'html'):
+            return jsonify({
+                'success': False,
+                'error': 'output must be mapping or html',
+                'code': 'INVALID_OUTPUT'
+            }), 400
+
+        invalid_tier = _invalid_caption_tier_response()
+        if invalid_tier is not None:
+            return invalid_tier
+
+        report = audit_pages([(None, html)], base_url=base_url, tier=_caption_tier('accessibility-audit'))
+        if output == 'html':
+            result = report['pages'][0]
+            return Response(patch_html(html, result['tags'], result['alt_texts']), mimetype='text/html', headers={
+                'Content-Disposition': f'attachment; filename={filename}'
+            })
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'alt_text': report['alt_text'],
+                'errors': report['errors'],
+                'counts': report['counts']
+            }
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Unexpected error in accessibility audit route: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'An unexpected error occurred during the audit',
+            'error_code': 'SERVER_ERROR'
+        }), 500
+
+@main.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Route handler for submitting an async analysis job
+    """
+    try:
+        job_type = request.form.get('type', '')
+        if job_type not in JOB_EXTENSIONS:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown job type. Supported types: {", ".join(JOB_EXTENSIONS)}',
+                'error_code': 'INVALID_JOB_TYPE'
+            }), 400
+
+        if 'file' not in request.files:
+            return jsonify({
+                'success': False,
+                'error': 'No file uploaded',
+                'error_code': 'NO_FILE'
+            }), 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({
+                'success': False,
+                'error': 'No file selected',
+                'error_code': 'EMPTY_FILENAME'
+            }), 400
+
+        if not allowed_file(file.filename, JOB_EXTENSIONS[job_type]):
+            return jsonify({
+                'success': False,
+                'error': f'File type not allowed. Supported types: {", ".join(JOB_EXTENSIONS[job_type])}',
+                'error_code': 'INVALID_FILE_TYPE'
+            }), 400
+
+        # Medical jobs also take DICOM files, checked when they are read
+        dicom = job_type == 'medical-image-analysis' and is_dicom(file.stream)
+        if not validate_image(file.stream) and not dicom:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid or corrupted image file',
+                'error_code': 'INVALID_IMAGE'
+            }), 400
+
+        invalid_tier = _invalid_caption_tier_response()
+        if invalid_tier is not None:
+            return invalid_tier
+
+        if job_type == 'advanced-analysis':
+            color_mode = _requested_color_mode()
+            if color_mode and color_mode not in PALETTE_MODES:
+                return _invalid_color_mode_response()
+
+        return _submit_job(job_type, file, _analysis_options(job_type))
+
+    except Exception as e:
+        logger.error(f"Unexpected error submitting job: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'An unexpected error occurred while submitting the job',
+            'error_code': 'SERVER_ERROR'
+        }), 500
+
+@main.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Route handler for polling an async job; ?wait=<seconds> long-polls until it finishes
+    """
+    try:
+        try:
+            wait = min(float(request.args.get('wait', 0)), JOB_MAX_WAIT)
+        except ValueError:
+            wait = 0
+
+        job = job_manager.wait(job_id, wait) if wait > 0 else job_manager.get(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found or expired',
+                'error_code': 'JOB_NOT_FOUND'
+            }), 404
+
+        return jsonify({'success': True, 'data': _job_response(job)}), 200
+
+    except Exception as e:
+        logger.error(f"Unexpected error reading job {job_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'An unexpected error occurred while reading the job',
+            'error_code': 'SERVER_ERROR'
+        }), 500
+
+@main.route('/stats', methods=['GET'])
+def engine_stats():
+    """
+    Route handler for captioning engine statistics
+    """
+    return jsonify({
+        'success': True,
+        'data': {
+            'blip_model': image_processor.get_model_stats(),
+            'caption_batching': image_processor.get_batching_stats(),
+            'caption_cache': image_processor.get_cache_stats(),
+            'llm_cache': llm_service.get_cache_stats(),
+            'llm_client': llm_service.get_client_stats(),
+            'llm_providers': llm_service.get_provider_stats(),
+            'tts_cache': tts_service.get_cache_stats(),
+            'image_fetch': image_fetcher.get_stats()
+        }
+    }), 200
+
+@main.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Route handler for Prometheus-format metrics
+    """
+    if not METRICS_ENABLED:
+        return jsonify(format_error_response('Metrics are disabled', 'METRICS_DISABLED')), 404
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+def _profile_access_denied():
+    # Profiles expose code paths and timings, so reading them needs an allow-listed token too
+    if profile_allowed(request.headers.get('X-Profile') or request.args.get('profile')):
+        return None
+    return jsonify(format_error_response('A valid profiling token is required', 'PROFILE_FORBIDDEN')), 403
+
+@main.route('/profiles', methods=['GET'])
+def list_profiles():
+    """
+    Route handler listing stored request profiles, newest first
+    """
+    denied = _profile_access_denied()
+    if denied is not None:
+        return denied
+    return jsonify({'success': True, 'data': {'profiles': profile_store.list()}}), 200
+
+@main.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    Route handler for one profile's summary and spans
+    """
+    denied = _profile_access_denied()
+    if denied is not None:
+        return denied
+    summary = profile_store.get(profile_id)
+    if summary is None:
+        return jsonify(format_error_response('Profile not found', 'PROFILE_NOT_FOUND')), 404
+    return jsonify({'success': True, 'data': summary}), 200
+
+@main.route('/profiles/<profile_id>/flamegraph', methods=['GET'])
+def get_profile_flamegraph(profile_id):
+    """
+    Route handler downloading a profile's collapsed stacks (flamegraph.pl / speedscope input)
+    """
+    denied = _profile_access_denied()
+    if denied is not None:
+        return denied
+    path = profile_store.folded_path(profile_id)
+    if path is None:
+        return jsonify(format_error_response('Profile not found', 'PROFILE_NOT_FOUND')), 404
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=f"{profile_id}.folded")
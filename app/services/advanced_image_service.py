@@ -1,38 +1,52 @@
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageStat
 import matplotlib
 matplotlib.use('Agg')  # Set non-interactive backend before importing pyplot
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import pandas as pd
-from sklearn.cluster import KMeans
+import logging
+from app.services.palette_service import extract_palette
 from app.services.text_service import generate_context, enhance_context, analyze_sentiment
 from app.services.image_service import image_processor
+from config.config import COLOR_ANALYSIS_MODE
+
+logger = logging.getLogger(__name__)
 
 class AdvancedImageProcessor:
-    def __init__(self):
+    def __init__(self, color_mode=None, caption_tier=None):
         self.image = None
-        self.image_array = None
+        self.image_array = None  # Full-resolution pixels, built on first use by the 'kmeans' palette
+        self.image_hash = None
         self.color_clusters = 5  # Number of dominant colors to detect
+        self.color_mode = color_mode or COLOR_ANALYSIS_MODE  # Palette mode, see palette_service.PALETTE_MODES
+        self.caption_tier = caption_tier  # BLIP decoding tier, see image_service.CAPTION_TIERS
+        self.caption = None  # Result of image_processor.caption, once generated
 
-    def load_image(self, image_path):
+    def load_image(self, image_path, image_hash=None):
         """Load and prepare image for processing"""
         try:
             self.image = Image.open(image_path)
+            self.image_hash = image_hash
             # Convert image to RGB mode if it isn't already
             if self.image.mode != 'RGB':
                 self.image = self.image.convert('RGB')
-            self.image_array = np.array(self.image)
-            return self.image, self.image_array
+            self.image.load()
+            return self.image
         except Exception as e:
             raise ValueError(f"Error loading image: {str(e)}")
 
-    def generate_image_context(self):
-        """Generate BLIP description for the image"""
+    def generate_alt_text(self):
+        """Generate the BLIP caption for the image"""
+        if self.image is None:
+            raise ValueError("No image loaded")
+        self.caption = image_processor.caption(self.image, image_hash=self.image_hash, tier=self.caption_tier)
+        return self.caption['alt_text']
+
+    def generate_image_context(self, alt_text=None):
+        """Generate context for the image from its BLIP caption"""
         try:
-            if self.image is None:
-                raise ValueError("No image loaded")
-            
-            alt_text = image_processor.generate_alt_text(self.image)
+            if alt_text is None:
+                alt_text = self.generate_alt_text()
             context_result = generate_context(alt_text)
             
             if not context_result['success']:
@@ -60,68 +74,60 @@ class AdvancedImageProcessor:
         except Exception as e:
             raise ValueError(f"Error generating enhanced text: {str(e)}")
 
-    def analyze_colors(self):
-        """Analyze color distribution and dominant colors"""
+    def analyze_colors(self, mode=None):
+        """
+        Analyze color distribution and dominant colors
+        Args:
+            mode (str): Palette mode, defaults to the processor's color_mode
+        """
         try:
-            if self.image_array is None:
+            if self.image is None:
                 raise ValueError("No image loaded")
+            mode = mode or self.color_mode
 
-            # Reshape the image array for color analysis
-            pixels = self.image_array.reshape(-1, 3)
-            
-            # Create color histogram
-            plt.figure(figsize=(8, 4))
-            hist_data = np.mean(pixels, axis=0)
-            plt.plot(range(3), hist_data, marker='o')
-            plt.xticks(range(3), ['R', 'G', 'B'])
-            plt.title('Color Distribution')
-            plt.grid(True)
-            hist_fig = plt.gcf()
-            plt.close()
+            # Create color histogram (Figure objects, not pyplot state, so this is thread-safe)
+            hist_fig = Figure(figsize=(8, 4))
+            ax = hist_fig.subplots()
+            hist_data = np.array(ImageStat.Stat(self.image).mean[:3])
+            ax.plot(range(3), hist_data, marker='o')
+            ax.set_xticks(range(3), ['R', 'G', 'B'])
+            ax.set_title('Color Distribution')
+            ax.grid(True)
 
-            # Find dominant colors using K-means
-            kmeans = KMeans(n_clusters=self.color_clusters, random_state=42)
-            kmeans.fit(pixels)
-            colors = kmeans.cluster_centers_
-            
-            # Calculate color percentages
-            labels = kmeans.labels_
-            unique_labels, label_counts = np.unique(labels, return_counts=True)
-            percentages = (label_counts / len(labels)) * 100
-            
-            # Sort colors by percentage
-            sorted_indices = np.argsort(percentages)[::-1]
-            colors = colors[sorted_indices]
-            percentages = percentages[sorted_indices]
+            # Find dominant colors, sorted by percentage; only 'kmeans' needs every pixel
+            if mode == 'kmeans' and self.image_array is None:
+                self.image_array = np.array(self.image)
+            colors, percentages = extract_palette(
+                self.image, n_colors=self.color_clusters, mode=mode, image_array=self.image_array
+            )
             
             # Create pie chart of dominant colors
-            plt.figure(figsize=(6, 6))
+            pie_fig = Figure(figsize=(6, 6))
+            ax = pie_fig.subplots()
             
             # Convert colors to RGB format for plotting
             rgb_colors = colors / 255.0
             
             # Create pie chart with percentage labels
-            patches, texts, autotexts = plt.pie(percentages, 
+            patches, texts, autotexts = ax.pie(percentages, 
                                               colors=rgb_colors, 
                                               autopct='%1.1f%%',
                                               labels=[f'Color {i+1}' for i in range(len(colors))])
             
-            plt.title('Dominant Colors')
+            ax.set_title('Dominant Colors')
             
             # Format percentage texts
             for autotext in autotexts:
                 autotext.set_color('white')
                 autotext.set_fontsize(8)
-            
-            pie_fig = plt.gcf()
-            plt.close()
 
             # Convert color data for JSON response
             color_data = {
                 'bins': list(range(3)),  # R, G, B channels
                 'distribution': hist_data.tolist(),  # Color distribution data
                 'dominant_colors': colors.astype(int).tolist(),  # RGB values of dominant colors
-                'percentages': percentages.tolist()  # Percentage of each dominant color
+                'percentages': percentages.tolist(),  # Percentage of each dominant color
+                'mode': mode
             }
 
             return hist_fig, pie_fig, color_data
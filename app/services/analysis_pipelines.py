@@ -0,0 +1,489 @@
+"""
+Stage graphs for the image analysis routes.
+
+Each pipeline declares its stages and their dependencies; the pipeline
+engine runs independent stages in parallel and records per-stage timings.
+Image pipelines first decode the input once at the reduced size BLIP uses
+(analysis_image), then run a cheap quality stage on it; passing the optional
+reject_low_quality=True input stops a failing image before BLIP and the LLM.
+The optional caption_tier input picks the BLIP decoding tier
+(see image_service.CAPTION_TIERS).
+"""
+import logging
+from concurrent.futures import wait, FIRST_COMPLETED
+from PIL import Image
+from app.services.pipeline_service import Stage, Pipeline
+from app.services.image_service import image_processor, LowQualityImageError
+from app.services.text_service import (
+    generate_context,
+    enhance_context,
+    social_media_caption,
+    generate_hashtags,
+    analyze_sentiment,
+    analyze_medical_image
+)
+from app.services.seo_service import generate_seo_description
+from app.services.advanced_image_service import AdvancedImageProcessor
+from app.services.executor_service import submit
+from app.services.dicom_service import DicomVolume, DicomError, is_dicom
+from app.utils.cache_utils import make_cache_key
+from config.config import DICOM_MAX_FRAMES, DICOM_FRAME_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+def response_text(result, key):
+    """
+    Extract a text field from a service response.
+    Args:
+        result (dict): Response built by format_success_response/format_error_response
+        key (str): Field of result['data'] to return
+    Returns:
+        str: The requested field
+    """
+    if not result or not result.get('success'):
+        raise ValueError(result.get('error') if result else 'Empty response')
+    return result['data'][key]
+
+def _quality(results):
+    """
+    Quality metrics of the input image. Runs before BLIP so that, when the
+    optional 'reject_low_quality' input is set, a failing image skips the
+    BLIP and LLM stages entirely.
+    """
+    if 'processor' in results:
+        metrics = image_processor.validate_image_quality(results['processor'].image)
+    else:
+        reduced = results['analysis_image']
+        metrics = image_processor.validate_image_quality(reduced['image'], resolution=reduced['resolution'])
+    if results.get('reject_low_quality') and not metrics['is_valid']:
+        raise LowQualityImageError(metrics)
+    return metrics
+
+def low_quality_rejection(run):
+    """
+    Build the response for an image rejected by the quality stage.
+    Args:
+        run (PipelineRun): Completed pipeline run
+    Returns:
+        tuple: (response body, HTTP status), or None if the image was not rejected
+    """
+    error = run.errors.get('quality')
+    if not isinstance(error, LowQualityImageError):
+        return None
+    return {
+        'success': False,
+        'error': str(error),
+        'error_code': 'LOW_QUALITY_IMAGE',
+        'quality': error.metrics,
+        'metadata': run.metadata()
+    }, 422
+
+def caption_metadata(caption):
+    """
+    Report of how a caption was generated, for API metadata.
+    Args:
+        caption (dict): Result of image_processor.caption
+    Returns:
+        dict: Tier, decode time and whether the caption came from the cache
+    """
+    return {'tier': caption['tier'], 'decode_ms': caption['decode_ms'], 'cached': caption['cached']}
+
+def response_metadata(run):
+    """
+    Pipeline timings plus, when BLIP ran, the caption tier and decode time.
+    Args:
+        run (PipelineRun): Completed pipeline run
+    Returns:
+        dict: Metadata for API responses
+    """
+    metadata = run.metadata()
+    if run.ok('blip_caption'):
+        metadata['caption'] = caption_metadata(run.results['blip_caption'])
+    return metadata
+
+def _analysis_image(results):
+    """One reduced decode of the input image, shared by the quality and caption stages"""
+    return image_processor.analysis_image(results['image'])
+
+def _blip_caption(results):
+    return image_processor.caption(
+        results['analysis_image']['image'], image_hash=results['image_hash'], tier=results.get('caption_tier')
+    )
+
+def _alt_text(results):
+    return results['blip_caption']['alt_text']
+
+def _validated_alt_text(results):
+    alt_text = _alt_text(results)
+    if not isinstance(alt_text, str) or not alt_text.strip():
+        raise ValueError("Failed to generate image description")
+    return alt_text
+
+def _context(results):
+    return generate_context(results['alt_text'])
+
+def _context_text(results):
+    return response_text(results['context'], 'context')
+
+def _required_context(results):
+    return response_text(_context(results), 'context')
+
+GENERAL_PIPELINE = Pipeline([
+    Stage('analysis_image', _analysis_image, ['image']),
+    Stage('quality', _quality, ['analysis_image']),
+    Stage('blip_caption', _blip_caption, ['analysis_image', 'image_hash', 'quality']),
+    Stage('alt_text', _alt_text, ['blip_caption']),
+    Stage('context', _context, ['alt_text']),
+    Stage('enhanced_description', lambda r: enhance_context(_context_text(r)), ['context'])
+], inputs=['image', 'image_hash'], name='general')
+
+SOCIAL_MEDIA_PIPELINE = Pipeline([
+    Stage('analysis_image', _analysis_image, ['image']),
+    Stage('quality', _quality, ['analysis_image']),
+    Stage('blip_caption', _blip_caption, ['analysis_image', 'image_hash', 'quality']),
+    Stage('alt_text', _alt_text, ['blip_caption']),
+    Stage('context', _context, ['alt_text']),
+    Stage('caption', lambda r: social_media_caption(_context_text(r)), ['context']),
+    Stage('sentiment', lambda r: analyze_sentiment(response_text(r['caption'], 'caption')), ['caption']),
+    Stage(
+        'hashtags',
+        lambda r: generate_hashtags(_context_text(r), response_text(r['caption'], 'caption')),
+        ['context', 'caption']
+    )
+], inputs=['image', 'image_hash'], name='social_media')
+
+SEO_PIPELINE = Pipeline([
+    Stage('analysis_image', _analysis_image, ['image']),
+    Stage('quality', _quality, ['analysis_image']),
+    Stage('blip_caption', _blip_caption, ['analysis_image', 'image_hash', 'quality']),
+    Stage('alt_text', _alt_text, ['blip_caption']),
+    Stage('context', _context, ['alt_text']),
+    Stage('seo', lambda r: generate_seo_description(_context_text(r), r['alt_text']), ['context', 'alt_text'])
+], inputs=['image', 'image_hash'], name='seo')
+
+IMAGE_ANALYZER_PIPELINE = Pipeline([
+    Stage('analysis_image', _analysis_image, ['image']),
+    Stage('quality', _quality, ['analysis_image']),
+    Stage('blip_caption', _blip_caption, ['analysis_image', 'image_hash', 'quality']),
+    Stage('alt_text', _alt_text, ['blip_caption']),
+    Stage('context', _required_context, ['alt_text']),
+    # Sentiment only needs the alt text, so it overlaps with context generation
+    Stage('sentiment', lambda r: response_text(analyze_sentiment(r['alt_text']), 'sentiment'), ['alt_text'])
+], inputs=['image', 'image_hash'], name='image_analyzer')
+
+# Alt text and context only, for bulk catalog runs
+CATALOG_PIPELINE = Pipeline([
+    Stage('analysis_image', _analysis_image, ['image']),
+    Stage('quality', _quality, ['analysis_image']),
+    Stage('blip_caption', _blip_caption, ['analysis_image', 'image_hash', 'quality']),
+    Stage('alt_text', _validated_alt_text, ['blip_caption']),
+    Stage('context', _required_context, ['alt_text'])
+], inputs=['image', 'image_hash'], name='catalog')
+
+MEDICAL_PIPELINE = Pipeline([
+    Stage('analysis_image', _analysis_image, ['image']),
+    Stage('quality', _quality, ['analysis_image']),
+    Stage('blip_caption', _blip_caption, ['analysis_image', 'image_hash', 'quality']),
+    Stage('alt_text', _validated_alt_text, ['blip_caption']),
+    Stage('analysis', lambda r: analyze_medical_image(r['image'], r['alt_text']), ['image', 'alt_text'])
+], inputs=['image', 'image_hash'], name='medical')
+
+def _advanced_alt_text(results):
+    alt_text = results['processor'].generate_alt_text()
+    if not alt_text or not isinstance(alt_text, str):
+        raise ValueError("Invalid BLIP caption generated")
+    return alt_text
+
+def _blip_description(results):
+    description = results['processor'].generate_image_context(results['alt_text'])
+    if not description or not isinstance(description, str):
+        raise ValueError("Invalid BLIP description generated")
+    return description
+
+def _advanced_enhanced(results):
+    enhanced = results['processor'].generate_enhanced_text(results['blip_description'])
+    if not enhanced or not isinstance(enhanced, str):
+        raise ValueError("Invalid enhanced description generated")
+    return enhanced
+
+def _advanced_colors(results):
+    hist_fig, pie_fig, color_data = results['processor'].analyze_colors()
+    if hist_fig is None or pie_fig is None or color_data is None:
+        raise ValueError("Color analysis failed to generate results")
+    return color_data
+
+def _advanced_sentiment(results):
+    sentiment_df = results['processor'].sentiment_analysis(results['enhanced_description'])
+    if sentiment_df is None or sentiment_df.empty:
+        raise ValueError("Sentiment analysis returned no results")
+    return {
+        'label': sentiment_df['Sentiment'].iloc[0],
+        'confidence': float(sentiment_df['Confidence'].iloc[0])
+    }
+
+# Color clustering does not depend on BLIP or the LLM, so it overlaps with that chain
+ADVANCED_PIPELINE = Pipeline([
+    Stage('quality', _quality, ['processor']),
+    Stage('alt_text', _advanced_alt_text, ['processor', 'quality']),
+    Stage('blip_description', _blip_description, ['processor', 'alt_text']),
+    Stage('enhanced_description', _advanced_enhanced, ['processor', 'blip_description']),
+    Stage('color_analysis', _advanced_colors, ['processor', 'quality']),
+    Stage('sentiment', _advanced_sentiment, ['processor', 'enhanced_description'])
+], inputs=['processor'], name='advanced')
+
+# Advanced analysis stages in reporting order, with the error returned when each fails
+ADVANCED_STAGE_ERRORS = [
+    ('quality', 'Failed to assess image quality', 'QUALITY_CHECK_ERROR'),
+    ('alt_text', 'Failed to generate image description', 'BLIP_ERROR'),
+    ('blip_description', 'Failed to generate image description', 'BLIP_ERROR'),
+    ('enhanced_description', 'Failed to enhance description', 'ENHANCEMENT_ERROR'),
+    ('color_analysis', 'Failed to analyze image colors', 'COLOR_ANALYSIS_ERROR'),
+    ('sentiment', 'Failed to analyze sentiment', 'SENTIMENT_ERROR')
+]
+
+def caption_frames(volume, indices, frame_hash, center, width, tier=None, concurrency=DICOM_FRAME_CONCURRENCY):
+    """
+    Caption DICOM frames a few at a time.
+    Frames are rendered on the calling thread and captioned concurrently, so
+    the caption batcher can put them in one BLIP generate call; at most
+    concurrency rendered frames are held at once.
+    Args:
+        volume (DicomVolume): Open volume
+        indices (list): Frame indices
+        frame_hash (callable): Frame index -> caption cache hash, or None
+        center (float): Window center, None for each frame's min/max
+        width (float): Window width
+        tier (str): BLIP decoding tier
+        concurrency (int): Frames in flight at a time
+    Returns:
+        list: {'index', 'alt_text'} per frame, in index order
+    """
+    concurrency = max(1, int(concurrency))
+    pending = iter(indices)
+    in_flight = {}
+    captions = {}
+    while True:
+        for index in pending:
+            image = volume.frame_image(index, center, width)
+            in_flight[submit(image_processor.caption, image, image_hash=frame_hash(index), tier=tier)] = index
+            if len(in_flight) >= concurrency:
+                break
+        if not in_flight:
+            return [{'index': index, 'alt_text': captions[index]} for index in sorted(captions)]
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+            captions[in_flight.pop(future)] = future.result()['alt_text']
+
+def load_dicom(image_source, image_hash=None, caption_tier=None, window_center=None, window_width=None,
+               frame_captions=False):
+    """
+    Window a DICOM file for the medical pipeline.
+    The middle frame is the image the pipeline analyzes. With frame_captions,
+    up to DICOM_MAX_FRAMES frames sampled across a multi-frame file are also
+    captioned (see caption_frames).
+    Args:
+        image_source: Path or file-like object of the DICOM file
+        image_hash (str): Optional hash of the file bytes
+        caption_tier (str): BLIP decoding tier for the sampled frames
+        window_center (float): Window center, None for the file's window
+        window_width (float): Window width, None for the file's window
+        frame_captions (bool): Also caption frames sampled across the volume
+    Returns:
+        tuple: (middle frame image, its hash for the caption cache, DICOM details for the response)
+    """
+    with DicomVolume(image_source) as volume:
+        center, width = volume.window(window_center, window_width)
+        middle = volume.frames // 2
+
+        def frame_hash(index):
+            return make_cache_key(image_hash, 'dicom', index, center, width) if image_hash else None
+
+        dicom = {
+            'metadata': volume.metadata(),
+            'window': {'center': center, 'width': width},
+            'frame': middle
+        }
+        if frame_captions and volume.frames > 1:
+            # The middle frame's caption is cached here and reused by the pipeline
+            indices = sorted(set(volume.sample_frames(DICOM_MAX_FRAMES)) | {middle})
+            dicom['frames'] = caption_frames(volume, indices, frame_hash, center, width, caption_tier)
+        return volume.frame_image(middle, center, width), frame_hash(middle), dicom
+
+def run_medical_analysis(image_source, image_hash=None, reject_low_quality=False, caption_tier=None,
+                         window_center=None, window_width=None, frame_captions=False):
+    """
+    Run the medical pipeline on an image or DICOM file and build the API response.
+    Args:
+        image_source: Path or file-like object of the image
+        image_hash (str): Optional hash of the image bytes
+        reject_low_quality (bool): Stop before captioning if the image fails the quality checks
+        caption_tier (str): BLIP decoding tier, None for the configured default
+        window_center (float): DICOM window center, None for the file's window
+        window_width (float): DICOM window width, None for the file's window
+        frame_captions (bool): Also caption frames sampled across a multi-frame DICOM file
+    Returns:
+        tuple: (response body, HTTP status)
+    """
+    try:
+        dicom = None
+        if is_dicom(image_source):
+            image, image_hash, dicom = load_dicom(
+                image_source, image_hash, caption_tier, window_center, window_width, frame_captions
+            )
+        else:
+            image = Image.open(image_source)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        # Generate alt text, then perform medical analysis
+        run = MEDICAL_PIPELINE.run(
+            image=image, image_hash=image_hash, reject_low_quality=reject_low_quality, caption_tier=caption_tier
+        )
+        rejection = low_quality_rejection(run)
+        if rejection is not None:
+            return rejection
+        for stage in ('alt_text', 'analysis'):
+            if not run.ok(stage):
+                raise run.errors[stage]
+        alt_text = run.results['alt_text']
+        analysis_result = run.results['analysis']
+        if not analysis_result['success']:
+            raise ValueError(analysis_result.get('error', 'Failed to analyze medical image'))
+        
+        # Extract data with defaults for missing fields
+        data = analysis_result.get('data', {})
+        
+        # Validate required fields and provide defaults
+        findings = data.get('findings')
+        if not findings or not isinstance(findings, str):
+            findings = "Standard medical image analysis protocol should be followed. Detailed examination of anatomical structures is recommended."
+            
+        diagnosis = data.get('diagnosis')
+        if not diagnosis or not isinstance(diagnosis, str):
+            diagnosis = "Further clinical correlation and detailed examination is recommended for accurate interpretation."
+            
+        recommendations = data.get('recommendations')
+        if not recommendations or not isinstance(recommendations, str):
+            recommendations = "Follow standard medical imaging protocols. Consult with healthcare providers for proper interpretation and next steps."
+        
+        confidence_score = float(data.get('confidence_score', 0.7))  # Default confidence score
+        
+        body = {
+            'success': True,
+            'data': {
+                'alt_text': alt_text,
+                'findings': findings,
+                'diagnosis': diagnosis,
+                'recommendations': recommendations,
+                'confidence_score': confidence_score,
+                'quality': run.results['quality']
+            },
+            'metadata': response_metadata(run)
+        }
+        if dicom is not None:
+            body['data']['dicom'] = dicom
+        return body, 200
+
+    except DicomError as e:
+        logger.error(f"Error reading DICOM file: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'error_code': 'INVALID_DICOM'
+        }, 400
+    except Exception as e:
+        logger.error(f"Error processing image: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'error_code': 'PROCESSING_ERROR'
+        }, 400
+
+def load_advanced_processor(image_source, image_hash=None, color_mode=None, caption_tier=None):
+    """
+    Load an image for the advanced pipeline.
+    Args:
+        image_source: Path or file-like object of the image
+        image_hash (str): Optional hash of the image bytes
+        color_mode (str): Optional palette mode, see palette_service.PALETTE_MODES
+        caption_tier (str): BLIP decoding tier, None for the configured default
+    Returns:
+        tuple: (AdvancedImageProcessor, None), or (None, (error body, HTTP status)) if the image cannot be loaded
+    """
+    processor = AdvancedImageProcessor(color_mode=color_mode, caption_tier=caption_tier)
+    try:
+        image = processor.load_image(image_source, image_hash=image_hash)
+        if image is None:
+            raise ValueError("Failed to load image")
+    except Exception as e:
+        logger.error(f"Error loading image: {str(e)}")
+        return None, ({
+            'success': False,
+            'error': 'Failed to load image file',
+            'error_code': 'IMAGE_LOAD_ERROR'
+        }, 400)
+    return processor, None
+
+def advanced_response(processor, run):
+    """
+    Build the API response for a completed advanced pipeline run.
+    Args:
+        processor (AdvancedImageProcessor): Processor the pipeline ran on
+        run (PipelineRun): Completed pipeline run
+    Returns:
+        tuple: (response body, HTTP status)
+    """
+    rejection = low_quality_rejection(run)
+    if rejection is not None:
+        return rejection
+    for stage, error_message, error_code in ADVANCED_STAGE_ERRORS:
+        if not run.ok(stage):
+            logger.error(f"Error in advanced analysis stage '{stage}': {str(run.errors.get(stage))}")
+            return {
+                'success': False,
+                'error': error_message,
+                'error_code': error_code
+            }, 400
+
+    metadata = run.metadata()
+    metadata['caption'] = caption_metadata(processor.caption)
+    return {
+        'success': True,
+        'data': {
+            'blip_description': run.results['blip_description'],
+            'enhanced_description': run.results['enhanced_description'],
+            'color_analysis': run.results['color_analysis'],
+            'sentiment': run.results['sentiment'],
+            'quality': run.results['quality']
+        },
+        'metadata': metadata
+    }, 200
+
+def run_advanced_analysis(image_source, image_hash=None, color_mode=None, reject_low_quality=False, caption_tier=None):
+    """
+    Run the advanced pipeline on an image and build the API response.
+    Args:
+        image_source: Path or file-like object of the image
+        image_hash (str): Optional hash of the image bytes
+        color_mode (str): Optional palette mode, see palette_service.PALETTE_MODES
+        reject_low_quality (bool): Stop before captioning if the image fails the quality checks
+        caption_tier (str): BLIP decoding tier, None for the configured default
+    Returns:
+        tuple: (response body, HTTP status)
+    """
+    try:
+        processor, load_error = load_advanced_processor(image_source, image_hash, color_mode, caption_tier)
+        if load_error is not None:
+            return load_error
+        
+        # Color analysis overlaps with the BLIP and LLM chain
+        run = ADVANCED_PIPELINE.run(processor=processor, reject_low_quality=reject_low_quality)
+        return advanced_response(processor, run)
+
+    except Exception as e:
+        logger.error(f"Error processing image: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'error_code': 'PROCESSING_ERROR'
+        }, 400
@@ -0,0 +1,271 @@
+"""
+Accessibility audit of HTML pages: alt text for every <img> that lacks it.
+
+Pages are scanned for <img> elements whose alt attribute is missing or
+empty (images marked role="presentation" or aria-hidden="true" are left
+alone). Their sources are resolved and deduplicated, so a logo used on every
+page of a site is fetched and captioned once. Then they are loaded and
+captioned a bounded number at a time. Concurrent captions share BLIP
+generate calls through the caption batcher, and unchanged image URLs are
+revalidated rather than downloaded again (see fetch_service).
+
+The result is a mapping from src to alt text, and optionally the page with
+alt attributes filled in. Only the <img> tags are rewritten; the rest of the
+markup is left byte for byte as it was.
+"""
+import os
+import re
+import base64
+import binascii
+import logging
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, unquote_to_bytes
+from concurrent.futures import wait, FIRST_COMPLETED
+from config.config import AUDIT_CONCURRENCY, AUDIT_MAX_IMAGES, IMAGE_FETCH_MAX_BYTES
+from app.services.executor_service import submit
+from app.services.fetch_service import image_fetcher, ImageFetchError
+from app.services.image_service import image_processor
+from app.utils.file_utils import validate_image
+from app.utils.upload_utils import ingest_bytes
+
+logger = logging.getLogger(__name__)
+
+# One attribute of a start tag: name, then optionally = and a quoted or bare value
+_ATTRIBUTE = re.compile(r'''([^\s"'>/=]+)(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'>]*))?''')
+
+class _ImageTagFinder(HTMLParser):
+    """Collects <img> tags lacking alt text, with their offsets in the document"""
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        # getpos() counts lines by '\n' only, so offsets are computed the same way
+        self.line_offsets = [0] + [match.end() for match in re.finditer('\n', html)]
+        self.base_href = None
+        self.tags = []
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        if tag == 'base' and self.base_href is None and attributes.get('href'):
+            self.base_href = attributes['href'].strip()
+        if tag != 'img':
+            return
+        if (attributes.get('alt') or '').strip():
+            return
+        if attributes.get('role') in ('presentation', 'none') or attributes.get('aria-hidden') == 'true':
+            return
+        src = (attributes.get('src') or '').strip()
+        if not src:
+            return
+        line, column = self.getpos()
+        start = self.line_offsets[line - 1] + column
+        text = self.get_starttag_text()
+        self.tags.append({'src': src, 'start': start, 'end': start + len(text), 'text': text, 'has_alt': 'alt' in attributes})
+
+    handle_startendtag = handle_starttag
+
+def find_images_missing_alt(html):
+    """
+    Find <img> elements with a missing or empty alt attribute.
+    Args:
+        html (str): HTML document
+    Returns:
+        tuple: (list of tags as dicts with src, start, end, text and has_alt; <base href> or None)
+    """
+    finder = _ImageTagFinder(html)
+    finder.feed(html)
+    finder.close()
+    return finder.tags, finder.base_href
+
+def resolve_src(src, base_url=None, page_path=None, root_dir=None):
+    """
+    Resolve an img src to something that can be loaded.
+    Local files are only considered when page_path is given (the CLI); the
+    HTTP endpoint resolves URLs only.
+    Args:
+        src (str): src attribute value
+        base_url (str): URL the page was served from, for relative srcs
+        page_path (str): File the page was read from
+        root_dir (str): Site root, for root-relative srcs of local pages
+    Returns:
+        tuple: ('url', url), ('file', path) or ('data', src); None if it cannot be resolved
+    """
+    if src.startswith('data:'):
+        return 'data', src
+    if base_url:
+        src = urljoin(base_url, src)
+    elif src.startswith('//'):
+        src = 'https:' + src
+    scheme = urlsplit(src).scheme.lower()
+    if scheme in ('http', 'https'):
+        return 'url', src
+    if scheme or page_path is None:
+        return None
+    path = unquote_to_bytes(urlsplit(src).path).decode('utf-8', 'replace')
+    if path.startswith('/'):
+        path = os.path.join(root_dir or os.path.dirname(page_path), path.lstrip('/'))
+    else:
+        path = os.path.join(os.path.dirname(page_path), path)
+    return 'file', os.path.normpath(path)
+
+def _decode_data_uri(uri):
+    header, _, payload = uri.partition(',')
+    try:
+        if header.endswith(';base64'):
+            return base64.b64decode(payload, validate=False)
+        return unquote_to_bytes(payload)
+    except (binascii.Error, ValueError):
+        raise ImageFetchError('Invalid data URI', 'INVALID_IMAGE')
+
+def load_source(source):
+    """
+    Load the bytes of a resolved source.
+    Args:
+        source (tuple): Result of resolve_src
+    Returns:
+        Upload: The image bytes
+    """
+    kind, location = source
+    if kind == 'url':
+        return image_fetcher.fetch(location)
+    if kind == 'data':
+        data = _decode_data_uri(location)
+    else:
+        try:
+            if os.path.getsize(location) > IMAGE_FETCH_MAX_BYTES:
+                raise ImageFetchError('Image is too large', 'URL_TOO_LARGE')
+            with open(location, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise ImageFetchError(f'Cannot read image file: {e.strerror}', 'FILE_NOT_FOUND')
+    return ingest_bytes(data, os.path.basename(location) if kind == 'file' else None)
+
+def caption_source(source, tier=None):
+    """
+    Load and caption one image source.
+    Uses ImageProcessor.caption, the path behind generate_alt_text, so that
+    failures come back as errors instead of as alt text.
+    Returns:
+        dict: alt_text and cached, or error and code
+    """
+    try:
+        with load_source(source) as upload:
+            if not validate_image(upload.stream):
+                return {'error': 'Not a valid image', 'code': 'INVALID_IMAGE'}
+            result = image_processor.caption(upload.open_image(), image_hash=upload.sha256, tier=tier)
+            return {'alt_text': result['alt_text'], 'cached': result['cached']}
+    except ImageFetchError as e:
+        return {'error': str(e), 'code': e.code}
+    except Exception as e:
+        logger.error(f"Error captioning {source[1][:200]}: {str(e)}")
+        return {'error': str(e), 'code': 'PROCESSING_ERROR'}
+
+def caption_sources(sources, concurrency=AUDIT_CONCURRENCY, tier=None):
+    """
+    Caption distinct sources with bounded concurrency.
+    Args:
+        sources (iterable): Resolved sources (see resolve_src), each captioned once
+        concurrency (int): Maximum number of images loaded and captioned at a time
+        tier (str): Caption tier, None for the default
+    Returns:
+        dict: source -> caption_source result
+    """
+    concurrency = max(1, int(concurrency))
+    pending = iter(dict.fromkeys(sources))
+    in_flight = {}
+    results = {}
+    while True:
+        for source in pending:
+            in_flight[submit(caption_source, source, tier)] = source
+            if len(in_flight) >= concurrency:
+                break
+        if not in_flight:
+            return results
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+            results[in_flight.pop(future)] = future.result()
+
+def patch_html(html, tags, alt_texts):
+    """
+    Fill in alt attributes, leaving everything but the <img> tags untouched.
+    Args:
+        html (str): Original document
+        tags (list): Tags from find_images_missing_alt
+        alt_texts (dict): src attribute value -> alt text
+    Returns:
+        str: Patched document
+    """
+    parts = []
+    position = 0
+    for tag in sorted(tags, key=lambda tag: tag['start']):
+        alt_text = alt_texts.get(tag['src'])
+        if alt_text is None:
+            continue
+        parts.append(html[position:tag['start']])
+        parts.append(_with_alt(tag['text'], alt_text, tag['has_alt']))
+        position = tag['end']
+    parts.append(html[position:])
+    return ''.join(parts)
+
+def _with_alt(tag_text, alt_text, has_alt):
+    attribute = f'alt="{escape(alt_text, quote=True)}"'
+    if has_alt:
+        # Replace the empty alt in place (alt, alt="" or alt=''); quoted values are matched whole,
+        # so an "alt" inside another attribute's value is never touched
+        for match in _ATTRIBUTE.finditer(tag_text, len('<img')):
+            if match.group(1).lower() == 'alt':
+                return tag_text[:match.start()] + attribute + tag_text[match.end():]
+    end = len(tag_text) - (2 if tag_text.endswith('/>') else 1)
+    return f"{tag_text[:end].rstrip()} {attribute}{tag_text[end:]}"
+
+def audit_pages(pages, base_url=None, root_dir=None, concurrency=AUDIT_CONCURRENCY, tier=None, max_images=AUDIT_MAX_IMAGES):
+    """
+    Generate alt text for every image lacking it across one or more pages.
+    Args:
+        pages (list): (page path or None, HTML) tuples
+        base_url (str): URL relative srcs resolve against (a page's <base href> is applied on top)
+        root_dir (str): Site root of local pages
+        concurrency (int): Images loaded and captioned at a time
+        tier (str): Caption tier, None for the default
+        max_images (int): Distinct images captioned at most; the rest are reported as skipped
+    Returns:
+        dict: pages (per page: path, tags, alt_texts, errors), alt_text (src -> alt over all pages),
+              errors (src -> error) and counts
+    """
+    scanned = []
+    sources = []
+    for page_path, html in pages:
+        tags, base_href = find_images_missing_alt(html)
+        page_base = urljoin(base_url, base_href) if base_url and base_href else (base_href or base_url)
+        resolved = {tag['src']: resolve_src(tag['src'], page_base, page_path, root_dir) for tag in tags}
+        scanned.append((page_path, html, tags, resolved))
+        sources.extend(source for source in resolved.values() if source is not None)
+
+    distinct = list(dict.fromkeys(sources))
+    captions = caption_sources(distinct[:max_images], concurrency, tier)
+
+    report = {'pages': [], 'alt_text': {}, 'errors': {}}
+    for page_path, html, tags, resolved in scanned:
+        alt_texts, errors = {}, {}
+        for src, source in resolved.items():
+            if source is None:
+                errors[src] = {'error': 'Cannot resolve image source', 'code': 'UNRESOLVED_SRC'}
+            elif source not in captions:
+                errors[src] = {'error': f'Skipped: more than {max_images} distinct images', 'code': 'TOO_MANY_IMAGES'}
+            elif 'error' in captions[source]:
+                errors[src] = captions[source]
+            else:
+                alt_texts[src] = captions[source]['alt_text']
+        report['pages'].append({'path': page_path, 'html': html, 'tags': tags, 'alt_texts': alt_texts, 'errors': errors})
+        report['alt_text'].update(alt_texts)
+        report['errors'].update(errors)
+
+    report['counts'] = {
+        'pages': len(scanned),
+        'images_missing_alt': sum(len(tags) for _, _, tags, _ in scanned),
+        'distinct_images': len(distinct),
+        'captioned': sum(1 for result in captions.values() if 'error' not in result),
+        'cached': sum(1 for result in captions.values() if result.get('cached')),
+        'failed': len(report['errors'])
+    }
+    return report
@@ -0,0 +1,154 @@
+import threading
+import queue
+import time
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+class CaptionBatcher:
+    """
+    Micro-batching front-end for a batched inference function.
+
+    Callers submit single items from any thread. A background worker collects
+    up to `max_batch_size` items, or waits at most `max_wait_ms` after the
+    first item arrived, runs `batch_fn` once on the whole batch and hands each
+    caller its own result.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=20):
+        """
+        Args:
+            batch_fn (callable): Takes a list of items, returns a list of results in the same order
+            max_batch_size (int): Maximum number of items per batch
+            max_wait_ms (float): Maximum time to wait for a batch to fill, in milliseconds
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'items': 0,
+            'errors': 0,
+            'max_batch_size_seen': 0,
+            'batch_size_counts': {},
+            'total_queue_wait': 0.0,
+            'max_queue_wait': 0.0,
+            'total_batch_time': 0.0
+        }
+
+    def submit(self, item):
+        """
+        Queue a single item for batched processing.
+        Args:
+            item: Input for batch_fn
+        Returns:
+            concurrent.futures.Future: Resolves to the item's result
+        """
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def process(self, item, timeout=None):
+        """
+        Process a single item and block until its result is ready.
+        Args:
+            item: Input for batch_fn
+            timeout (float): Optional maximum time to wait, in seconds
+        Returns:
+            The result for this item
+        """
+        return self.submit(item).result(timeout=timeout)
+
+    def get_stats(self):
+        """
+        Get batch-size and queue-wait statistics.
+        Returns:
+            dict: Batching statistics
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats['batch_size_counts'] = dict(self._stats['batch_size_counts'])
+
+        batches = stats['batches']
+        items = stats['items']
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self._queue.qsize(),
+            'batches': batches,
+            'items': items,
+            'errors': stats['errors'],
+            'avg_batch_size': items / batches if batches else 0.0,
+            'max_batch_size_seen': stats['max_batch_size_seen'],
+            'batch_size_counts': stats['batch_size_counts'],
+            'avg_queue_wait_ms': (stats['total_queue_wait'] / items) * 1000.0 if items else 0.0,
+            'max_queue_wait_ms': stats['max_queue_wait'] * 1000.0,
+            'avg_batch_time_ms': (stats['total_batch_time'] / batches) * 1000.0 if batches else 0.0
+        }
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='caption-batcher', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """Worker loop: collect a batch, then process it"""
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = first[2] + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._process_batch(batch)
+
+    def _process_batch(self, batch):
+        """Run batch_fn on a collected batch and resolve every caller's future"""
+        started = time.perf_counter()
+        items = [entry[0] for entry in batch]
+        waits = [started - entry[2] for entry in batch]
+        failed = False
+
+        try:
+            results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise ValueError(f"Batch function returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            failed = True
+            logger.error(f"Error processing batch of {len(items)}: {str(e)}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+        elapsed = time.perf_counter() - started
+        size = len(batch)
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['items'] += size
+            if failed:
+                self._stats['errors'] += 1
+            self._stats['max_batch_size_seen'] = max(self._stats['max_batch_size_seen'], size)
+            self._stats['batch_size_counts'][size] = self._stats['batch_size_counts'].get(size, 0) + 1
+            self._stats['total_queue_wait'] += sum(waits)
+            self._stats['max_queue_wait'] = max(self._stats['max_queue_wait'], max(waits))
+            self._stats['total_batch_time'] += elapsed
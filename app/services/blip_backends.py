@@ -0,0 +1,168 @@
+"""
+CPU inference backends for the BLIP captioning model.
+
+    eager   fp32 PyTorch model, as loaded by transformers
+    int8    Linear layers dynamically quantized to int8 (weights stored int8,
+            activations quantized on the fly); the quantized weights are
+            cached on disk so later starts skip the fp32 weight load
+    traced  the vision encoder, which does most of the work per image, is
+            traced to a frozen TorchScript graph and cached on disk; the
+            autoregressive text decoder stays eager. The graph is traced at
+            batch size 1 and checked against eager on a larger batch when
+            loaded; if it does not generalize, other batch sizes run eager
+"""
+import os
+import logging
+import torch
+import transformers
+from transformers import BlipConfig, BlipForConditionalGeneration
+from transformers.modeling_utils import no_init_weights
+from app.utils.cache_utils import make_cache_key
+
+logger = logging.getLogger(__name__)
+
+BLIP_BACKENDS = ('eager', 'int8', 'traced')
+
+TRACE_BATCH_SIZE = 1  # Batch size of the traced example input
+CHECK_BATCH_SIZE = 3  # Batch size the graph is checked against eager with
+
+class TracedVisionModel(torch.nn.Module):
+    """Stands in for BlipVisionModel inside generate(), which only reads outputs[0]"""
+
+    def __init__(self, graph, eager=None):
+        """
+        Args:
+            graph: Frozen TorchScript vision encoder
+            eager (torch.nn.Module): Vision encoder for batch sizes the graph was not traced at,
+                or None if the graph handles any batch size
+        """
+        super().__init__()
+        self.graph = graph
+        self.eager = eager
+
+    def forward(self, pixel_values=None, **kwargs):
+        if self.eager is not None and pixel_values.shape[0] != TRACE_BATCH_SIZE:
+            return (self.eager(pixel_values),)
+        return (self.graph(pixel_values),)
+
+class _VisionEncoder(torch.nn.Module):
+    """Tracing wrapper returning only the last hidden state"""
+
+    def __init__(self, vision_model):
+        super().__init__()
+        self.vision_model = vision_model
+
+    def forward(self, pixel_values):
+        return self.vision_model(pixel_values=pixel_values, return_dict=False)[0]
+
+def _batch_independent(graph, encoder, image_size):
+    """
+    Whether a graph traced at TRACE_BATCH_SIZE matches eager on a batch of another size.
+    Tracing can bake the example's batch size into reshapes, which would fail or,
+    worse, mix images up when the caption batcher sends several at once.
+    """
+    generator = torch.Generator().manual_seed(0)
+    pixel_values = torch.randn(CHECK_BATCH_SIZE, 3, image_size, image_size, generator=generator)
+    with torch.no_grad():
+        try:
+            traced = graph(pixel_values)
+        except RuntimeError:
+            return False
+        return traced.shape[0] == CHECK_BATCH_SIZE and torch.allclose(traced, encoder(pixel_values), atol=1e-4)
+
+def artifact_path(artifact_dir, model_name, backend, filename):
+    """
+    Location of a converted artifact.
+    The directory is keyed by model and library versions, so upgrading
+    torch or transformers rebuilds the artifact instead of loading a stale one.
+    """
+    key = make_cache_key(model_name, backend, torch.__version__, transformers.__version__)[:16]
+    return os.path.join(artifact_dir, f"{backend}-{key}", filename)
+
+def _save_atomic(save_fn, path):
+    """Write an artifact through a temp file so a crash never leaves a partial one"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    save_fn(tmp_path)
+    os.replace(tmp_path, path)
+
+def _quantize(model):
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_int8(model_name, artifact_dir):
+    """
+    Dynamically quantized model, from the disk cache when available.
+    Returns:
+        tuple: (model, True if loaded from cache)
+    """
+    path = artifact_path(artifact_dir, model_name, 'int8', 'model.pt')
+    if os.path.exists(path):
+        try:
+            # Build the quantized structure without initializing fp32 weights, then fill it
+            with no_init_weights():
+                model = BlipForConditionalGeneration(BlipConfig.from_pretrained(model_name))
+            model = _quantize(model.eval())
+            model.load_state_dict(torch.load(path, weights_only=False))
+            return model.eval(), True
+        except Exception as e:
+            logger.warning(f"Ignoring unusable int8 artifact {path}: {str(e)}")
+
+    model = _quantize(BlipForConditionalGeneration.from_pretrained(model_name).eval())
+    _save_atomic(lambda tmp_path: torch.save(model.state_dict(), tmp_path), path)
+    return model.eval(), False
+
+def load_traced(model_name, artifact_dir):
+    """
+    Eager model whose vision encoder is a frozen TorchScript graph.
+    Returns:
+        tuple: (model, True if the graph was loaded from cache)
+    """
+    model = BlipForConditionalGeneration.from_pretrained(model_name).eval()
+    path = artifact_path(artifact_dir, model_name, 'traced', 'vision.pt')
+
+    graph = None
+    if os.path.exists(path):
+        try:
+            graph = torch.jit.load(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unusable traced artifact {path}: {str(e)}")
+    cached = graph is not None
+
+    size = model.config.vision_config.image_size
+    encoder = _VisionEncoder(model.vision_model).eval()
+    if graph is None:
+        example = torch.zeros(TRACE_BATCH_SIZE, 3, size, size)
+        with torch.no_grad():
+            graph = torch.jit.trace(encoder, example, check_trace=False)
+            graph = torch.jit.freeze(graph)
+        _save_atomic(lambda tmp_path: torch.jit.save(graph, tmp_path), path)
+
+    if _batch_independent(graph, encoder, size):
+        model.vision_model = TracedVisionModel(graph)
+    else:
+        logger.warning(f"Traced BLIP vision encoder is fixed to batch size {TRACE_BATCH_SIZE}; other batch sizes run eager")
+        model.vision_model = TracedVisionModel(graph, eager=encoder)
+    return model, cached
+
+def load_blip_model(model_name, backend='eager', artifact_dir=None):
+    """
+    Load the captioning model for a backend.
+    Args:
+        model_name (str): Hugging Face model name or local path
+        backend (str): One of BLIP_BACKENDS
+        artifact_dir (str): Directory for converted artifacts
+    Returns:
+        tuple: (model in eval mode, True if a converted artifact came from disk)
+    """
+    if backend == 'eager':
+        return BlipForConditionalGeneration.from_pretrained(model_name).eval(), False
+    if backend == 'int8':
+        return load_int8(model_name, artifact_dir)
+    if backend == 'traced':
+        return load_traced(model_name, artifact_dir)
+    raise ValueError(f"Unknown BLIP backend '{backend}'. Supported backends: {', '.join(BLIP_BACKENDS)}")
+
+def set_num_threads(num_threads):
+    """Set torch's intra-op thread count; 0 keeps the default (one per core)"""
+    if num_threads and num_threads > 0:
+        torch.set_num_threads(int(num_threads))
@@ -0,0 +1,181 @@
+import io
+import zipfile
+import logging
+from concurrent.futures import wait, FIRST_COMPLETED
+from app.services.executor_service import submit
+from app.services.image_service import LowQualityImageError
+from app.services.analysis_pipelines import response_metadata
+from app.services.text_service import analyze_sentiment_batch
+from app.utils.file_utils import allowed_file, validate_image
+from app.utils.upload_utils import ingest_bytes
+from config.config import BULK_CONCURRENCY, BULK_MAX_FILES, BULK_MAX_IMAGE_BYTES
+
+logger = logging.getLogger(__name__)
+
+# (code, message) of files that are reported but not analyzed
+FILE_TOO_LARGE = ('FILE_TOO_LARGE', 'Image exceeds the maximum size')
+TOO_MANY_FILES = ('TOO_MANY_FILES', f'Skipped: more than {BULK_MAX_FILES} files in one upload')
+
+def iter_uploaded_images(files=(), archive=None):
+    """
+    Yield every image in a bulk upload.
+
+    Upload streams are read up front (they are closed once the view returns,
+    before a streamed response finishes); zip members are decompressed lazily.
+
+    Args:
+        files (list): Uploaded FileStorage objects
+        archive (FileStorage): Optional zip archive of images
+    Returns:
+        generator: (filename, image bytes or None, (code, message) error or None) tuples;
+                   files past BULK_MAX_FILES are yielded with a TOO_MANY_FILES error
+    """
+    uploads = [(file.filename, file.read(BULK_MAX_IMAGE_BYTES + 1)) for file in files[:BULK_MAX_FILES]]
+    skipped = [file.filename for file in files[BULK_MAX_FILES:]]
+    archive_data = io.BytesIO(archive.read()) if archive is not None else None
+    return _iter_images(uploads, skipped, archive_data)
+
+def _iter_images(uploads, skipped, archive_data):
+    """Generator behind iter_uploaded_images"""
+    count = 0
+    for filename, data in uploads:
+        count += 1
+        if len(data) > BULK_MAX_IMAGE_BYTES:
+            yield filename, None, FILE_TOO_LARGE
+        else:
+            yield filename, data, None
+    for filename in skipped:
+        yield filename, None, TOO_MANY_FILES
+
+    if archive_data is None:
+        return
+
+    with zipfile.ZipFile(archive_data) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            if count >= BULK_MAX_FILES:
+                yield info.filename, None, TOO_MANY_FILES
+                continue
+            count += 1
+            if info.file_size > BULK_MAX_IMAGE_BYTES:
+                yield info.filename, None, FILE_TOO_LARGE
+                continue
+            with zf.open(info) as member:
+                data = member.read(BULK_MAX_IMAGE_BYTES + 1)
+            if len(data) > BULK_MAX_IMAGE_BYTES:
+                yield info.filename, None, FILE_TOO_LARGE
+            else:
+                yield info.filename, data, None
+
+def analyze_image_bytes(pipeline, filename, data, reject_low_quality=False, caption_tier=None):
+    """
+    Validate, decode and analyze one image from a bulk upload.
+    Args:
+        pipeline (Pipeline): Analysis pipeline taking image and image_hash
+        filename (str): Original filename
+        data (bytes): Image bytes
+        reject_low_quality (bool): Skip captioning if the image fails the quality checks
+        caption_tier (str): BLIP decoding tier, None for the configured default
+    Returns:
+        dict: Result line for this image
+    """
+    if not allowed_file(filename):
+        return {'filename': filename, 'success': False, 'error': 'Invalid file type', 'code': 'INVALID_TYPE'}
+    upload = ingest_bytes(data, filename)
+    if not validate_image(upload.stream):
+        return {'filename': filename, 'success': False, 'error': 'Invalid image file', 'code': 'INVALID_IMAGE'}
+
+    run = pipeline.run(
+        image=upload.open_image(), image_hash=upload.sha256,
+        reject_low_quality=reject_low_quality, caption_tier=caption_tier
+    )
+    quality_error = run.errors.get('quality')
+    if isinstance(quality_error, LowQualityImageError):
+        return {
+            'filename': filename,
+            'success': False,
+            'error': str(quality_error),
+            'code': 'LOW_QUALITY_IMAGE',
+            'quality': quality_error.metrics,
+            'metadata': run.metadata()
+        }
+    if run.errors:
+        return {
+            'filename': filename,
+            'success': False,
+            'error': '; '.join(f"{name}: {error}" for name, error in run.errors.items()),
+            'code': 'PROCESSING_ERROR',
+            'metadata': response_metadata(run)
+        }
+    # Caption details are reported in the metadata, not repeated in the data
+    data = {name: value for name, value in run.results.items() if name not in ('analysis_image', 'blip_caption')}
+    return {'filename': filename, 'success': True, 'data': data, 'metadata': response_metadata(run)}
+
+def add_sentiment(results):
+    """
+    Score the alt text of finished results with one batch sentiment call.
+    Args:
+        results (list): Result lines from analyze_image_bytes; successful ones gain data['sentiment']
+    """
+    scored = [result for result in results if result.get('success') and result['data'].get('alt_text')]
+    if not scored:
+        return
+    responses = analyze_sentiment_batch([result['data']['alt_text'] for result in scored])
+    for result, response in zip(scored, responses):
+        if response.get('success'):
+            result['data']['sentiment'] = response['data']['sentiment']
+
+def analyze_bulk(items, pipeline, concurrency=BULK_CONCURRENCY, reject_low_quality=False, caption_tier=None):
+    """
+    Analyze many images with bounded concurrency, yielding results as they finish.
+    Args:
+        items (iterable): (filename, bytes, error) tuples from iter_uploaded_images
+        pipeline (Pipeline): Analysis pipeline taking image and image_hash
+        concurrency (int): Maximum number of images in flight
+        reject_low_quality (bool): Skip captioning for images that fail the quality checks
+        caption_tier (str): BLIP decoding tier, None for the configured default
+    Yields:
+        dict: One result per image, in completion order, tagged with its upload index
+    """
+    concurrency = max(1, int(concurrency))
+    in_flight = {}
+    items = enumerate(items)
+    exhausted = False
+
+    while True:
+        # Keep the window full without reading the whole upload up front
+        while not exhausted and len(in_flight) < concurrency:
+            try:
+                index, (filename, data, error) = next(items)
+            except StopIteration:
+                exhausted = True
+                break
+            except Exception as e:
+                logger.error(f"Error reading bulk upload: {str(e)}")
+                exhausted = True
+                yield {'index': None, 'success': False, 'error': f'Error reading upload: {str(e)}', 'code': 'UPLOAD_READ_ERROR'}
+                break
+            if error:
+                code, message = error
+                yield {'index': index, 'filename': filename, 'success': False, 'error': message, 'code': code}
+                continue
+            in_flight[submit(analyze_image_bytes, pipeline, filename, data, reject_low_quality, caption_tier)] = (index, filename)
+
+        if not in_flight:
+            return
+
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        finished = []
+        for future in done:
+            index, filename = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Error analyzing {filename}: {str(e)}")
+                result = {'filename': filename, 'success': False, 'error': str(e), 'code': 'PROCESSING_ERROR'}
+            result['index'] = index
+            finished.append(result)
+        # Images that finished together share one sentiment call
+        add_sentiment(finished)
+        yield from finished
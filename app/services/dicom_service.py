@@ -0,0 +1,259 @@
+"""
+DICOM loading for the medical pipeline.
+
+The header is parsed with pydicom, stopping before the pixel data. The pixel
+data is then mapped, not read: frames are numpy views into a memory map of the
+upload's temp file (or into its in-memory buffer, for small uploads). So
+only the frames that are used get paged in, and the pages of each frame are
+released again once it has been windowed. A multi-frame study of any size is
+processed with about one frame in memory at a time.
+
+Each frame goes from stored values to an 8-bit grayscale image as follows:
+
+    bits stored   high bits outside BitsStored are masked (sign-extended if signed)
+    modality LUT  RescaleSlope / RescaleIntercept
+    VOI LUT       linear window/level (PS3.3 C.11.2.1.2) from the request, the
+                  file's WindowCenter/WindowWidth, or the frame's min/max
+    MONOCHROME1   inverted, so that higher values are brighter
+
+Uncompressed transfer syntaxes only; compressed (encapsulated) pixel data
+cannot be mapped and is rejected.
+"""
+import io
+import os
+import mmap
+import struct
+import logging
+import numpy as np
+import pydicom
+from pydicom.errors import InvalidDicomError
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+IMPLICIT_VR_LITTLE_ENDIAN = '1.2.840.10008.1.2'
+PIXEL_DATA_TAG = (0x7FE0, 0x0010)
+
+# Transfer syntax -> byte order of the pixel data
+UNCOMPRESSED_SYNTAXES = {
+    '1.2.840.10008.1.2': '<',    # Implicit VR Little Endian
+    '1.2.840.10008.1.2.1': '<',  # Explicit VR Little Endian
+    '1.2.840.10008.1.2.2': '>'   # Explicit VR Big Endian
+}
+
+class DicomError(ValueError):
+    """A DICOM file that cannot be turned into images"""
+
+def is_dicom(source):
+    """
+    Whether a file or stream starts like a DICOM Part 10 file ('DICM' after the 128-byte preamble).
+    Args:
+        source: Path or seekable binary stream; a stream's position is restored
+    Returns:
+        bool: True for DICOM
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            header = f.read(132)
+    else:
+        position = source.tell()
+        header = source.read(132)
+        source.seek(position)
+    return len(header) == 132 and header[128:] == b'DICM'
+
+def _first(value):
+    """First value of a possibly multi-valued element"""
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, pydicom.multival.MultiValue)):
+        return float(value[0]) if len(value) else None
+    return float(value)
+
+class DicomVolume:
+    """Lazily mapped frames of a DICOM file"""
+
+    def __init__(self, source):
+        """
+        Args:
+            source: Path or seekable binary stream of the file (an upload's stream)
+        """
+        self._file = None
+        self._map = None
+        if isinstance(source, (str, os.PathLike)):
+            self._file = source = open(source, 'rb')
+        try:
+            source.seek(0)
+            # Leaves the stream at the pixel data element
+            self.dataset = pydicom.dcmread(source, stop_before_pixels=True)
+            self._map_pixels(source)
+        except InvalidDicomError as e:
+            self.close()
+            raise DicomError(f"Invalid DICOM file: {str(e)}")
+        except Exception:
+            self.close()
+            raise
+
+    def _map_pixels(self, source):
+        ds = self.dataset
+        syntax = str(ds.file_meta.get('TransferSyntaxUID', ''))
+        if syntax not in UNCOMPRESSED_SYNTAXES:
+            raise DicomError(f"Unsupported transfer syntax {syntax or 'unknown'}; only uncompressed DICOM is supported")
+        byte_order = UNCOMPRESSED_SYNTAXES[syntax]
+        position = source.tell()
+        header = source.read(12)
+        if len(header) < 8 or struct.unpack(f"{byte_order}HH", header[:4]) != PIXEL_DATA_TAG:
+            raise DicomError("DICOM file has no pixel data")
+        if syntax == IMPLICIT_VR_LITTLE_ENDIAN:
+            length, self.offset = struct.unpack('<I', header[4:8])[0], position + 8
+        else:
+            # Explicit VR: OB/OW carry two reserved bytes and a 32-bit length
+            length, self.offset = struct.unpack(f"{byte_order}I", header[8:12])[0], position + 12
+        if length == 0xFFFFFFFF:
+            raise DicomError("Encapsulated (compressed) pixel data is not supported")
+
+        self.rows = int(ds.Rows)
+        self.columns = int(ds.Columns)
+        self.frames = int(ds.get('NumberOfFrames') or 1)
+        self.samples = int(ds.get('SamplesPerPixel') or 1)
+        self.bits_allocated = int(ds.BitsAllocated)
+        self.bits_stored = int(ds.get('BitsStored') or self.bits_allocated)
+        self.signed = int(ds.get('PixelRepresentation') or 0) == 1
+        self.photometric = str(ds.get('PhotometricInterpretation', 'MONOCHROME2'))
+        if self.bits_allocated not in (8, 16, 32):
+            raise DicomError(f"Unsupported BitsAllocated {self.bits_allocated}")
+        if self.samples not in (1, 3):
+            raise DicomError(f"Unsupported SamplesPerPixel {self.samples}")
+
+        itemsize = self.bits_allocated // 8
+        self.dtype = np.dtype(f"{byte_order}{'i' if self.signed else 'u'}{itemsize}")
+        self.frame_bytes = self.rows * self.columns * self.samples * itemsize
+        if length < self.frame_bytes * self.frames:
+            raise DicomError("Pixel data is shorter than Rows x Columns x NumberOfFrames")
+
+        raw = getattr(source, '_file', source)  # SpooledTemporaryFile wraps a BytesIO or a real file
+        if isinstance(raw, io.BytesIO):
+            self._map = raw.getbuffer()
+        else:
+            self._map = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < self.offset + self.frame_bytes * self.frames:
+            raise DicomError("DICOM file is truncated")
+        shape = (self.frames, self.rows, self.columns)
+        self.planar = self.samples == 3 and int(ds.get('PlanarConfiguration') or 0) == 1
+        if self.samples == 3:
+            shape = (self.frames, 3, self.rows, self.columns) if self.planar else shape + (3,)
+        self.pixels = np.ndarray(shape, dtype=self.dtype, buffer=self._map, offset=self.offset)
+
+    def metadata(self):
+        """
+        Technical attributes of the study (no patient identifiers)
+        Returns:
+            dict: Modality, body part, geometry, bit depth and the file's window
+        """
+        ds = self.dataset
+        return {
+            'modality': str(ds.get('Modality', '')) or None,
+            'body_part': str(ds.get('BodyPartExamined', '')) or None,
+            'rows': self.rows,
+            'columns': self.columns,
+            'frames': self.frames,
+            'bits_stored': self.bits_stored,
+            'photometric_interpretation': self.photometric,
+            'window_center': _first(ds.get('WindowCenter')),
+            'window_width': _first(ds.get('WindowWidth'))
+        }
+
+    def _stored_values(self, index):
+        """One frame as stored values in float32, with unused high bits removed"""
+        frame = self.pixels[index]
+        if self.planar:
+            frame = frame.transpose(1, 2, 0)
+        if self.bits_stored < self.bits_allocated and self.samples == 1:
+            itemsize = self.dtype.itemsize
+            shift = self.bits_allocated - self.bits_stored
+            unsigned = frame.astype(f"=u{itemsize}")
+            if self.signed:
+                frame = (unsigned << shift).view(f"=i{itemsize}") >> shift
+            else:
+                frame = unsigned & ((1 << self.bits_stored) - 1)
+        return frame.astype(np.float32)
+
+    def window(self, center=None, width=None):
+        """
+        Window used for a request: explicit values first, then the file's own window.
+        Returns:
+            tuple: (center, width), or (None, None) to scale each frame by its min/max
+        """
+        if center is not None and width is not None:
+            return float(center), max(1.0, float(width))
+        file_center, file_width = _first(self.dataset.get('WindowCenter')), _first(self.dataset.get('WindowWidth'))
+        if file_center is not None and file_width is not None and file_width >= 1:
+            return file_center, file_width
+        return None, None
+
+    def frame_image(self, index, center=None, width=None):
+        """
+        Render one frame as an 8-bit RGB image for BLIP.
+        Args:
+            index (int): Frame index
+            center (float): Window center in modality units, None for the default window
+            width (float): Window width in modality units
+        Returns:
+            PIL.Image: The windowed frame
+        """
+        values = self._stored_values(index)
+        if self.samples == 3:
+            image = Image.fromarray(np.clip(values, 0, 255).astype(np.uint8), 'RGB')
+        else:
+            slope = float(self.dataset.get('RescaleSlope') or 1.0)
+            intercept = float(self.dataset.get('RescaleIntercept') or 0.0)
+            values = values * slope + intercept
+            center, width = self.window(center, width)
+            if center is None:
+                low, high = float(values.min()), float(values.max())
+                center, width = (low + high) / 2.0 + 0.5, max(1.0, high - low + 1.0)
+            scaled = np.clip((values - (center - 0.5)) / (width - 1.0 if width > 1 else 1.0) + 0.5, 0.0, 1.0)
+            if self.photometric == 'MONOCHROME1':
+                scaled = 1.0 - scaled
+            image = Image.fromarray((scaled * 255.0 + 0.5).astype(np.uint8), 'L').convert('RGB')
+        self.release(index)
+        return image
+
+    def release(self, index):
+        """Drop a frame's pages from memory (they are paged in again if the frame is read again)"""
+        if not isinstance(self._map, mmap.mmap) or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        start = self.offset + index * self.frame_bytes
+        aligned = start - start % mmap.PAGESIZE
+        self._map.madvise(mmap.MADV_DONTNEED, aligned, start + self.frame_bytes - aligned)
+
+    def sample_frames(self, count):
+        """
+        Evenly spaced frame indices, first and last included.
+        Args:
+            count (int): Maximum number of frames
+        Returns:
+            list: Sorted frame indices
+        """
+        if self.frames <= count:
+            return list(range(self.frames))
+        return sorted({int(index) for index in np.linspace(0, self.frames - 1, max(1, count)).round()})
+
+    def close(self):
+        """Unmap the pixel data"""
+        self.pixels = None
+        if self._map is not None:
+            try:
+                self._map.release() if isinstance(self._map, memoryview) else self._map.close()
+            except BufferError:
+                # A caller still holds a view of a frame; the map goes when it does
+                pass
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
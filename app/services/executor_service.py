@@ -0,0 +1,84 @@
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from config.config import EXECUTOR_MAX_WORKERS
+from app.services.profiling_service import run_attached
+
+logger = logging.getLogger(__name__)
+
+# Shared worker pool for running independent service calls concurrently
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_MAX_WORKERS, thread_name_prefix='service-worker')
+
+def submit(fn, *args, **kwargs):
+    """
+    Submit a call to the shared worker pool, carrying over the caller's context variables
+    (and, for a profiled request, its profile).
+    Args:
+        fn (callable): Function to run
+        *args, **kwargs: Arguments for fn
+    Returns:
+        concurrent.futures.Future: Future for the call's result
+    """
+    context = contextvars.copy_context()
+    return executor.submit(context.run, run_attached, fn, *args, **kwargs)
+
+def _timed_call(fn):
+    """Run fn and return (value, error, elapsed seconds)"""
+    started = time.perf_counter()
+    try:
+        return fn(), None, time.perf_counter() - started
+    except Exception as e:
+        return None, e, time.perf_counter() - started
+
+def run_concurrently(tasks, timeout=None):
+    """
+    Run independent zero-argument callables concurrently on the shared pool.
+
+    A failing or timed-out task does not affect the others: every task gets
+    its own result entry. If the pool is saturated, tasks that have not
+    started yet are run in the calling thread instead, so nested use from
+    inside a pool worker cannot deadlock.
+
+    Args:
+        tasks (dict): Task name -> zero-argument callable
+        timeout (float or dict): Per-call timeout in seconds, or task name -> timeout
+    Returns:
+        dict: Task name -> {'value', 'error', 'elapsed_ms', 'timed_out'}
+    """
+    submitted = time.perf_counter()
+    futures = {name: submit(_timed_call, fn) for name, fn in tasks.items()}
+    results = {}
+
+    for name, future in futures.items():
+        task_timeout = timeout.get(name) if isinstance(timeout, dict) else timeout
+
+        if future.cancel():
+            # No free worker picked it up; run it here rather than wait for one
+            value, error, elapsed = _timed_call(tasks[name])
+        else:
+            try:
+                remaining = None
+                if task_timeout is not None:
+                    remaining = max(0.0, submitted + task_timeout - time.perf_counter())
+                value, error, elapsed = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                logger.error(f"Task '{name}' timed out after {task_timeout}s")
+                results[name] = {
+                    'value': None,
+                    'error': TimeoutError(f"'{name}' timed out after {task_timeout}s"),
+                    'elapsed_ms': (time.perf_counter() - submitted) * 1000.0,
+                    'timed_out': True
+                }
+                continue
+
+        if error is not None:
+            logger.error(f"Task '{name}' failed: {str(error)}")
+        results[name] = {
+            'value': value,
+            'error': error,
+            'elapsed_ms': elapsed * 1000.0,
+            'timed_out': False
+        }
+
+    return results
@@ -0,0 +1,272 @@
+"""
+Fetching images by URL.
+
+One pooled HTTP client streams the body into a spooled buffer, hashing it on
+the way, and stops as soon as it exceeds IMAGE_FETCH_MAX_BYTES or the overall
+IMAGE_FETCH_TIMEOUT. The result is an Upload, so it decodes from that buffer
+like an uploaded file.
+
+URLs come from users (and from the img srcs of audited pages), so redirects
+are followed one hop at a time and every hop's host must resolve to public
+addresses only: private, loopback, link-local and other reserved ranges are
+refused unless IMAGE_FETCH_ALLOW_PRIVATE is set.
+
+Fetched images are cached by URL together with their ETag and Last-Modified
+validators. The next fetch of the same URL is a conditional request, and a
+304 reuses the cached bytes. The image hash is then unchanged too, so the
+caption cache answers without running BLIP again. Bodies larger than
+IMAGE_FETCH_CACHE_MAX_BODY are not cached; they are downloaded again.
+"""
+import os
+import time
+import socket
+import hashlib
+import logging
+import tempfile
+import threading
+import ipaddress
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import httpx
+from config.config import (
+    CACHE_DIR,
+    UPLOAD_SPOOL_MAX_MEMORY,
+    IMAGE_FETCH_TIMEOUT,
+    IMAGE_FETCH_CONNECT_TIMEOUT,
+    IMAGE_FETCH_MAX_BYTES,
+    IMAGE_FETCH_MAX_CONNECTIONS,
+    IMAGE_FETCH_MAX_REDIRECTS,
+    IMAGE_FETCH_CACHE_ENABLED,
+    IMAGE_FETCH_CACHE_MAX_BYTES,
+    IMAGE_FETCH_CACHE_MAX_BODY,
+    IMAGE_FETCH_ALLOW_PRIVATE
+)
+from app.utils.cache_utils import SQLiteCache, make_cache_key
+from app.utils.upload_utils import Upload, ingest_bytes
+from app.utils.metrics_utils import component_duration, register_cache
+
+logger = logging.getLogger(__name__)
+
+class ImageFetchError(Exception):
+    """A URL that could not be fetched as an image"""
+
+    def __init__(self, message, code='URL_DOWNLOAD_ERROR', status_code=400):
+        """
+        Args:
+            message (str): Error message for the client
+            code (str): Error code for the client
+            status_code (int): HTTP status to answer with
+        """
+        super().__init__(message)
+        self.code = code
+        self.status_code = status_code
+
+class ImageFetcher:
+    """Pooled, size-capped image downloads with a conditional-request cache"""
+
+    def __init__(self, timeout=20.0, connect_timeout=5.0, max_bytes=16 * 1024 * 1024, max_connections=20,
+                 max_redirects=5, cache=None, cache_max_body=2 * 1024 * 1024, allow_private=False):
+        """
+        Args:
+            timeout (float): Seconds for the whole fetch, body included
+            connect_timeout (float): Seconds to establish a connection
+            max_bytes (int): Larger bodies are rejected
+            max_connections (int): Connection pool size
+            max_redirects (int): Redirects followed per fetch
+            cache (SQLiteCache): Cache of validators and bodies, or None
+            cache_max_body (int): Larger bodies are not cached
+            allow_private (bool): Allow hosts that resolve to private, loopback or link-local addresses
+        """
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_redirects = max_redirects
+        self.cache = cache
+        self.cache_max_body = cache_max_body
+        self.allow_private = allow_private
+        # Redirects are followed by _stream, so each hop's destination is checked
+        self.client = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=False,
+            headers={'Accept': 'image/*'}
+        )
+        self._lock = threading.Lock()
+        self._stats = {'fetches': 0, 'downloads': 0, 'not_modified': 0, 'failures': 0, 'bytes_downloaded': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _cached(self, url):
+        """Stored validators and body of a URL, or (None, None)"""
+        if self.cache is None:
+            return None, None
+        entry = self.cache.get(make_cache_key('image_url', url))
+        if entry is None:
+            return None, None
+        # Bodies are stored by hash, so the same image behind several URLs is kept once
+        body = self.cache.get(make_cache_key('image_body', entry['sha256']))
+        return (entry, body) if body is not None else (None, None)
+
+    def _store(self, url, response, upload):
+        if self.cache is None:
+            return
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        if upload.size > self.cache_max_body:
+            return
+        self.cache.set(make_cache_key('image_body', upload.sha256), upload.read())
+        upload.stream.seek(0)
+        self.cache.set(make_cache_key('image_url', url), {
+            'etag': etag, 'last_modified': last_modified, 'sha256': upload.sha256, 'filename': upload.filename
+        })
+
+    def _check_destination(self, url):
+        """
+        Refuse URLs whose host resolves to a non-public address.
+        Args:
+            url (httpx.URL): URL about to be requested
+        """
+        if url.scheme not in ('http', 'https') or not url.host:
+            raise ImageFetchError('Only http and https image URLs are supported', 'URL_INVALID')
+        if self.allow_private:
+            return
+        try:
+            addresses = socket.getaddrinfo(url.raw_host.decode('ascii'), url.port or (443 if url.scheme == 'https' else 80),
+                                           type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            raise ImageFetchError('Could not resolve the image URL host')
+        for address in addresses:
+            ip = ipaddress.ip_address(address[4][0].split('%')[0])
+            if ip.version == 6 and ip.ipv4_mapped:
+                ip = ip.ipv4_mapped
+            if not ip.is_global or ip.is_multicast:
+                raise ImageFetchError('Image URL points to a private or local address', 'URL_FORBIDDEN', 403)
+
+    @contextmanager
+    def _stream(self, url, headers):
+        """
+        Open a streamed GET, following redirects only to public destinations.
+        Args:
+            url (str): URL to fetch
+            headers (dict): Extra request headers
+        Returns:
+            httpx.Response: The final, non-redirect response; closed on exit
+        """
+        request = self.client.build_request('GET', url, headers=headers)
+        for _ in range(self.max_redirects + 1):
+            self._check_destination(request.url)
+            response = self.client.send(request, stream=True)
+            # Set by httpx on redirects it would otherwise have followed
+            if response.next_request is None:
+                break
+            response.close()
+            request = response.next_request
+        else:
+            raise ImageFetchError('Too many redirects fetching image from URL')
+        try:
+            yield response
+        finally:
+            response.close()
+
+    def fetch(self, url):
+        """
+        Fetch an image URL.
+        Args:
+            url (str): http(s) URL of the image
+        Returns:
+            Upload: The image bytes, in memory or spilled to a temp file
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            raise ImageFetchError('Only http and https image URLs are supported', 'URL_INVALID')
+
+        self._count('fetches')
+        started = time.perf_counter()
+        entry, body = self._cached(url)
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            with self._stream(url, headers) as response:
+                if response.status_code == 304 and body is not None:
+                    self._count('not_modified')
+                    return ingest_bytes(body, entry.get('filename'))
+                if response.status_code != 200:
+                    raise ImageFetchError(f'Failed to download image from URL (HTTP {response.status_code})')
+                upload = self._read_body(response, started, os.path.basename(parts.path) or None)
+                self._store(url, response, upload)
+                return upload
+        except ImageFetchError:
+            self._count('failures')
+            raise
+        except httpx.TimeoutException:
+            self._count('failures')
+            raise ImageFetchError('Timed out downloading image from URL', 'URL_TIMEOUT', 504)
+        except httpx.HTTPError as e:
+            self._count('failures')
+            raise ImageFetchError(f'Failed to download image from URL: {str(e)}')
+        finally:
+            component_duration.observe(time.perf_counter() - started, 'image_fetch')
+
+    def _read_body(self, response, started, filename):
+        """Stream a response body into a spooled buffer, enforcing the size cap and overall timeout"""
+        declared = response.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise ImageFetchError('Image at URL is too large', 'URL_TOO_LARGE', 413)
+
+        buffer = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY, mode='rb+')
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            for chunk in response.iter_bytes():
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise ImageFetchError('Image at URL is too large', 'URL_TOO_LARGE', 413)
+                if time.perf_counter() - started > self.timeout:
+                    raise ImageFetchError('Timed out downloading image from URL', 'URL_TIMEOUT', 504)
+                digest.update(chunk)
+                buffer.write(chunk)
+        except BaseException:
+            buffer.close()
+            raise
+        buffer.seek(0)
+        self._count('downloads')
+        self._count('bytes_downloaded', size)
+        return Upload(buffer, filename, digest.hexdigest(), size)
+
+    def get_stats(self):
+        """
+        Get fetch, download, revalidation and failure counters
+        Returns:
+            dict: Fetcher statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['cache'] = self.cache.get_stats() if self.cache is not None else None
+        return stats
+
+    def get_cache_stats(self):
+        """Revalidated fetches as hits, full downloads as misses"""
+        if self.cache is None:
+            return None
+        with self._lock:
+            return {'hits': self._stats['not_modified'], 'misses': self._stats['downloads']}
+
+    def close(self):
+        self.client.close()
+
+image_fetcher = ImageFetcher(
+    IMAGE_FETCH_TIMEOUT, IMAGE_FETCH_CONNECT_TIMEOUT, IMAGE_FETCH_MAX_BYTES, IMAGE_FETCH_MAX_CONNECTIONS,
+    IMAGE_FETCH_MAX_REDIRECTS,
+    SQLiteCache(os.path.join(CACHE_DIR, 'image_urls.sqlite3'), IMAGE_FETCH_CACHE_MAX_BYTES) if IMAGE_FETCH_CACHE_ENABLED else None,
+    IMAGE_FETCH_CACHE_MAX_BODY,
+    IMAGE_FETCH_ALLOW_PRIVATE
+)
+register_cache('image_url', image_fetcher.get_cache_stats)
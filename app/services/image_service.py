@@ -1,59 +1,252 @@
-from PIL import Image, ImageEnhance
+from PIL import Image, ImageEnhance, ImageFilter, ImageStat
 import numpy as np
-from transformers import BlipProcessor, BlipForConditionalGeneration
 import torch
-from config.config import BLIP_MODEL
+import os
+import time
+from itertools import groupby
+from config.config import (
+    BLIP_MODEL,
+    BLIP_BACKEND,
+    BLIP_NUM_THREADS,
+    BLIP_ARTIFACT_DIR,
+    BLIP_WARMUP_INFERENCE,
+    BLIP_IDLE_UNLOAD_SECONDS,
+    PREPROCESS_MODE,
+    PREPROCESS_TARGET_SIZE,
+    CAPTION_DEFAULT_TIER,
+    CAPTION_BATCH_SIZE,
+    CAPTION_BATCH_WAIT_MS,
+    CACHE_DIR,
+    CAPTION_CACHE_ENABLED,
+    CAPTION_CACHE_MEMORY_ENTRIES,
+    CAPTION_CACHE_MAX_BYTES
+)
+from app.services.batching_service import CaptionBatcher
+from app.services.model_manager import BlipModelManager
+from app.utils.cache_utils import LRUCache, SQLiteCache, TieredCache, make_cache_key
+from app.utils.metrics_utils import component_duration, register_cache
+from app.services.profiling_service import profile_span
+
+# Decoding parameters per latency tier; greedy decoding is cheapest, wider beams cost more per token
+CAPTION_TIERS = {
+    'fast': {'num_beams': 1, 'max_new_tokens': 20},
+    'balanced': {'num_beams': 3, 'max_new_tokens': 30, 'no_repeat_ngram_size': 3},
+    'quality': {'num_beams': 5, 'max_new_tokens': 50, 'min_new_tokens': 8, 'no_repeat_ngram_size': 3}
+}
+
+# Quality checks: longest side of the sample, blur and clipping thresholds
+QUALITY_SAMPLE_SIZE = 512
+MIN_SHARPNESS = 40.0  # Laplacian variance of the sample
+CLIP_MARGIN = 2  # Gray levels within this of 0 or 255 count as clipped
+MAX_CLIPPED_FRACTION = 0.25
+
+class LowQualityImageError(ValueError):
+    """Raised when an image fails the quality checks and the caller asked to reject it"""
+
+    def __init__(self, metrics):
+        super().__init__(f"Image rejected for low quality: {', '.join(metrics['issues'])}")
+        self.metrics = metrics
+
+# Weights of PIL's ImageFilter.SMOOTH, the blur ImageEnhance.Sharpness sharpens against
+_SMOOTH_KERNEL = (1, 1, 1, 1, 5, 1, 1, 1, 1)
+_SMOOTH_SCALE = 13
+
+def reduce_image(image, target_size, draft=False):
+    """
+    Shrink an image so its shorter side is about target_size.
+    With draft=True an unloaded JPEG is decoded at reduced scale (1/2, 1/4
+    or 1/8) by the JPEG decoder itself, so the full-resolution pixels are
+    never materialized. The decoder is configured on the image itself, so
+    the image then stays reduced for every other user of it.
+    Args:
+        image (PIL.Image): Input image
+        target_size (int): Shorter side to keep
+        draft (bool): Allow a reduced-scale decode of the input image in place
+    Returns:
+        PIL.Image: The reduced image (the input itself if already small enough)
+    """
+    width, height = image.size
+    scale = target_size / min(width, height)
+    if scale >= 1:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    # Configures the loader in place; a no-op for non-JPEG or already loaded images
+    if draft and image.format == 'JPEG':
+        image.draft('RGB', size)
+    if image.size != size:
+        image = image.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+    return image
+
+def enhance_image(image, contrast, sharpness):
+    """
+    Contrast then sharpness enhancement fused into one 3x3 convolution.
+    Equivalent to ImageEnhance.Contrast(image).enhance(contrast) followed by
+    ImageEnhance.Sharpness(...).enhance(sharpness), without the intermediate
+    full-size copies. Both steps are linear, so for contrast k and sharpness
+    1 + s: out = k * ((1 + s) * x - s * smooth(x)) + (1 - k) * mean.
+    Args:
+        image (PIL.Image): RGB input image
+        contrast (float): Contrast factor
+        sharpness (float): Sharpness factor
+    Returns:
+        PIL.Image: Enhanced image
+    """
+    mean = int(ImageStat.Stat(image.convert('L')).mean[0] + 0.5)
+    s = sharpness - 1.0
+    kernel = [
+        contrast * ((1 + s) * (i == 4) - s * weight / _SMOOTH_SCALE)
+        for i, weight in enumerate(_SMOOTH_KERNEL)
+    ]
+    enhanced = image.filter(ImageFilter.Kernel((3, 3), kernel, scale=1, offset=mean * (1 - contrast)))
+
+    # The convolution leaves the 1-pixel border untouched; give it the contrast step
+    width, height = image.size
+    if width > 2 and height > 2:
+        lut = [min(255, max(0, int(mean + contrast * (v - mean) + 0.5))) for v in range(256)] * len(image.getbands())
+        for box in ((0, 0, width, 1), (0, height - 1, width, height), (0, 1, 1, height - 1), (width - 1, 1, width, height - 1)):
+            enhanced.paste(image.crop(box).point(lut), box)
+    return enhanced
 
 class ImageProcessor:
     def __init__(self):
-        self.processor = BlipProcessor.from_pretrained(BLIP_MODEL)
-        self.model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL)
+        # The model is loaded on first use (or by warmup()), not at import time
+        self.models = BlipModelManager(
+            BLIP_MODEL,
+            backend=BLIP_BACKEND,
+            artifact_dir=BLIP_ARTIFACT_DIR,
+            num_threads=BLIP_NUM_THREADS,
+            warmup_inference=BLIP_WARMUP_INFERENCE,
+            idle_unload_seconds=BLIP_IDLE_UNLOAD_SECONDS
+        )
+        # Concurrent requests share one batched generate call
+        self.batcher = CaptionBatcher(
+            self._generate_captions,
+            max_batch_size=CAPTION_BATCH_SIZE,
+            max_wait_ms=CAPTION_BATCH_WAIT_MS
+        )
+        # Settings that change the caption for identical bytes; part of every cache key
+        self.preprocess_settings = {
+            'contrast': 1.2,
+            'sharpness': 1.1,
+            'mode': PREPROCESS_MODE,
+            'target_size': PREPROCESS_TARGET_SIZE if PREPROCESS_MODE == 'reduced' else None
+        }
+        # Decoding parameters per tier; also part of every cache key
+        self.caption_tiers = {name: dict(settings) for name, settings in CAPTION_TIERS.items()}
+        self.default_tier = CAPTION_DEFAULT_TIER
+        self.caption_cache = None
+        if CAPTION_CACHE_ENABLED:
+            self.caption_cache = TieredCache(
+                LRUCache(CAPTION_CACHE_MEMORY_ENTRIES),
+                SQLiteCache(os.path.join(CACHE_DIR, 'captions.sqlite3'), CAPTION_CACHE_MAX_BYTES)
+            )
         
     def preprocess_image(self, image):
         """
         Preprocess image for better analysis
+        In 'reduced' mode the image is first shrunk to about the model's
+        input size and then enhanced in one fused pass; 'full' enhances every
+        pixel of the original.
         Args:
             image (PIL.Image): Input image
         Returns:
             PIL.Image: Preprocessed image
         """
         try:
+            settings = self.preprocess_settings
+            if settings['mode'] == 'reduced':
+                # Pipelines pass the already reduced analysis_image; a draft decode only
+                # applies to images opened just for the caption
+                image = reduce_image(image, settings['target_size'], draft=True)
+
             # Convert to RGB if necessary
             if image.mode != 'RGB':
                 image = image.convert('RGB')
+
+            if settings['mode'] == 'reduced':
+                return enhance_image(image, settings['contrast'], settings['sharpness'])
             
             # Enhance image quality
             enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(1.2)
+            image = enhancer.enhance(settings['contrast'])
             
             enhancer = ImageEnhance.Sharpness(image)
-            image = enhancer.enhance(1.1)
+            image = enhancer.enhance(settings['sharpness'])
             
             return image
         except Exception as e:
             raise ValueError(f"Error preprocessing image: {str(e)}")
 
-    def validate_image_quality(self, image):
+    def analysis_image(self, image):
+        """
+        Decode an image once at the size both the quality checks and BLIP use.
+        In 'reduced' mode an unloaded JPEG is draft-decoded at 1/2, 1/4 or 1/8
+        scale by the JPEG decoder (see reduce_image), so its full-resolution
+        pixels are never decoded. The draft is configured on the input image,
+        so the caller should only use the returned image afterwards.
+        Args:
+            image (PIL.Image): Input image, used for nothing else by the caller
+        Returns:
+            dict: image (the reduced image) and resolution (original width, height)
+        """
+        resolution = image.size
+        if self.preprocess_settings['mode'] == 'reduced':
+            image = reduce_image(image, self.preprocess_settings['target_size'], draft=True)
+        return {'image': image, 'resolution': resolution}
+
+    def validate_image_quality(self, image, resolution=None):
         """
         Validate image quality metrics
+        Metrics come from a small copy of the image (reduced to the caption
+        input size) and Pillow's C-level statistics, so the full-resolution
+        pixels are never converted to a numpy array. The input image itself is
+        left as it is, for the stages that run after this one.
         Args:
             image (PIL.Image): Input image
+            resolution (tuple): Original size to report, when image is already reduced
         Returns:
             dict: Quality metrics
         """
         try:
-            # Convert image to numpy array
-            img_array = np.array(image)
-            
-            # Calculate basic metrics
-            brightness = np.mean(img_array)
-            contrast = np.std(img_array)
-            resolution = image.size
+            resolution = resolution or image.size
+
+            # Work on a small copy
+            small = image
+            if self.preprocess_settings['mode'] == 'reduced':
+                small = reduce_image(small, self.preprocess_settings['target_size'])
+            if max(small.size) > QUALITY_SAMPLE_SIZE:
+                small = small.copy()
+                small.thumbnail((QUALITY_SAMPLE_SIZE, QUALITY_SAMPLE_SIZE), Image.Resampling.BILINEAR)
+            if small.mode != 'RGB':
+                small = small.convert('RGB')
+            gray = small.convert('L')
+
+            # Mean and standard deviation over all channel values
+            stat = ImageStat.Stat(small)
+            brightness = float(np.mean(stat.mean))
+            contrast = float(np.sqrt(max(0.0, np.mean(np.add(stat.var, np.square(stat.mean))) - brightness ** 2)))
+
+            # Variance of the Laplacian: low values mean few edges, i.e. blur
+            pixels = np.asarray(gray, dtype=np.int32)
+            laplacian = (
+                pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:] - 4 * pixels[1:-1, 1:-1]
+            )
+            sharpness = float(laplacian.var()) if laplacian.size else 0.0
+
+            # Share of pure black and pure white pixels
+            histogram = gray.histogram()
+            total = float(sum(histogram)) or 1.0
+            clipped_shadows = sum(histogram[:CLIP_MARGIN + 1]) / total
+            clipped_highlights = sum(histogram[255 - CLIP_MARGIN:]) / total
             
             # Define quality thresholds
             quality_metrics = {
                 'brightness': brightness,
                 'contrast': contrast,
+                'sharpness': sharpness,
+                'clipped_shadows': clipped_shadows,
+                'clipped_highlights': clipped_highlights,
                 'resolution': resolution,
                 'is_valid': True,
                 'issues': []
@@ -68,6 +261,16 @@ class ImageProcessor:
             # Check contrast
             if contrast < 20:
                 quality_metrics['issues'].append('Low contrast')
+
+            # Check blur
+            if sharpness < MIN_SHARPNESS:
+                quality_metrics['issues'].append('Image blurry')
+
+            # Check clipping
+            if clipped_shadows > MAX_CLIPPED_FRACTION:
+                quality_metrics['issues'].append('Shadows clipped')
+            if clipped_highlights > MAX_CLIPPED_FRACTION:
+                quality_metrics['issues'].append('Highlights clipped')
                 
             # Check resolution
             min_resolution = 200 * 200
@@ -80,32 +283,134 @@ class ImageProcessor:
         except Exception as e:
             raise ValueError(f"Error validating image quality: {str(e)}")
 
-    def generate_alt_text(self, image):
+    def caption_cache_key(self, image_hash, tier):
+        """
+        Build the caption cache key for an image
+        Args:
+            image_hash (str): Hash of the uploaded image bytes
+            tier (str): Caption tier, see CAPTION_TIERS
+        Returns:
+            str: Cache key covering the model, backend and generation settings
+        """
+        return make_cache_key(
+            'caption', BLIP_MODEL, self.models.backend, self.preprocess_settings,
+            tier, self.caption_tiers[tier], image_hash
+        )
+
+    def resolve_tier(self, tier=None):
+        """
+        Validate a caption tier name
+        Args:
+            tier (str): Requested tier, or None for the configured default
+        Returns:
+            str: Tier name
+        """
+        tier = tier or self.default_tier
+        if tier not in self.caption_tiers:
+            raise ValueError(f"Unknown caption tier '{tier}'. Supported tiers: {', '.join(self.caption_tiers)}")
+        return tier
+
+    def caption(self, image, image_hash=None, tier=None):
+        """
+        Generate a caption and report how it was produced
+        Args:
+            image (PIL.Image): Input image
+            image_hash (str): Optional hash of the uploaded bytes, enables the caption cache
+            tier (str): Caption tier, see CAPTION_TIERS; None uses the default
+        Returns:
+            dict: alt_text, tier, decode_ms (None when cached) and cached
+        """
+        tier = self.resolve_tier(tier)
+        cache_key = None
+        if image_hash and self.caption_cache is not None:
+            cache_key = self.caption_cache_key(image_hash, tier)
+            cached = self.caption_cache.get(cache_key)
+            if cached is not None:
+                return {'alt_text': cached, 'tier': tier, 'decode_ms': None, 'cached': True}
+
+        # Preprocess image
+        with profile_span('preprocess_image'):
+            processed_image = self.preprocess_image(image)
+
+        # Generate alt text using BLIP (batched with concurrent requests of the same tier)
+        with profile_span('blip_batch_wait'):
+            alt_text, decode_ms = self.batcher.process((processed_image, tier))
+
+        if cache_key is not None:
+            self.caption_cache.set(cache_key, alt_text)
+
+        return {'alt_text': alt_text, 'tier': tier, 'decode_ms': decode_ms, 'cached': False}
+
+    def generate_alt_text(self, image, image_hash=None, tier=None):
         """
         Generate alt text for an image using BLIP model
         Args:
             image (PIL.Image): Input image
+            image_hash (str): Optional hash of the uploaded bytes, enables the caption cache
+            tier (str): Caption tier, see CAPTION_TIERS; None uses the default
         Returns:
             str: Generated alt text
         """
         try:
-            # Preprocess image
-            processed_image = self.preprocess_image(image)
-            
-            # Check image quality
-            quality_metrics = self.validate_image_quality(processed_image)
-            if not quality_metrics['is_valid']:
-                print(f"Warning: Image quality issues detected: {quality_metrics['issues']}")
-            
-            # Generate alt text using BLIP
-            inputs = self.processor(processed_image, return_tensors="pt")
-            out = self.model.generate(**inputs)
-            alt_text = self.processor.decode(out[0], skip_special_tokens=True)
-            
-            return alt_text
-            
+            return self.caption(image, image_hash=image_hash, tier=tier)['alt_text']
         except Exception as e:
             return f"Error generating alt text: {str(e)}"
 
+    def _generate_captions(self, items):
+        """
+        Generate captions for a batch of preprocessed images, one BLIP call per tier
+        Args:
+            items (list): (preprocessed PIL image, tier) tuples
+        Returns:
+            list: (caption, decode_ms) tuples, in input order
+        """
+        results = [None] * len(items)
+        order = sorted(range(len(items)), key=lambda index: items[index][1])
+        with self.models.use() as (processor, model):
+            for tier, group in groupby(order, key=lambda index: items[index][1]):
+                group = list(group)
+                inputs = processor(images=[items[index][0] for index in group], return_tensors="pt")
+                started = time.perf_counter()
+                with torch.inference_mode():
+                    out = model.generate(**inputs, **self.caption_tiers[tier])
+                decode_ms = (time.perf_counter() - started) * 1000.0
+                component_duration.observe(decode_ms / 1000.0, 'blip_generate')
+                for index, tokens in zip(group, out):
+                    results[index] = (processor.decode(tokens, skip_special_tokens=True), decode_ms)
+        return results
+
+    def warmup(self):
+        """
+        Load the BLIP model ahead of the first request
+        Returns:
+            dict: Model lifecycle statistics, including load time
+        """
+        return self.models.warmup()
+
+    def get_model_stats(self):
+        """
+        Get load state and load/warmup timings of the BLIP model
+        Returns:
+            dict: Model lifecycle statistics
+        """
+        return self.models.get_stats()
+
+    def get_batching_stats(self):
+        """
+        Get batch-size and queue-wait statistics of the captioning engine
+        Returns:
+            dict: Batching statistics
+        """
+        return self.batcher.get_stats()
+
+    def get_cache_stats(self):
+        """
+        Get hit, miss and eviction counters of the caption cache
+        Returns:
+            dict: Cache statistics, or None if the cache is disabled
+        """
+        return self.caption_cache.get_stats() if self.caption_cache is not None else None
+
 # Create singleton instance
-image_processor = ImageProcessor() 
\ No newline at end of file
+image_processor = ImageProcessor()
+register_cache('caption', image_processor.get_cache_stats)
@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from config.config import JOB_STORE_PATH, JOB_WORKERS, JOB_MAX_QUEUED, JOB_RESULT_TTL, JOB_STALE_AFTER
+from app.services.analysis_pipelines import run_advanced_analysis, run_medical_analysis
+from app.utils.upload_utils import ingest_bytes
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+class JobQueueFullError(Exception):
+    """Raised when too many jobs are already waiting"""
+
+class JobStore:
+    """Persistent job state in a local SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    job_type TEXT NOT NULL,
+                    filename TEXT,
+                    status TEXT NOT NULL,
+                    payload BLOB,
+                    options TEXT,
+                    result TEXT,
+                    http_status INTEGER,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    expires_at REAL
+                )
+            """)
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')]
+            if 'options' not in columns:
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN options TEXT')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs (expires_at)')
+            self._conn.commit()
+
+    def create(self, job_id, job_type, filename, payload, options=None):
+        """Insert a new queued job"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO jobs (id, job_type, filename, status, payload, options, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, job_type, filename, QUEUED, payload, json.dumps(options or {}), time.time())
+            )
+            self._conn.commit()
+
+    def claim(self, job_id):
+        """
+        Atomically move a queued job to running, so only one worker of any process runs it.
+        Returns:
+            tuple: (job_type, filename, payload, options), or None if the job is gone or already claimed
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?',
+                (RUNNING, time.time(), job_id, QUEUED)
+            )
+            self._conn.commit()
+            if cursor.rowcount != 1:
+                return None
+            return self._conn.execute(
+                'SELECT job_type, filename, payload, options FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+
+    def finish(self, job_id, status, result=None, http_status=None, error=None, ttl=None):
+        """Store a job's outcome and drop its payload"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, http_status = ?, error = ?, payload = NULL, '
+                'finished_at = ?, expires_at = ? WHERE id = ?',
+                (
+                    status,
+                    json.dumps(result, default=str) if result is not None else None,
+                    http_status,
+                    error,
+                    now,
+                    now + ttl if ttl else None,
+                    job_id
+                )
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        """
+        Get a job's public state.
+        Returns:
+            dict: Job state, or None if unknown or expired
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, job_type, filename, status, result, http_status, error, created_at, started_at, '
+                'finished_at, expires_at FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        job = {
+            'job_id': row[0],
+            'type': row[1],
+            'filename': row[2],
+            'status': row[3],
+            'result': json.loads(row[4]) if row[4] else None,
+            'http_status': row[5],
+            'error': row[6],
+            'created_at': row[7],
+            'started_at': row[8],
+            'finished_at': row[9],
+            'expires_at': row[10]
+        }
+        if job['expires_at'] is not None and job['expires_at'] <= time.time():
+            return None
+        return job
+
+    def count_active(self):
+        """Number of queued or running jobs"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)', (QUEUED, RUNNING)
+            ).fetchone()[0]
+
+    def requeue_stale(self, stale_after):
+        """Put jobs running for longer than stale_after seconds (their process died) back in the queue"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET status = ?, started_at = NULL WHERE status = ? AND started_at <= ?',
+                (QUEUED, RUNNING, time.time() - stale_after)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def queued_ids(self):
+        """Ids of queued jobs, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id FROM jobs WHERE status = ? ORDER BY created_at', (QUEUED,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge_expired(self):
+        """Delete finished jobs past their expiry time"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+class JobManager:
+    """Runs submitted jobs on a local worker pool and tracks them in a JobStore"""
+
+    def __init__(self, store, handlers, workers=2, max_queued=100, result_ttl=24 * 3600, stale_after=3600):
+        """
+        Args:
+            store (JobStore): Persistent job store
+            handlers (dict): Job type -> callable(filename, data, **options) returning (body, http_status)
+            workers (int): Worker pool size
+            max_queued (int): Maximum number of queued or running jobs
+            result_ttl (float): Seconds finished results are kept
+            stale_after (float): Seconds after which a running job is assumed lost and run again
+        """
+        self.store = store
+        self.handlers = handlers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self._workers = max(1, int(workers))
+        self._executor = None
+        self._start_lock = threading.Lock()
+        self._condition = threading.Condition()
+
+    def _ensure_started(self):
+        """
+        Start the worker pool and resume jobs left over from a previous run.
+        Every process does this; each job is claimed by exactly one of them (see JobStore.claim).
+        """
+        if self._executor is not None:
+            return
+        with self._start_lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='job-worker')
+            requeued = self.store.requeue_stale(self.stale_after)
+            if requeued:
+                logger.info(f"Requeued {requeued} jobs running for over {self.stale_after:.0f}s")
+            resumed = self.store.queued_ids()
+            for job_id in resumed:
+                self._executor.submit(self._run, job_id)
+            if resumed:
+                logger.info(f"Resumed {len(resumed)} unfinished jobs")
+
+    def submit(self, job_type, filename, data, options=None):
+        """
+        Queue a job.
+        Args:
+            job_type (str): One of the registered handler types
+            filename (str): Original filename
+            data (bytes): Image bytes
+            options (dict): Optional keyword arguments for the handler
+        Returns:
+            dict: Initial job state
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        self._ensure_started()
+        self.store.purge_expired()
+        if self.store.count_active() >= self.max_queued:
+            raise JobQueueFullError(f"Job queue is full ({self.max_queued} jobs)")
+
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, job_type, filename, data, options)
+        self._executor.submit(self._run, job_id)
+        return self.store.get(job_id)
+
+    def get(self, job_id):
+        """
+        Get a job's state.
+        Returns:
+            dict: Job state, or None if unknown or expired
+        """
+        self._ensure_started()
+        return self.store.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """
+        Long-poll a job until it finishes or the timeout passes.
+        Args:
+            job_id (str): Job id
+            timeout (float): Maximum time to wait, in seconds
+        Returns:
+            dict: Latest job state, or None if unknown or expired
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        job = self.get(job_id)
+        while job is not None and job['status'] not in FINISHED_STATES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Re-check the store periodically in case another process runs the job
+            with self._condition:
+                self._condition.wait(min(remaining, 0.5))
+            job = self.store.get(job_id)
+        return job
+
+    def _run(self, job_id):
+        """Worker: run one job and store its outcome"""
+        try:
+            row = self.store.claim(job_id)
+            if row is None:
+                # Already running or finished in this or another process
+                return
+            job_type, filename, payload, options = row
+            if payload is None:
+                raise ValueError("Job input is no longer available")
+
+            options = json.loads(options) if options else {}
+            body, http_status = self.handlers[job_type](filename, bytes(payload), **options)
+            status = SUCCEEDED if body.get('success') else FAILED
+            self.store.finish(job_id, status, result=body, http_status=http_status, ttl=self.result_ttl)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self.store.finish(job_id, FAILED, http_status=500, error=str(e), ttl=self.result_ttl)
+        finally:
+            with self._condition:
+                self._condition.notify_all()
+
+def _image_job(analysis):
+    """Adapt a run_*_analysis function to the job handler signature"""
+    def handler(filename, data, **options):
+        upload = ingest_bytes(data, filename)
+        return analysis(upload.stream, upload.sha256, **options)
+    return handler
+
+job_manager = JobManager(
+    JobStore(JOB_STORE_PATH),
+    {
+        'advanced-analysis': _image_job(run_advanced_analysis),
+        'medical-image-analysis': _image_job(run_medical_analysis)
+    },
+    workers=JOB_WORKERS,
+    max_queued=JOB_MAX_QUEUED,
+    result_ttl=JOB_RESULT_TTL,
+    stale_after=JOB_STALE_AFTER
+)
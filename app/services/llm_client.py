@@ -0,0 +1,415 @@
+"""
+Shared HTTP client for OpenAI-compatible chat completion APIs.
+
+One pooled connection set serves every LLM call in the process. Each call
+gets a timeout, 429 and 5xx responses (and dropped connections) are retried
+with jittered exponential backoff, and a process-wide cap bounds the number
+of requests in flight, shared by the sync and async entry points.
+Pointing LLM_BASE_URL at a local fake server (see benchmarks/fake_openai_server.py)
+exercises all of it without the real API.
+"""
+import json
+import time
+import random
+import asyncio
+import logging
+import weakref
+import threading
+import httpx
+from config.config import (
+    OPENAI_API_KEY,
+    LLM_BASE_URL,
+    LLM_REQUEST_TIMEOUT,
+    LLM_CONNECT_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONNECTIONS
+)
+from app.utils.metrics_utils import llm_tokens
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class LLMRequestError(RuntimeError):
+    """Raised when a chat completion request fails for good"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class LLMClient:
+    """Pooled, rate-limited chat completion client with sync and async entry points"""
+
+    def __init__(self, api_key=None, base_url='https://api.openai.com/v1', timeout=30.0, connect_timeout=5.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0, max_concurrency=8, max_connections=16):
+        """
+        Args:
+            api_key (str): Bearer token; may be None for local servers
+            base_url (str): API root, e.g. https://api.openai.com/v1
+            timeout (float): Default per-request timeout in seconds (read, write and pool)
+            connect_timeout (float): Connection timeout in seconds
+            max_retries (int): Retries after the first attempt for retryable failures
+            backoff_base (float): Backoff before the first retry, doubled after each one
+            backoff_max (float): Upper bound of a single backoff, in seconds
+            max_concurrency (int): Maximum requests in flight across the process
+            max_connections (int): Size of the HTTP connection pool
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()  # Event loop -> its httpx.AsyncClient
+        self._client_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'retries': 0,
+            'failures': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'total_wait_ms': 0.0
+        }
+
+    def _headers(self):
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+        return headers
+
+    def _timeout(self, timeout=None):
+        return httpx.Timeout(timeout or self.timeout, connect=self.connect_timeout)
+
+    @property
+    def client(self):
+        """Shared synchronous httpx client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        base_url=self.base_url, headers=self._headers(), limits=self.limits, timeout=self._timeout()
+                    )
+        return self._client
+
+    @property
+    def async_client(self):
+        """
+        Asynchronous httpx client of the running event loop, created on its first use there.
+        httpx connections belong to the loop that opened them, so each loop gets its own pool.
+        """
+        loop = asyncio.get_running_loop()
+        with self._client_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = httpx.AsyncClient(
+                    base_url=self.base_url, headers=self._headers(), limits=self.limits, timeout=self._timeout()
+                )
+        return client
+
+    # Concurrency cap
+
+    def _entered(self, waited):
+        with self._stats_lock:
+            self._stats['requests'] += 1
+            self._stats['in_flight'] += 1
+            self._stats['max_in_flight'] = max(self._stats['max_in_flight'], self._stats['in_flight'])
+            self._stats['total_wait_ms'] += waited * 1000.0
+
+    def _left(self):
+        with self._stats_lock:
+            self._stats['in_flight'] -= 1
+        self._slots.release()
+
+    def _acquire(self):
+        started = time.perf_counter()
+        self._slots.acquire()
+        self._entered(time.perf_counter() - started)
+
+    async def _acquire_async(self):
+        # The slots are shared with sync callers, so poll instead of blocking the event loop
+        started = time.perf_counter()
+        delay = 0.005
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        self._entered(time.perf_counter() - started)
+
+    # Retry policy
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before retry number attempt (0-based); honors Retry-After"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            try:
+                if retry_after is not None:
+                    return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # Full jitter: uniform over [0, capped exponential backoff]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _should_retry(self, attempt, status_code=None):
+        retryable = status_code is None or status_code in RETRY_STATUSES
+        if retryable and attempt < self.max_retries:
+            with self._stats_lock:
+                self._stats['retries'] += 1
+            return True
+        with self._stats_lock:
+            self._stats['failures'] += 1
+        return False
+
+    @staticmethod
+    def _error(response):
+        try:
+            message = response.json().get('error', {}).get('message') or response.text
+        except Exception:
+            message = response.text
+        return LLMRequestError(f"LLM request failed with HTTP {response.status_code}: {message}", response.status_code)
+
+    @staticmethod
+    def _payload(model, messages, max_tokens, temperature, stream):
+        payload = {'model': model, 'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature}
+        if stream:
+            payload['stream'] = True
+        return payload
+
+    @staticmethod
+    def _content(model, data):
+        usage = data.get('usage') or {}
+        if usage:
+            llm_tokens.inc(model, 'prompt', amount=usage.get('prompt_tokens', 0))
+            llm_tokens.inc(model, 'completion', amount=usage.get('completion_tokens', 0))
+        return data['choices'][0]['message']['content'].strip()
+
+    @staticmethod
+    def _delta(line):
+        """Text of one server-sent 'data:' line of a streamed completion, or None"""
+        if not line.startswith('data:'):
+            return None
+        data = line[5:].strip()
+        if not data or data == '[DONE]':
+            return None
+        return json.loads(data)['choices'][0].get('delta', {}).get('content')
+
+    # Sync entry points
+
+    def chat(self, model, messages, max_tokens, temperature, timeout=None):
+        """
+        Run a chat completion.
+        Args:
+            model (str): Model name
+            messages (list): Chat messages
+            max_tokens (int): Maximum tokens to generate
+            temperature (float): Sampling temperature
+            timeout (float): Optional per-call timeout, in seconds
+        Returns:
+            str: Stripped content of the first choice
+        """
+        payload = self._payload(model, messages, max_tokens, temperature, stream=False)
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                response = self.client.post('/chat/completions', json=payload, timeout=self._timeout(timeout))
+            except httpx.TransportError as e:
+                response, error = None, e
+            else:
+                error = None if response.status_code < 400 else self._error(response)
+            finally:
+                self._left()
+
+            if error is None:
+                return self._content(model, response.json())
+            if not self._should_retry(attempt, response.status_code if response is not None else None):
+                raise error if isinstance(error, LLMRequestError) else LLMRequestError(f"LLM request failed: {error}")
+            delay = self._backoff(attempt, response)
+            logger.warning(f"LLM request failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def chat_stream(self, model, messages, max_tokens, temperature, timeout=None):
+        """
+        Run a streamed chat completion.
+        Failures are retried only until the first piece of text has been yielded.
+        Args:
+            model (str): Model name
+            messages (list): Chat messages
+            max_tokens (int): Maximum tokens to generate
+            temperature (float): Sampling temperature
+            timeout (float): Optional per-call timeout between received chunks, in seconds
+        Yields:
+            str: Pieces of generated text
+        """
+        payload = self._payload(model, messages, max_tokens, temperature, stream=True)
+        attempt = 0
+        while True:
+            yielded = False
+            response = None
+            self._acquire()
+            try:
+                with self.client.stream('POST', '/chat/completions', json=payload, timeout=self._timeout(timeout)) as response:
+                    if response.status_code >= 400:
+                        response.read()
+                        error = self._error(response)
+                    else:
+                        for line in response.iter_lines():
+                            text = self._delta(line)
+                            if text:
+                                yielded = True
+                                # Streamed responses carry no usage; each chunk is one completion token
+                                llm_tokens.inc(model, 'completion')
+                                yield text
+                        return
+            except httpx.TransportError as e:
+                if yielded:
+                    raise LLMRequestError(f"LLM stream interrupted: {e}")
+                error = e
+            finally:
+                self._left()
+
+            status_code = None if isinstance(error, httpx.TransportError) else response.status_code
+            if not self._should_retry(attempt, status_code):
+                raise error if isinstance(error, LLMRequestError) else LLMRequestError(f"LLM request failed: {error}")
+            delay = self._backoff(attempt, response if status_code else None)
+            logger.warning(f"LLM stream request failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    # Async entry points
+
+    async def achat(self, model, messages, max_tokens, temperature, timeout=None):
+        """Async variant of chat()"""
+        payload = self._payload(model, messages, max_tokens, temperature, stream=False)
+        attempt = 0
+        while True:
+            await self._acquire_async()
+            try:
+                response = await self.async_client.post('/chat/completions', json=payload, timeout=self._timeout(timeout))
+            except httpx.TransportError as e:
+                response, error = None, e
+            else:
+                error = None if response.status_code < 400 else self._error(response)
+            finally:
+                self._left()
+
+            if error is None:
+                return self._content(model, response.json())
+            if not self._should_retry(attempt, response.status_code if response is not None else None):
+                raise error if isinstance(error, LLMRequestError) else LLMRequestError(f"LLM request failed: {error}")
+            delay = self._backoff(attempt, response)
+            logger.warning(f"LLM request failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def achat_stream(self, model, messages, max_tokens, temperature, timeout=None):
+        """Async variant of chat_stream()"""
+        payload = self._payload(model, messages, max_tokens, temperature, stream=True)
+        attempt = 0
+        while True:
+            yielded = False
+            response = None
+            await self._acquire_async()
+            try:
+                async with self.async_client.stream(
+                    'POST', '/chat/completions', json=payload, timeout=self._timeout(timeout)
+                ) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        error = self._error(response)
+                    else:
+                        async for line in response.aiter_lines():
+                            text = self._delta(line)
+                            if text:
+                                yielded = True
+                                # Streamed responses carry no usage; each chunk is one completion token
+                                llm_tokens.inc(model, 'completion')
+                                yield text
+                        return
+            except httpx.TransportError as e:
+                if yielded:
+                    raise LLMRequestError(f"LLM stream interrupted: {e}")
+                error = e
+            finally:
+                self._left()
+
+            status_code = None if isinstance(error, httpx.TransportError) else response.status_code
+            if not self._should_retry(attempt, status_code):
+                raise error if isinstance(error, LLMRequestError) else LLMRequestError(f"LLM request failed: {error}")
+            delay = self._backoff(attempt, response if status_code else None)
+            logger.warning(f"LLM stream request failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def get_stats(self):
+        """
+        Get request, retry and concurrency statistics.
+        Returns:
+            dict: Client statistics
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_wait_ms = stats.pop('total_wait_ms')
+        stats['avg_slot_wait_ms'] = total_wait_ms / stats['requests'] if stats['requests'] else 0.0
+        stats['max_concurrency'] = self.max_concurrency
+        stats['max_retries'] = self.max_retries
+        stats['base_url'] = self.base_url
+        return stats
+
+    async def aclose(self):
+        """Close the async client of the running event loop"""
+        with self._client_lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """Close the pooled connections, sync and async; async clients of closed loops are just dropped"""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        with self._client_lock:
+            async_clients = list(self._async_clients.items())
+            self._async_clients.clear()
+        for loop, client in async_clients:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            else:
+                loop.run_until_complete(client.aclose())
+
+# Process-wide client shared by all services
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+def get_llm_client():
+    """
+    Get the process-wide LLM client, building it on first use.
+    Returns:
+        LLMClient: Shared client
+    """
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = LLMClient(
+                    api_key=OPENAI_API_KEY,
+                    base_url=LLM_BASE_URL,
+                    timeout=LLM_REQUEST_TIMEOUT,
+                    connect_timeout=LLM_CONNECT_TIMEOUT,
+                    max_retries=LLM_MAX_RETRIES,
+                    backoff_base=LLM_BACKOFF_BASE,
+                    backoff_max=LLM_BACKOFF_MAX,
+                    max_concurrency=LLM_MAX_CONCURRENCY,
+                    max_connections=LLM_MAX_CONNECTIONS
+                )
+    return _llm_client
@@ -0,0 +1,146 @@
+"""
+Text-generation providers behind chat_completion.
+
+Each LLM call names its purpose (context, enhance_context, social_caption,
+...), and LLM_PROVIDER_ROUTES maps purposes to a provider:
+
+    openai  the OpenAI-compatible HTTP API (default)
+    local   an in-process seq2seq model on CPU (LLM_LOCAL_MODEL)
+
+Short rephrasing stages can then skip the network round trip while heavier
+stages stay remote. Latency is recorded per provider and purpose so the
+routing can be decided from measurements.
+"""
+import time
+import logging
+import threading
+from collections import deque
+import torch
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from app.utils.metrics_utils import llm_tokens
+from config.config import LLM_PROVIDER_ROUTES, LLM_LOCAL_MODEL, LLM_LOCAL_MAX_INPUT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+LLM_PROVIDERS = ('openai', 'local')
+
+def resolve_provider(purpose):
+    """
+    Get the provider configured for a purpose.
+    Args:
+        purpose (str): Purpose of the call, or None
+    Returns:
+        str: Provider name
+    """
+    provider = LLM_PROVIDER_ROUTES.get(purpose, 'openai') if purpose else 'openai'
+    if provider not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{provider}'. Supported providers: {', '.join(LLM_PROVIDERS)}")
+    return provider
+
+def messages_to_prompt(messages):
+    """Flatten chat messages into one instruction prompt for a local model"""
+    return '\n\n'.join(message['content'].strip() for message in messages if message.get('content'))
+
+class LocalTextGenerator:
+    """Lazily loaded seq2seq model (e.g. FLAN-T5) answering chat requests in-process"""
+
+    def __init__(self, model_name, max_input_tokens=512):
+        """
+        Args:
+            model_name (str): Hugging Face model name or local path
+            max_input_tokens (int): Prompts are truncated to this many tokens
+        """
+        self.model_name = model_name
+        self.max_input_tokens = max_input_tokens
+        self.tokenizer = None
+        self.model = None
+        self._lock = threading.Lock()
+        self.load_ms = None
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def load(self):
+        """
+        Load the tokenizer and model if they are not loaded yet.
+        Returns:
+            tuple: (tokenizer, model)
+        """
+        with self._lock:
+            if self.model is None:
+                started = time.perf_counter()
+                tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
+                model.eval()
+                self.tokenizer, self.model = tokenizer, model
+                self.load_ms = (time.perf_counter() - started) * 1000.0
+                logger.info(f"Loaded local text model '{self.model_name}' in {self.load_ms:.0f} ms")
+        return self.tokenizer, self.model
+
+    def generate(self, messages, max_tokens):
+        """
+        Generate a reply to chat messages.
+        Decoding is greedy: small local models lose more to sampling noise than
+        they gain in variety, so the request temperature is not used.
+        Args:
+            messages (list): Chat messages
+            max_tokens (int): Maximum tokens to generate
+        Returns:
+            str: Generated text
+        """
+        tokenizer, model = self.load()
+        inputs = tokenizer(
+            messages_to_prompt(messages), return_tensors='pt', truncation=True, max_length=self.max_input_tokens
+        )
+        with torch.inference_mode():
+            output = model.generate(**inputs, max_new_tokens=max_tokens, num_beams=1, no_repeat_ngram_size=3)
+        llm_tokens.inc(self.model_name, 'prompt', amount=int(inputs['input_ids'].shape[1]))
+        llm_tokens.inc(self.model_name, 'completion', amount=len(output[0]))
+        return tokenizer.decode(output[0], skip_special_tokens=True).strip()
+
+class ProviderLatency:
+    """Call counts and latency percentiles per (provider, purpose)"""
+
+    def __init__(self, window=512):
+        """
+        Args:
+            window (int): Recent calls kept per key for percentiles
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, provider, purpose, elapsed_ms, error=False):
+        key = (provider, purpose or 'default')
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'recent': deque(maxlen=self.window)}
+            entry['calls'] += 1
+            entry['errors'] += int(error)
+            entry['total_ms'] += elapsed_ms
+            entry['recent'].append(elapsed_ms)
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: provider -> purpose -> calls, errors, mean_ms, p50_ms and p95_ms
+        """
+        with self._lock:
+            entries = {key: dict(entry, recent=sorted(entry['recent'])) for key, entry in self._entries.items()}
+        stats = {}
+        for (provider, purpose), entry in entries.items():
+            recent = entry['recent']
+            stats.setdefault(provider, {})[purpose] = {
+                'calls': entry['calls'],
+                'errors': entry['errors'],
+                'mean_ms': entry['total_ms'] / entry['calls'],
+                'p50_ms': recent[len(recent) // 2] if recent else None,
+                'p95_ms': recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else None
+            }
+        return stats
+
+# Loaded on the first call routed to the local provider
+local_generator = LocalTextGenerator(LLM_LOCAL_MODEL, LLM_LOCAL_MAX_INPUT_TOKENS)
+provider_latency = ProviderLatency()
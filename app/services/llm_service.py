@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from contextlib import contextmanager
+from config.config import (
+    CACHE_DIR,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_MAX_BYTES
+)
+from app.utils.cache_utils import LRUCache, SQLiteCache, TieredCache, make_cache_key
+from app.services.llm_client import get_llm_client
+from app.services.llm_providers import resolve_provider, local_generator, provider_latency
+from app.services.executor_service import submit
+from app.services.profiling_service import profile_span
+from app.utils.metrics_utils import llm_request_duration, register_cache, registry
+
+logger = logging.getLogger(__name__)
+
+# Shared response cache for chat completions
+llm_cache = None
+if LLM_CACHE_ENABLED:
+    llm_cache = TieredCache(
+        LRUCache(LLM_CACHE_MEMORY_ENTRIES, ttl=LLM_CACHE_TTL),
+        SQLiteCache(os.path.join(CACHE_DIR, 'llm_responses.sqlite3'), LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL)
+    )
+
+# Receives generated text as it arrives, for callers that stream results to the client
+_token_listener = contextvars.ContextVar('llm_token_listener', default=None)
+
+@contextmanager
+def stream_tokens(listener):
+    """
+    Stream chat completions made in this context (and in work submitted from it).
+    Args:
+        listener (callable): Called with each piece of generated text; a cached
+            response arrives as a single piece
+    """
+    token = _token_listener.set(listener)
+    try:
+        yield
+    finally:
+        _token_listener.reset(token)
+
+def _streamed_completion(client, listener, **request):
+    """Run a streamed chat completion, forwarding each piece of text to listener"""
+    parts = []
+    for text in client.chat_stream(**request):
+        parts.append(text)
+        listener(text)
+    return ''.join(parts).strip()
+
+def _cache_key(use_cache, provider, model, messages, temperature, max_tokens):
+    """Cache key covering the model the provider actually runs, or None when caching is off"""
+    if not use_cache or llm_cache is None:
+        return None
+    if provider == 'local':
+        # The OpenAI model argument is ignored locally; prompts are also truncated to max_input_tokens
+        model = (local_generator.model_name, local_generator.max_input_tokens)
+    return make_cache_key('chat', provider, model, messages, temperature, max_tokens)
+
+def _record(provider, purpose, started, failed):
+    elapsed = time.perf_counter() - started
+    provider_latency.record(provider, purpose, elapsed * 1000.0, error=failed)
+    llm_request_duration.observe(elapsed, provider, purpose or 'default')
+
+def _generate(provider, purpose, listener, request):
+    """Run one uncached completion on provider, recording its latency"""
+    started = time.perf_counter()
+    failed = True
+    try:
+        with profile_span(f"llm:{purpose or 'default'}"):
+            if provider == 'local':
+                content = local_generator.generate(request['messages'], request['max_tokens'])
+                if listener is not None:
+                    listener(content)
+            elif listener is not None:
+                content = _streamed_completion(get_llm_client(), listener, **request)
+            else:
+                content = get_llm_client().chat(**request)
+        failed = False
+        return content
+    finally:
+        _record(provider, purpose, started, failed)
+
+def chat_completion(model, messages, max_tokens, temperature, use_cache=True, timeout=None, purpose=None):
+    """
+    Send a chat completion request, reusing cached responses for identical requests.
+    Inside stream_tokens(), the response is streamed and each piece is also
+    passed to the listener as it arrives (the local provider sends its reply
+    as a single piece).
+    Args:
+        model (str): Model name for the OpenAI provider
+        messages (list): Chat messages
+        max_tokens (int): Maximum tokens to generate
+        temperature (float): Sampling temperature
+        use_cache (bool): Set to False for calls that must stay non-deterministic
+        timeout (float): Optional per-attempt HTTP timeout, in seconds
+        purpose (str): What the call is for; picks the provider via LLM_PROVIDER_ROUTES
+    Returns:
+        str: Stripped content of the first choice
+    """
+    listener = _token_listener.get()
+    provider = resolve_provider(purpose)
+    cache_key = _cache_key(use_cache, provider, model, messages, temperature, max_tokens)
+    if cache_key is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            if listener is not None:
+                listener(cached)
+            return cached
+
+    request = {'model': model, 'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature, 'timeout': timeout}
+    content = _generate(provider, purpose, listener, request)
+    if cache_key is not None:
+        llm_cache.set(cache_key, content)
+    return content
+
+async def achat_completion(model, messages, max_tokens, temperature, use_cache=True, timeout=None, purpose=None):
+    """
+    Async variant of chat_completion() for callers running an event loop.
+    Shares the response cache, provider routing and the in-flight request cap
+    with the sync path; local generation runs on the shared worker pool.
+    Args:
+        model (str): Model name for the OpenAI provider
+        messages (list): Chat messages
+        max_tokens (int): Maximum tokens to generate
+        temperature (float): Sampling temperature
+        use_cache (bool): Set to False for calls that must stay non-deterministic
+        timeout (float): Optional per-attempt HTTP timeout, in seconds
+        purpose (str): What the call is for; picks the provider via LLM_PROVIDER_ROUTES
+    Returns:
+        str: Stripped content of the first choice
+    """
+    provider = resolve_provider(purpose)
+    cache_key = _cache_key(use_cache, provider, model, messages, temperature, max_tokens)
+    if cache_key is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    started = time.perf_counter()
+    failed = True
+    try:
+        if provider == 'local':
+            content = await asyncio.wrap_future(submit(local_generator.generate, messages, max_tokens))
+        else:
+            content = await get_llm_client().achat(model, messages, max_tokens, temperature, timeout=timeout)
+        failed = False
+    finally:
+        _record(provider, purpose, started, failed)
+
+    if cache_key is not None:
+        llm_cache.set(cache_key, content)
+    return content
+
+def get_provider_stats():
+    """
+    Get call counts and latency percentiles per provider and purpose
+    Returns:
+        dict: provider -> purpose -> statistics
+    """
+    return provider_latency.get_stats()
+
+def get_client_stats():
+    """
+    Get request, retry and concurrency counters of the shared LLM client
+    Returns:
+        dict: Client statistics
+    """
+    return get_llm_client().get_stats()
+
+def get_cache_stats():
+    """
+    Get hit, miss and eviction counters of the LLM response cache
+    Returns:
+        dict: Cache statistics, or None if the cache is disabled
+    """
+    return llm_cache.get_stats() if llm_cache is not None else None
+
+def _collect_client_metrics():
+    stats = get_client_stats()
+    yield 'llm_requests_in_flight', 'gauge', 'HTTP requests to the LLM API in flight', [({}, stats['in_flight'])]
+    yield 'llm_http_attempts_total', 'counter', 'HTTP attempts to the LLM API, retries included', [({}, stats['requests'])]
+    yield 'llm_retries_total', 'counter', 'LLM API attempts that were retried', [({}, stats['retries'])]
+    yield 'llm_failures_total', 'counter', 'LLM API requests that failed after retries', [({}, stats['failures'])]
+
+register_cache('llm', get_cache_stats)
+registry.register_collector(_collect_client_metrics)
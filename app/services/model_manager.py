@@ -0,0 +1,172 @@
+import gc
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from PIL import Image
+import torch
+from transformers import BlipProcessor
+from app.services.blip_backends import load_blip_model, set_num_threads
+
+logger = logging.getLogger(__name__)
+
+class BlipModelManager:
+    """
+    Lazily loads the BLIP processor and model, optionally warms them up,
+    and unloads them again after a configurable idle period.
+    """
+
+    def __init__(self, model_name, backend='eager', artifact_dir=None, num_threads=0,
+                 warmup_inference=True, idle_unload_seconds=0):
+        """
+        Args:
+            model_name (str): Hugging Face model name or local path
+            backend (str): Inference backend, see blip_backends.BLIP_BACKENDS
+            artifact_dir (str): Directory for converted model artifacts
+            num_threads (int): torch intra-op threads; 0 keeps the default
+            warmup_inference (bool): Run a synthetic caption after loading
+            idle_unload_seconds (float): Unload after this many idle seconds; 0 disables unloading
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.artifact_dir = artifact_dir
+        self.num_threads = num_threads
+        self.warmup_inference = warmup_inference
+        self.idle_unload_seconds = idle_unload_seconds
+        self.processor = None
+        self.model = None
+        self._lock = threading.RLock()
+        self._active = 0
+        self._last_used = time.monotonic()
+        self._watcher = None
+        self._stats = {
+            'loads': 0,
+            'unloads': 0,
+            'last_load_ms': None,
+            'artifact_from_cache': None,
+            'last_warmup_ms': None
+        }
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def load(self):
+        """
+        Load the processor and model if they are not loaded yet.
+        Returns:
+            tuple: (processor, model)
+        """
+        with self._lock:
+            if self.model is not None:
+                return self.processor, self.model
+
+            started = time.perf_counter()
+            set_num_threads(self.num_threads)
+            processor = BlipProcessor.from_pretrained(self.model_name)
+            model, from_cache = load_blip_model(self.model_name, self.backend, self.artifact_dir)
+            self.processor, self.model = processor, model
+            self._stats['loads'] += 1
+            self._stats['last_load_ms'] = (time.perf_counter() - started) * 1000.0
+            self._stats['artifact_from_cache'] = from_cache if self.backend != 'eager' else None
+            logger.info(
+                f"Loaded BLIP model '{self.model_name}' ({self.backend} backend) "
+                f"in {self._stats['last_load_ms']:.0f} ms"
+            )
+
+            if self.warmup_inference:
+                self._run_warmup()
+
+            self._last_used = time.monotonic()
+            self._start_watcher()
+            return self.processor, self.model
+
+    def warmup(self):
+        """
+        Explicit warmup hook: load the model (and run the synthetic caption if enabled).
+        Returns:
+            dict: Lifecycle statistics
+        """
+        self.load()
+        return self.get_stats()
+
+    def _run_warmup(self):
+        """Caption a synthetic image so the first real request skips first-call costs (lock held)"""
+        try:
+            started = time.perf_counter()
+            inputs = self.processor(images=Image.new('RGB', (384, 384), (127, 127, 127)), return_tensors="pt")
+            with torch.inference_mode():
+                self.model.generate(**inputs, max_new_tokens=5)
+            self._stats['last_warmup_ms'] = (time.perf_counter() - started) * 1000.0
+            logger.info(f"BLIP warmup inference took {self._stats['last_warmup_ms']:.0f} ms")
+        except Exception as e:
+            logger.error(f"BLIP warmup inference failed: {str(e)}")
+
+    @contextmanager
+    def use(self):
+        """
+        Borrow the loaded processor and model; they are not unloaded while borrowed.
+        Yields:
+            tuple: (processor, model)
+        """
+        with self._lock:
+            processor, model = self.load()
+            self._active += 1
+        try:
+            yield processor, model
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_used = time.monotonic()
+
+    def unload(self):
+        """
+        Release the model to free memory; it is reloaded on next use.
+        Returns:
+            bool: True if a loaded model was released
+        """
+        with self._lock:
+            if self.model is None or self._active:
+                return False
+            self.processor = None
+            self.model = None
+            self._stats['unloads'] += 1
+        gc.collect()
+        logger.info(f"Unloaded BLIP model '{self.model_name}'")
+        return True
+
+    def _start_watcher(self):
+        """Start the idle-unload thread once, if idle unloading is enabled (lock held)"""
+        if self.idle_unload_seconds <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch_idle, name='blip-idle-unloader', daemon=True)
+        self._watcher.start()
+
+    def _watch_idle(self):
+        """Unload the model whenever it has been idle for idle_unload_seconds"""
+        interval = max(1.0, min(self.idle_unload_seconds / 4.0, 30.0))
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                if self.model is None or self._active:
+                    continue
+                if time.monotonic() - self._last_used < self.idle_unload_seconds:
+                    continue
+            self.unload()
+
+    def get_stats(self):
+        """
+        Get load state, load time and unload statistics.
+        Returns:
+            dict: Lifecycle statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['loaded'] = self.model is not None
+            stats['model'] = self.model_name
+            stats['backend'] = self.backend
+            stats['num_threads'] = torch.get_num_threads()
+            stats['active'] = self._active
+            stats['idle_seconds'] = time.monotonic() - self._last_used
+            stats['idle_unload_seconds'] = self.idle_unload_seconds
+        return stats
@@ -0,0 +1,130 @@
+"""
+Dominant-color (palette) extraction with selectable accuracy/latency modes.
+
+Modes, from most accurate and slowest to fastest:
+    kmeans      K-means on every pixel of the full-resolution image
+    sampled     K-means on a random pixel sample of a downscaled copy
+    median_cut  Pillow's C median-cut quantizer on a downscaled copy
+    histogram   Coarse 3-D color histogram on a downscaled copy
+"""
+import numpy as np
+from PIL import Image
+from sklearn.cluster import KMeans
+
+PALETTE_MODES = ('kmeans', 'sampled', 'median_cut', 'histogram')
+
+# Longest side of the downscaled copy used by the fast modes
+DOWNSCALE_SIZE = 256
+# Pixels clustered by the 'sampled' mode
+SAMPLE_PIXELS = 20000
+# K-means refinement passes Pillow runs on the median-cut palette
+MEDIAN_CUT_REFINE = 3
+# Bits per channel kept by the 'histogram' mode (4 bits -> 4096 bins)
+HISTOGRAM_BITS = 4
+
+def _downscaled_pixels(image, size=DOWNSCALE_SIZE):
+    """RGB pixels of a copy whose longest side is at most size, as an (N, 3) uint8 array"""
+    small = image.convert('RGB') if image.mode != 'RGB' else image
+    if max(small.size) > size:
+        small = small.copy()
+        small.thumbnail((size, size), Image.Resampling.BILINEAR)
+    return np.asarray(small, dtype=np.uint8).reshape(-1, 3)
+
+def _sorted_palette(colors, counts):
+    """Sort colors by share, largest first, and convert counts to percentages"""
+    colors = np.asarray(colors, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.float64)
+    percentages = counts / counts.sum() * 100
+    order = np.argsort(percentages)[::-1]
+    return colors[order], percentages[order]
+
+def _kmeans(pixels, n_colors, seed=42, **kmeans_options):
+    """Cluster pixels and return (centers, counts) of the non-empty clusters"""
+    kmeans = KMeans(n_clusters=n_colors, random_state=seed, **kmeans_options)
+    labels = kmeans.fit_predict(pixels)
+    counts = np.bincount(labels, minlength=n_colors)
+    used = counts > 0
+    return kmeans.cluster_centers_[used], counts[used]
+
+def palette_kmeans(image, n_colors=5, image_array=None):
+    """Reference mode: K-means on every pixel at full resolution"""
+    pixels = image_array.reshape(-1, 3) if image_array is not None else np.asarray(image.convert('RGB')).reshape(-1, 3)
+    return _sorted_palette(*_kmeans(pixels, n_colors))
+
+def palette_sampled(image, n_colors=5, sample_pixels=SAMPLE_PIXELS, seed=42):
+    """K-means on a random sample of a downscaled copy"""
+    pixels = _downscaled_pixels(image)
+    if len(pixels) > sample_pixels:
+        rng = np.random.default_rng(seed)
+        pixels = pixels[rng.choice(len(pixels), sample_pixels, replace=False)]
+    return _sorted_palette(*_kmeans(pixels.astype(np.float64), n_colors, seed, n_init=1))
+
+def palette_median_cut(image, n_colors=5):
+    """Pillow median-cut quantization of a downscaled copy, refined by a few k-means passes"""
+    pixels = _downscaled_pixels(image)
+    small = Image.fromarray(pixels.reshape(1, -1, 3), 'RGB')
+    quantized = small.quantize(colors=n_colors, method=Image.Quantize.MEDIANCUT, kmeans=MEDIAN_CUT_REFINE)
+    palette = np.array(quantized.getpalette()[:n_colors * 3]).reshape(-1, 3)
+    counts = np.bincount(np.asarray(quantized).ravel(), minlength=len(palette))[:len(palette)]
+    used = counts > 0
+    return _sorted_palette(palette[used], counts[used])
+
+def palette_histogram(image, n_colors=5, bits=HISTOGRAM_BITS):
+    """
+    Coarse color histogram of a downscaled copy.
+    Picks the most populated bins that are not near-duplicates of an already
+    picked one, then assigns every bin to its nearest picked color.
+    """
+    pixels = _downscaled_pixels(image).astype(np.int64)
+    shift = 8 - bits
+    bins = 1 << bits
+    codes = ((pixels[:, 0] >> shift) * bins + (pixels[:, 1] >> shift)) * bins + (pixels[:, 2] >> shift)
+    counts = np.bincount(codes, minlength=bins ** 3)
+    occupied = np.nonzero(counts)[0]
+    bin_counts = counts[occupied]
+
+    # Mean color of each occupied bin
+    sums = np.stack([np.bincount(codes, weights=pixels[:, c], minlength=bins ** 3)[occupied] for c in range(3)], axis=1)
+    bin_colors = sums / bin_counts[:, None]
+
+    # Greedy pick of populated, well-separated bins
+    min_distance = 256 / bins * 2
+    picked = []
+    for index in np.argsort(bin_counts)[::-1]:
+        color = bin_colors[index]
+        if all(np.linalg.norm(color - bin_colors[other]) >= min_distance for other in picked):
+            picked.append(index)
+            if len(picked) == n_colors:
+                break
+    centers = bin_colors[picked]
+
+    # Assign every occupied bin to its nearest picked color
+    distances = np.linalg.norm(bin_colors[:, None, :] - centers[None, :, :], axis=2)
+    nearest = np.argmin(distances, axis=1)
+    totals = np.bincount(nearest, weights=bin_counts, minlength=len(centers))
+    weighted = np.stack([np.bincount(nearest, weights=bin_colors[:, c] * bin_counts, minlength=len(centers)) for c in range(3)], axis=1)
+    return _sorted_palette(weighted / totals[:, None], totals)
+
+_PALETTE_FUNCTIONS = {
+    'kmeans': palette_kmeans,
+    'sampled': palette_sampled,
+    'median_cut': palette_median_cut,
+    'histogram': palette_histogram
+}
+
+def extract_palette(image, n_colors=5, mode='sampled', image_array=None):
+    """
+    Find the dominant colors of an image.
+    Args:
+        image (PIL.Image): Input image
+        n_colors (int): Number of dominant colors
+        mode (str): One of PALETTE_MODES
+        image_array (np.ndarray): Optional full-resolution pixel array, reused by 'kmeans'
+    Returns:
+        tuple: (colors as an (n, 3) float array, percentages), largest share first
+    """
+    if mode not in _PALETTE_FUNCTIONS:
+        raise ValueError(f"Unknown palette mode '{mode}'. Supported modes: {', '.join(PALETTE_MODES)}")
+    if mode == 'kmeans':
+        return palette_kmeans(image, n_colors, image_array=image_array)
+    return _PALETTE_FUNCTIONS[mode](image, n_colors)
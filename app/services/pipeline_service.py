@@ -0,0 +1,190 @@
+import time
+import logging
+import contextvars
+from concurrent.futures import wait, FIRST_COMPLETED
+from app.services.executor_service import submit
+from app.services.profiling_service import profile_span
+from app.utils.metrics_utils import stage_duration, stage_failures, errors as error_counts
+
+logger = logging.getLogger(__name__)
+
+# Name of the stage running in the current context, for code called from stage functions
+current_stage = contextvars.ContextVar('pipeline_stage', default=None)
+
+class Stage:
+    """A named pipeline step and the stages whose results it needs"""
+
+    def __init__(self, name, fn, depends_on=()):
+        """
+        Args:
+            name (str): Unique stage name; its result is stored under this key
+            fn (callable): Takes the shared results dict, returns this stage's result
+            depends_on (iterable): Names of stages or initial inputs this stage reads
+        """
+        self.name = name
+        self.fn = fn
+        self.depends_on = tuple(depends_on)
+
+class PipelineRun:
+    """Outcome of one pipeline execution"""
+
+    def __init__(self, results, errors, timings_ms, total_ms):
+        self.results = results
+        self.errors = errors
+        self.timings_ms = timings_ms
+        self.total_ms = total_ms
+
+    def ok(self, name):
+        """Whether a stage completed without error"""
+        return name in self.results and name not in self.errors
+
+    def metadata(self):
+        """
+        Per-stage timing report for API responses
+        Returns:
+            dict: Stage timings, total wall time and stage errors
+        """
+        return {
+            'stage_timings_ms': dict(self.timings_ms),
+            'total_ms': self.total_ms,
+            'errors': {name: str(error) for name, error in self.errors.items()}
+        }
+
+class Pipeline:
+    """
+    Declarative stage graph.
+
+    Stages run as soon as all of their dependencies have completed, so
+    independent stages overlap on the shared executor. Results are shared
+    through one dict keyed by stage name. A failing stage is recorded and its
+    dependents are skipped; unrelated stages still run.
+    """
+
+    def __init__(self, stages, inputs=(), name='pipeline'):
+        """
+        Args:
+            stages (list): Stage objects
+            inputs (iterable): Names of initial inputs passed to run()
+            name (str): Label of this pipeline's stage metrics
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.inputs = tuple(inputs)
+        self.name = name
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        self._validate()
+
+    def _validate(self):
+        """Reject unknown dependencies and cycles"""
+        known = set(self.stages) | set(self.inputs)
+        for stage in self.stages.values():
+            missing = [dep for dep in stage.depends_on if dep not in known]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+        resolved = set(self.inputs)
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items() if set(stage.depends_on) <= resolved]
+            if not ready:
+                raise ValueError(f"Pipeline has a dependency cycle among: {sorted(remaining)}")
+            for name in ready:
+                resolved.add(name)
+                del remaining[name]
+
+    def run(self, **inputs):
+        """
+        Execute the pipeline.
+        Args:
+            **inputs: Initial inputs, available to stages under their names
+        Returns:
+            PipelineRun: Stage results, errors and timings
+        """
+        return self.execute(inputs)
+
+    def execute(self, inputs, listener=None):
+        """
+        Execute the pipeline, reporting each stage as soon as it finishes.
+        Args:
+            inputs (dict): Initial inputs, available to stages under their names
+            listener (callable): Optional listener(name, value, error, elapsed_ms), called
+                from the coordinating thread when a stage completes, fails or is skipped
+        Returns:
+            PipelineRun: Stage results, errors and timings
+        """
+        missing = [name for name in self.inputs if name not in inputs]
+        if missing:
+            raise ValueError(f"Missing pipeline inputs: {missing}")
+
+        started = time.perf_counter()
+        results = dict(inputs)
+        errors = {}
+        timings_ms = {}
+        pending = dict(self.stages)
+        running = {}
+
+        def run_stage(stage):
+            stage_started = time.perf_counter()
+            token = current_stage.set(stage.name)
+            try:
+                with profile_span(stage.name, stage=True):
+                    value = stage.fn(results)
+                return value, None, time.perf_counter() - stage_started
+            except Exception as e:
+                return None, e, time.perf_counter() - stage_started
+            finally:
+                current_stage.reset(token)
+
+        def notify(name, value, error, elapsed_ms):
+            if listener is None:
+                return
+            try:
+                listener(name, value, error, elapsed_ms)
+            except Exception as e:
+                logger.error(f"Pipeline listener failed on stage '{name}': {str(e)}")
+
+        def record(stage, outcome):
+            value, error, elapsed = outcome
+            timings_ms[stage.name] = elapsed * 1000.0
+            stage_duration.observe(elapsed, self.name, stage.name)
+            if error is not None:
+                logger.error(f"Pipeline stage '{stage.name}' failed: {str(error)}")
+                errors[stage.name] = error
+                stage_failures.inc(self.name, stage.name, 'error')
+            else:
+                results[stage.name] = value
+                # Services report most failures as error responses rather than raising
+                if isinstance(value, dict) and value.get('success') is False:
+                    error_counts.inc('stage', value.get('code') or 'UNKNOWN')
+            notify(stage.name, value, error, timings_ms[stage.name])
+
+        while pending or running:
+            # Skip stages whose dependencies failed, submit those that are ready
+            for name, stage in list(pending.items()):
+                failed = [dep for dep in stage.depends_on if dep in errors]
+                if failed:
+                    errors[name] = ValueError(f"Skipped because {', '.join(failed)} failed")
+                    del pending[name]
+                    stage_failures.inc(self.name, name, 'skipped')
+                    notify(name, None, errors[name], 0.0)
+                elif all(dep in results for dep in stage.depends_on):
+                    running[submit(run_stage, stage)] = stage
+                    del pending[name]
+
+            if not running:
+                continue
+
+            # Run a stage no worker has picked up yet here instead of idling
+            stolen = next((future for future in running if future.cancel()), None)
+            if stolen is not None:
+                stage = running.pop(stolen)
+                record(stage, run_stage(stage))
+                continue
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                record(running.pop(future), future.result())
+
+        for name in inputs:
+            results.pop(name, None)
+        return PipelineRun(results, errors, timings_ms, (time.perf_counter() - started) * 1000.0)
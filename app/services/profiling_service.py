@@ -0,0 +1,317 @@
+"""
+On-demand profiling of single requests.
+
+A request is profiled when an allow-listed caller sends its token in the
+X-Profile header or the profile query parameter, or when it is picked by
+PROFILE_SAMPLE_RATE. While it runs, a sampling thread records the Python
+stacks of every thread working on it (the request thread and the executor
+workers its stages run on) and named spans are recorded for pipeline stages,
+preprocessing, the caption batch wait and LLM calls.
+
+Each profile is stored under PROFILE_DIR as:
+
+    <id>.folded  collapsed stacks ("frame;frame;frame count"), rooted at the
+                 route and the running stage; loads in flamegraph.pl,
+                 speedscope and inferno
+    <id>.json    route, status, timings and the span list
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import hmac
+import random
+import logging
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from flask import request, g
+from config.config import PROFILE_TOKENS, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, PROFILE_DIR, PROFILE_MAX_STORED
+
+logger = logging.getLogger(__name__)
+
+# Profile of the request being handled in this context, if any
+active_profile = contextvars.ContextVar('active_profile', default=None)
+
+class ProfileSession:
+    """Stacks and spans collected for one request"""
+
+    def __init__(self, label, reason):
+        """
+        Args:
+            label (str): Root frame of the collapsed stacks, e.g. 'POST /general'
+            reason (str): 'requested' or 'sampled'
+        """
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.reason = reason
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.samples = Counter()
+        self.spans = []
+        self.finished = False
+        self._threads = {}  # thread ident -> nesting depth
+        self._stages = {}  # thread ident -> stage name
+        self._lock = threading.Lock()
+
+    def attach(self):
+        """Start sampling the calling thread"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def detach(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0) - 1
+            if depth > 0:
+                self._threads[ident] = depth
+            else:
+                self._threads.pop(ident, None)
+                self._stages.pop(ident, None)
+
+    def add_span(self, name, started, ended, stage=None):
+        with self._lock:
+            self.spans.append({
+                'name': name,
+                'start_ms': (started - self.started) * 1000.0,
+                'duration_ms': (ended - started) * 1000.0,
+                'thread': threading.current_thread().name,
+                'stage': stage
+            })
+
+    def sample(self, frames):
+        """Record the current stack of every attached thread"""
+        with self._lock:
+            threads = [(ident, self._stages.get(ident)) for ident in self._threads]
+        stacks = []
+        for ident, stage in threads:
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            root = [self.label] + ([f"stage:{stage}"] if stage else [])
+            stacks.append(';'.join(root + names[::-1]))
+        with self._lock:
+            self.samples.update(stacks)
+
+    def set_stage(self, stage):
+        with self._lock:
+            if stage is None:
+                self._stages.pop(threading.get_ident(), None)
+            else:
+                self._stages[threading.get_ident()] = stage
+
+class SamplingProfiler:
+    """One background thread sampling the stacks of all active sessions"""
+
+    def __init__(self, interval_ms=5.0):
+        self.interval = interval_ms / 1000.0
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, session):
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self, session):
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                sessions = list(self._sessions)
+                if not sessions:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            for session in sessions:
+                session.sample(frames)
+
+class ProfileStore:
+    """Finished profiles on disk, newest PROFILE_MAX_STORED kept"""
+
+    def __init__(self, directory, max_stored=200):
+        self.directory = os.path.abspath(directory)
+        self.max_stored = max_stored
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id, extension):
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def save(self, session, status, total_ms):
+        os.makedirs(self.directory, exist_ok=True)
+        summary = {
+            'id': session.id,
+            'label': session.label,
+            'reason': session.reason,
+            'status': status,
+            'started_at': session.started_at,
+            'total_ms': total_ms,
+            'interval_ms': profiler.interval * 1000.0,
+            'samples': sum(session.samples.values()),
+            'spans': sorted(session.spans, key=lambda span: span['start_ms'])
+        }
+        with open(self._path(session.id, 'folded'), 'w') as f:
+            for stack, count in session.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(self._path(session.id, 'json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        self._prune()
+        return summary
+
+    def _prune(self):
+        with self._lock:
+            summaries = sorted(
+                (entry for entry in os.listdir(self.directory) if entry.endswith('.json')),
+                key=lambda entry: os.path.getmtime(os.path.join(self.directory, entry))
+            )
+            for entry in summaries[:max(0, len(summaries) - self.max_stored)]:
+                for extension in ('json', 'folded'):
+                    try:
+                        os.remove(self._path(entry[:-5], extension))
+                    except OSError:
+                        pass
+
+    def list(self):
+        """
+        Returns:
+            list: Summaries without spans, newest first
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.listdir(self.directory):
+            if entry.endswith('.json'):
+                summary = self.get(entry[:-5])
+                if summary is not None:
+                    summary.pop('spans', None)
+                    profiles.append(summary)
+        return sorted(profiles, key=lambda summary: summary['started_at'], reverse=True)
+
+    def get(self, profile_id):
+        """
+        Returns:
+            dict: Stored summary, or None if unknown
+        """
+        if not profile_id.isalnum():
+            return None
+        try:
+            with open(self._path(profile_id, 'json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def folded_path(self, profile_id):
+        """Path of a profile's collapsed stacks, or None if unknown"""
+        path = self._path(profile_id, 'folded')
+        return path if profile_id.isalnum() and os.path.exists(path) else None
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS)
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_STORED)
+
+def is_allowed(token):
+    """Whether a token is on the PROFILE_TOKENS allow-list"""
+    if not token:
+        return False
+    # compare_digest only accepts ASCII str, so compare the UTF-8 bytes
+    token = token.encode('utf-8')
+    return any(hmac.compare_digest(token, allowed.encode('utf-8')) for allowed in PROFILE_TOKENS)
+
+def run_attached(fn, *args, **kwargs):
+    """Run fn with the calling thread sampled for the active profile, if any"""
+    session = active_profile.get()
+    if session is None:
+        return fn(*args, **kwargs)
+    session.attach()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        session.detach()
+
+@contextmanager
+def profile_span(name, stage=False):
+    """
+    Record the with-block as a named span of the active profile; a no-op otherwise.
+    Args:
+        name (str): Span name
+        stage (bool): Also root this thread's samples at 'stage:<name>' meanwhile
+    """
+    session = active_profile.get()
+    if session is None:
+        yield
+        return
+    started = time.perf_counter()
+    if stage:
+        session.set_stage(name)
+    try:
+        yield
+    finally:
+        if stage:
+            session.set_stage(None)
+        session.add_span(name, started, time.perf_counter(), stage=name if stage else None)
+
+def _finish(session, status):
+    if session.finished:
+        return
+    session.finished = True
+    profiler.stop(session)
+    try:
+        profile_store.save(session, status, (time.perf_counter() - session.started) * 1000.0)
+    except Exception as e:
+        logger.error(f"Error saving profile {session.id}: {str(e)}")
+
+def init_request_profiling(app):
+    """
+    Profile requests carrying an allow-listed token, and a PROFILE_SAMPLE_RATE share of the rest.
+    Args:
+        app (Flask): Application to instrument
+    """
+    @app.before_request
+    def _start_profile():
+        token = request.headers.get('X-Profile') or request.args.get('profile')
+        if token and is_allowed(token):
+            reason = 'requested'
+        elif PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            reason = 'sampled'
+        else:
+            return
+        session = ProfileSession(f"{request.method} {request.url_rule.rule if request.url_rule else request.path}", reason)
+        session.attach()
+        g.profile_session = session
+        g.profile_token = active_profile.set(session)
+        profiler.start(session)
+
+    @app.after_request
+    def _tag_profile(response):
+        session = g.get('profile_session')
+        if session is not None:
+            response.headers['X-Profile-Id'] = session.id
+            # Streamed bodies keep working after the view returns; finish once they are sent
+            status = response.status_code
+            response.call_on_close(lambda: _finish(session, status))
+        return response
+
+    @app.teardown_request
+    def _end_profile(exc):
+        session = g.pop('profile_session', None)
+        token = g.pop('profile_token', None)
+        if token is not None:
+            active_profile.reset(token)
+        if session is not None:
+            # Teardown runs on the request thread, which _start_profile attached
+            session.detach()
+            if exc is not None:
+                _finish(session, 500)
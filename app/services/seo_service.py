@@ -1,18 +1,21 @@
-from config.ai_config import get_openai_client, format_success_response, format_error_response, GPT_CONFIG
-import openai
+from config.ai_config import format_success_response, format_error_response, GPT_CONFIG
+from app.services.llm_service import chat_completion
+from app.services.executor_service import run_concurrently
+from config.config import LLM_CALL_TIMEOUT
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_seo_description(context, alt_text):
+def generate_seo_description(context, alt_text, use_cache=True):
     """
     Generates a detailed product description and SEO title with improved formatting.
     
     Args:
         context (str): Context of the image
         alt_text (str): Generated alt text of the image
+        use_cache (bool): Reuse cached responses for identical input
         
     Returns:
         dict: Contains formatted description, SEO title, and sections
@@ -22,22 +25,36 @@ def generate_seo_description(context, alt_text):
         if not context or not alt_text:
             raise ValueError("Context and alt_text are required")
 
-        # Generate description
-        description = _generate_description(context, alt_text)
+        # Description and title are independent GPT-4 calls; run them concurrently
+        stages = run_concurrently({
+            'description': lambda: _generate_description(context, alt_text, use_cache=use_cache),
+            'seo_title': lambda: _generate_seo_title(context, alt_text, use_cache=use_cache)
+        }, timeout=LLM_CALL_TIMEOUT)
+
+        errors = {
+            name: str(result['error']) for name, result in stages.items() if result['error'] is not None
+        }
+        if len(errors) == len(stages):
+            raise ValueError("; ".join(f"{name}: {error}" for name, error in errors.items()))
+
+        description = stages['description']['value'] or ''
+        seo_title = stages['seo_title']['value'] or ''
         
         # Extract sections
         sections = _extract_sections(description)
         
-        # Generate SEO title
-        seo_title = _generate_seo_title(context, alt_text)
-        
         # Generate keywords
         keywords = extract_keywords(description + " " + seo_title)
 
         response_data = {
             'seo_title': seo_title,
             'sections': sections,
-            'keywords': keywords
+            'keywords': keywords,
+            'metadata': {
+                'stage_timings_ms': {name: result['elapsed_ms'] for name, result in stages.items()},
+                'partial': bool(errors),
+                'errors': errors
+            }
         }
         
         # Debug log
@@ -52,7 +69,7 @@ def generate_seo_description(context, alt_text):
             error_code="SEO_GENERATION_ERROR"
         )
 
-def _generate_description(context, alt_text):
+def _generate_description(context, alt_text, use_cache=True):
     """Helper function to generate the product description"""
     description_prompt = f"""Based on this image context and alt text, generate a comprehensive product description:
 
@@ -82,8 +99,7 @@ Additional:
 • Highlight customization options, adjustability, or versatility features
 • End with compatibility features and integration capabilities"""
 
-    openai = get_openai_client()
-    response = openai.ChatCompletion.create(
+    return chat_completion(
         model="gpt-4",
         messages=[
             {
@@ -102,11 +118,12 @@ Additional:
             {"role": "user", "content": description_prompt}
         ],
         max_tokens=500,
-        temperature=0.7
+        temperature=0.7,
+        use_cache=use_cache,
+        purpose='seo_description'
     )
-    return response.choices[0].message.content.strip()
 
-def _generate_seo_title(context, alt_text):
+def _generate_seo_title(context, alt_text, use_cache=True):
     """Helper function to generate the SEO title"""
     title_prompt = f"""Create a highly optimized product title following this format:
     [Brand Name] [Model/Series] [Identifier], [Primary Spec] ([Value/Rating]), [Secondary Spec], [Capacity/Size] ([Color/Material], [Key Feature]) [Additional Info]
@@ -127,8 +144,7 @@ def _generate_seo_title(context, alt_text):
     9. Use commas and parentheses for separation
     10. Match format of relevant category example"""
 
-    openai = get_openai_client()
-    response = openai.ChatCompletion.create(
+    return chat_completion(
         model="gpt-4",
         messages=[
             {
@@ -147,9 +163,10 @@ def _generate_seo_title(context, alt_text):
             {"role": "user", "content": title_prompt}
         ],
         max_tokens=100,
-        temperature=0.3
+        temperature=0.3,
+        use_cache=use_cache,
+        purpose='seo_title'
     )
-    return response.choices[0].message.content.strip()
 
 def _extract_sections(description):
     """Helper function to extract sections from the description"""
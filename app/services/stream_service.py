@@ -0,0 +1,100 @@
+"""
+Server-sent-events streaming of pipeline runs.
+
+Stage results are sent as soon as each stage finishes and LLM text is
+forwarded piece by piece while it is generated, so the client can render
+the alt text long before the slowest stage is done. Events:
+
+    stage   {"stage", "data", "elapsed_ms"}   a stage finished
+    token   {"stage", "text"}                 generated LLM text for a running stage
+    error   {"stage", "error"}                a stage failed or was skipped
+    done    the same body the non-streaming endpoint returns, plus "status"
+"""
+import json
+import queue
+import logging
+from app.services.executor_service import submit
+from app.services.pipeline_service import current_stage
+from app.services.llm_service import stream_tokens
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+def sse_event(event, data):
+    """
+    Format one server-sent event.
+    Args:
+        event (str): Event name
+        data: JSON-serializable payload
+    Returns:
+        str: The encoded event
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def stream_pipeline(pipeline, build_response, stages, cleanup=None, **inputs):
+    """
+    Start a pipeline in the background and return an iterator over its progress.
+    Args:
+        pipeline (Pipeline): Pipeline to run
+        build_response (callable): Takes the PipelineRun, returns (response body, HTTP status)
+        stages (dict): Stage name -> callable shaping its result for the client (None sends
+            it as is); only these stages produce stage, token and error events
+        cleanup (callable): Optional, run once the pipeline has finished, even if the client
+            disconnected first (e.g. closing the upload the stages read from)
+        **inputs: Pipeline inputs
+    Returns:
+        iterator: (event name, payload) tuples, ending after the 'done' event
+    """
+    events = queue.Queue()
+
+    def on_stage(name, value, error, elapsed_ms):
+        if name not in stages:
+            return
+        if error is not None:
+            events.put(('error', {'stage': name, 'error': str(error)}))
+            return
+        shape = stages[name]
+        events.put(('stage', {'stage': name, 'data': shape(value) if shape else value, 'elapsed_ms': elapsed_ms}))
+
+    def on_token(text):
+        name = current_stage.get()
+        if name in stages:
+            events.put(('token', {'stage': name, 'text': text}))
+
+    def drive():
+        try:
+            with stream_tokens(on_token):
+                run = pipeline.execute(inputs, listener=on_stage)
+            body, status = build_response(run)
+            events.put(('done', dict(body, status=status)))
+        except Exception as e:
+            logger.error(f"Error streaming pipeline: {str(e)}")
+            events.put(('error', {'stage': None, 'error': str(e)}))
+        finally:
+            if cleanup is not None:
+                cleanup()
+            events.put(_END)
+
+    def iter_events():
+        while True:
+            item = events.get()
+            if item is _END:
+                return
+            yield item
+
+    submit(drive)
+    return iter_events()
+
+def sse_stream(events):
+    """
+    Encode (event, payload) tuples as a server-sent-events body.
+    Args:
+        events (iterable): Events from stream_pipeline
+    Yields:
+        str: Encoded events
+    """
+    # An initial comment gets the headers and first bytes out immediately
+    yield ': stream open\n\n'
+    for event, data in events:
+        yield sse_event(event, data)
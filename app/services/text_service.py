@@ -1,31 +1,34 @@
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-import httpx
-from config.ai_config import get_openai_client, format_success_response, format_error_response, GPT_CONFIG
+from nltk.sentiment.vader import SentimentIntensityAnalyzer, SentiText
+import copy
+import threading
+from config.ai_config import format_success_response, format_error_response, GPT_CONFIG
+from app.services.llm_service import chat_completion
 import logging
 
 logger = logging.getLogger(__name__)
 
-def generate_context(alt_text):
+def generate_context(alt_text, use_cache=True):
     """
     Generates context from alt text using OpenAI.
     Args:
         alt_text (str): Alt text to generate context from
+        use_cache (bool): Reuse a cached response for identical input
     Returns:
         dict: Response containing generated context
     """
     prompt = f"Generate a brief context (maximum 70 words) for this image description:\n\n{alt_text}"
     try:
-        openai = get_openai_client()
-        response = openai.ChatCompletion.create(
+        context = chat_completion(
             model=GPT_CONFIG["model"],
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that provides concise context for images. Keep responses under 50 words."},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=100,
-            temperature=GPT_CONFIG["temperature"]
+            temperature=GPT_CONFIG["temperature"],
+            use_cache=use_cache,
+            purpose='context'
         )
-        context = response.choices[0].message['content'].strip()
         words = context.split()
         if len(words) > 70:
             context = ' '.join(words[:70]) + '...'
@@ -36,16 +39,16 @@ def generate_context(alt_text):
             error_code="CONTEXT_GENERATION_ERROR"
         )
 
-def enhance_context(context):
+def enhance_context(context, use_cache=True):
     """
     Enhances the context with additional details.
     Args:
         context (str): Original context to enhance
+        use_cache (bool): Reuse a cached response for identical input
     Returns:
         dict: Response containing enhanced context
     """
     try:
-        openai = get_openai_client()
         prompt = f"""Enhance this context with more descriptive details while maintaining accuracy:
 
 Original: {context}
@@ -56,17 +59,17 @@ Requirements:
 3. Maintain factual accuracy
 4. Keep the enhanced version under 100 words"""
 
-        response = openai.ChatCompletion.create(
+        enhanced = chat_completion(
             model=GPT_CONFIG["model"],
             messages=[
                 {"role": "system", "content": "You are a detail-oriented writer that enhances descriptions while maintaining accuracy."},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=150,
-            temperature=0.7
+            temperature=0.7,
+            use_cache=use_cache,
+            purpose='enhance_context'
         )
-        
-        enhanced = response.choices[0].message['content'].strip()
         return format_success_response({'enhanced_context': enhanced})
     except Exception as e:
         return format_error_response(
@@ -74,16 +77,16 @@ Requirements:
             error_code="CONTEXT_ENHANCEMENT_ERROR"
         )
 
-def social_media_caption(context):
+def social_media_caption(context, use_cache=True):
     """
     Generates social media caption with hashtags.
     Args:
         context (str): Context to generate caption from
+        use_cache (bool): Reuse a cached response for identical input
     Returns:
         dict: Response containing caption and hashtags
     """
     try:
-        openai = get_openai_client()
         prompt = f"""Create an engaging social media caption with relevant hashtags based on this context:
 
 Context: {context}
@@ -94,17 +97,17 @@ Requirements:
 3. Maximum 2-3 sentences
 4. Include emojis where appropriate"""
 
-        response = openai.ChatCompletion.create(
+        caption = chat_completion(
             model=GPT_CONFIG["model"],
             messages=[
                 {"role": "system", "content": "You are a social media expert that creates engaging captions."},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=100,
-            temperature=0.8
+            temperature=0.8,
+            use_cache=use_cache,
+            purpose='social_caption'
         )
-        
-        caption = response.choices[0].message['content'].strip()
         return format_success_response({'caption': caption})
     except Exception as e:
         return format_error_response(
@@ -112,6 +115,82 @@ Requirements:
             error_code="CAPTION_GENERATION_ERROR"
         )
 
+def generate_hashtags(context, caption=None):
+    """
+    Generates relevant hashtags from a social media caption.
+    Args:
+        context (str): Context the caption was generated from
+        caption (str): Optional caption text; generated from context if not given
+    Returns:
+        str: Space-separated hashtags
+    """
+    try:
+        # Use the social_media_caption output but extract hashtags
+        if caption is None:
+            caption_result = social_media_caption(context)
+            caption = caption_result['data']['caption'] if caption_result['success'] else ''
+        words = caption.split()
+        hashtags = [word for word in words if word.startswith('#')]
+        
+        # If no hashtags found in the caption, generate basic ones from context
+        if not hashtags:
+            words = context.split()
+            hashtags = [f"#{word.lower()}" for word in words if len(word) > 3][:5]
+        
+        return " ".join(hashtags)
+    except Exception as e:
+        logger.error(f"Error generating hashtags: {str(e)}")
+        return ""
+
+# VADER analyzer shared by all requests; loading the lexicon is the expensive part
+_sentiment_analyzer = None
+_sentiment_analyzer_lock = threading.Lock()
+
+def get_sentiment_analyzer():
+    """
+    Get the process-wide VADER analyzer, building it on first use.
+    Returns:
+        SentimentIntensityAnalyzer: Shared analyzer
+    """
+    global _sentiment_analyzer
+    if _sentiment_analyzer is None:
+        with _sentiment_analyzer_lock:
+            if _sentiment_analyzer is None:
+                _sentiment_analyzer = SentimentIntensityAnalyzer()
+    return _sentiment_analyzer
+
+def _sentiment_result(scores):
+    """Build the sentiment response payload from VADER polarity scores"""
+    # Determine sentiment category
+    compound = scores['compound']
+    if compound >= 0.05:
+        category = 'Positive'
+    elif compound <= -0.05:
+        category = 'Negative'
+    else:
+        category = 'Neutral'
+        
+    return format_success_response({
+        'sentiment': {
+            'score': compound,
+            'category': category,
+            'details': scores
+        }
+    })
+
+def _init_error_response(e):
+    logger.error(f"Error initializing sentiment analyzer: {str(e)}")
+    return format_error_response(
+        error_message="Error initializing sentiment analyzer. Please ensure NLTK data is properly installed.",
+        error_code="SENTIMENT_INIT_ERROR"
+    )
+
+def _empty_text_response():
+    return format_error_response(
+        error_message="No text provided for sentiment analysis",
+        error_code="EMPTY_TEXT_ERROR"
+    )
+
 def analyze_sentiment(text):
     """
     Analyzes sentiment of text using VADER.
@@ -122,19 +201,12 @@ def analyze_sentiment(text):
     """
     try:
         if not text:
-            return format_error_response(
-                error_message="No text provided for sentiment analysis",
-                error_code="EMPTY_TEXT_ERROR"
-            )
+            return _empty_text_response()
 
         try:
-            analyzer = SentimentIntensityAnalyzer()
+            analyzer = get_sentiment_analyzer()
         except Exception as e:
-            logger.error(f"Error initializing sentiment analyzer: {str(e)}")
-            return format_error_response(
-                error_message="Error initializing sentiment analyzer. Please ensure NLTK data is properly installed.",
-                error_code="SENTIMENT_INIT_ERROR"
-            )
+            return _init_error_response(e)
 
         try:
             scores = analyzer.polarity_scores(text)
@@ -145,22 +217,7 @@ def analyze_sentiment(text):
                 error_code="SENTIMENT_CALCULATION_ERROR"
             )
         
-        # Determine sentiment category
-        compound = scores['compound']
-        if compound >= 0.05:
-            category = 'Positive'
-        elif compound <= -0.05:
-            category = 'Negative'
-        else:
-            category = 'Neutral'
-            
-        return format_success_response({
-            'sentiment': {
-                'score': compound,
-                'category': category,
-                'details': scores
-            }
-        })
+        return _sentiment_result(scores)
     except Exception as e:
         logger.error(f"Error analyzing sentiment: {str(e)}")
         return format_error_response(
@@ -168,12 +225,110 @@ def analyze_sentiment(text):
             error_code="SENTIMENT_ANALYSIS_ERROR"
         )
 
-def analyze_medical_image(image, alt_text):
+class _BatchTokenizer:
+    """
+    VADER tokenization shared across the texts of a batch.
+    SentiText strips leading or trailing punctuation from each token by
+    building a (punctuation x word) lookup table for every text. The same
+    mapping only depends on the token itself, so here it is worked out once
+    per distinct token and reused for every text in the batch.
+    """
+
+    def __init__(self, analyzer):
+        self.punc_list = analyzer.constants.PUNC_LIST
+        self.remove_punctuation = analyzer.constants.REGEX_REMOVE_PUNCTUATION
+        self._tokens = {}
+
+    def _strip(self, token):
+        """The word inside punctuation + word or word + punctuation, as SentiText maps it"""
+        for punc in self.punc_list:
+            if token.startswith(punc):
+                word = token[len(punc):]
+            elif token.endswith(punc):
+                word = token[:-len(punc)]
+            else:
+                continue
+            if len(word) > 1 and not self.remove_punctuation.search(word):
+                return word
+        return token
+
+    def sentitext(self, text):
+        """A SentiText for text, equivalent to SentiText(text, PUNC_LIST, REGEX_REMOVE_PUNCTUATION)"""
+        words = []
+        for token in text.split():
+            if len(token) > 1:
+                if token not in self._tokens:
+                    self._tokens[token] = self._strip(token)
+                words.append(self._tokens[token])
+        sentitext = SentiText.__new__(SentiText)
+        sentitext.text = text
+        sentitext.PUNC_LIST = self.punc_list
+        sentitext.REGEX_REMOVE_PUNCTUATION = self.remove_punctuation
+        sentitext.words_and_emoticons = words
+        sentitext.is_cap_diff = sentitext.allcap_differential(words)
+        return sentitext
+
+def _polarity_scores(analyzer, sentitext):
+    """SentimentIntensityAnalyzer.polarity_scores on an already tokenized text"""
+    words = sentitext.words_and_emoticons
+    first_index = {}
+    for index, word in enumerate(words):
+        first_index.setdefault(word, index)
+    sentiments = []
+    for item in words:
+        i = first_index[item]
+        if (
+            i < len(words) - 1 and item.lower() == 'kind' and words[i + 1].lower() == 'of'
+        ) or item.lower() in analyzer.constants.BOOSTER_DICT:
+            sentiments.append(0)
+            continue
+        sentiments = analyzer.sentiment_valence(0, sentitext, item, i, sentiments)
+    sentiments = analyzer._but_check(words, sentiments)
+    return analyzer.score_valence(sentiments, sentitext.text)
+
+def analyze_sentiment_batch(texts):
+    """
+    Analyzes sentiment of many texts in one call using the shared VADER analyzer.
+    Tokenization is shared across the batch: each distinct token has its
+    punctuation stripped once (see _BatchTokenizer), and identical texts are
+    scored once. Each input gets its own copy of the result.
+    Args:
+        texts (list): Texts to analyze
+    Returns:
+        list: One response per text, in input order, shaped like analyze_sentiment's
+    """
+    try:
+        analyzer = get_sentiment_analyzer()
+    except Exception as e:
+        error = _init_error_response(e)
+        return [dict(error) for _ in texts]
+
+    tokenizer = _BatchTokenizer(analyzer)
+    scored = {}
+    results = []
+    for text in texts:
+        if not text:
+            results.append(_empty_text_response())
+            continue
+        if text not in scored:
+            try:
+                scored[text] = _sentiment_result(_polarity_scores(analyzer, tokenizer.sentitext(str(text))))
+            except Exception as e:
+                logger.error(f"Error calculating sentiment scores: {str(e)}")
+                scored[text] = format_error_response(
+                    error_message="Error calculating sentiment scores",
+                    error_code="SENTIMENT_CALCULATION_ERROR"
+                )
+        results.append(copy.deepcopy(scored[text]))
+    return results
+
+def analyze_medical_image(image, alt_text, use_cache=True):
     """
     Analyzes medical image and generates detailed report.
     Args:
         image (PIL.Image): Medical image to analyze
         alt_text (str): Generated alt text of the image
+        use_cache (bool): Reuse a cached response for identical input
     Returns:
         dict: Response containing medical analysis
     """
@@ -184,7 +339,6 @@ def analyze_medical_image(image, alt_text):
                 error_code="MISSING_INPUT"
             )
 
-        openai = get_openai_client()
         prompt = f"""Analyze this medical image description and provide a detailed medical report:
 
 Image Description: {alt_text}
@@ -215,7 +369,7 @@ Please provide a comprehensive analysis following this exact format:
 Please maintain a professional, medical tone and be specific with anatomical terminology.
 If you cannot make specific observations, please provide general anatomical descriptions and standard medical imaging protocols."""
 
-        response = openai.ChatCompletion.create(
+        analysis = chat_completion(
             model="gpt-4",
             messages=[
                 {
@@ -233,11 +387,11 @@ If you cannot make specific observations, please provide general anatomical desc
                 {"role": "user", "content": prompt}
             ],
             max_tokens=1000,
-            temperature=0.4
+            temperature=0.4,
+            use_cache=use_cache,
+            purpose='medical_analysis'
         )
         
-        analysis = response.choices[0].message['content'].strip()
-        
         # Parse sections
         sections = {}
         current_section = None
@@ -0,0 +1,238 @@
+"""
+Text-to-speech with sentence chunking, caching and streamed output.
+
+Text is split into sentence-sized chunks that are synthesized concurrently on
+the shared executor, a few at a time, and streamed back in order as each one
+is ready, so playback can start after the first sentence. Each chunk's audio
+is cached under a hash of backend, text, language and voice, so alt text
+that is spoken again is served without synthesis.
+
+Backends (TTS_BACKEND):
+
+    gtts    Google Translate TTS over the network, MP3 (default)
+    espeak  espeak-ng run locally (TTS_ESPEAK_BINARY), WAV; no network round
+            trip, so it can also be benchmarked offline
+"""
+import io
+import os
+import re
+import wave
+import struct
+import logging
+import subprocess
+from collections import deque
+from gtts import gTTS
+from config.config import (
+    CACHE_DIR,
+    TTS_BACKEND,
+    TTS_ESPEAK_BINARY,
+    TTS_CHUNK_CHARS,
+    TTS_MAX_CONCURRENCY,
+    TTS_CACHE_ENABLED,
+    TTS_CACHE_MEMORY_ENTRIES,
+    TTS_CACHE_MAX_BYTES
+)
+from app.utils.cache_utils import LRUCache, SQLiteCache, TieredCache, make_cache_key
+from app.utils.metrics_utils import component_duration, register_cache
+from app.services.executor_service import submit
+
+logger = logging.getLogger(__name__)
+
+# Language codes, gTTS top-level domains and espeak voice names
+_NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._+-]{0,31}$')
+_SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+')
+
+class GTTSBackend:
+    """Google Translate TTS; voice is the accent's top-level domain (com, co.uk, com.au, ...)"""
+    name = 'gtts'
+    mimetype = 'audio/mpeg'
+    extension = 'mp3'
+
+    def synthesize(self, text, lang, voice=None):
+        audio = io.BytesIO()
+        gTTS(text=text, lang=lang, tld=voice or 'com').write_to_fp(audio)
+        return audio.getvalue()
+
+    def stream_piece(self, audio, first):
+        # MP3 frames are self-contained, so chunks concatenate as they are
+        return audio
+
+class EspeakBackend:
+    """espeak-ng in a subprocess; voice is an espeak voice name, defaulting to the language"""
+    name = 'espeak'
+    mimetype = 'audio/wav'
+    extension = 'wav'
+
+    def __init__(self, binary=TTS_ESPEAK_BINARY):
+        self.binary = binary
+
+    def synthesize(self, text, lang, voice=None):
+        # Text goes through stdin so it can never be read as an option
+        result = subprocess.run(
+            [self.binary, '--stdout', '-v', voice or lang],
+            input=text.encode('utf-8'), capture_output=True, timeout=60, check=True
+        )
+        return result.stdout
+
+    def stream_piece(self, audio, first):
+        """
+        Re-frame a chunk's WAV for one continuous stream: the first chunk gets
+        a header with open-ended sizes, later chunks contribute samples only.
+        """
+        with wave.open(io.BytesIO(audio)) as reader:
+            channels, width, rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+            frames = reader.readframes(reader.getnframes())
+        if not first:
+            return frames
+        header = b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE'
+        header += b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, rate, rate * channels * width, channels * width, width * 8)
+        header += b'data' + struct.pack('<I', 0xFFFFFFFF)
+        return header + frames
+
+TTS_BACKENDS = {'gtts': GTTSBackend, 'espeak': EspeakBackend}
+
+def get_backend(name):
+    """
+    Create a synthesis backend by name.
+    Args:
+        name (str): Backend name
+    Returns:
+        object: Backend instance
+    """
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}'. Supported backends: {', '.join(TTS_BACKENDS)}")
+    return TTS_BACKENDS[name]()
+
+def split_sentences(text, max_chars=200):
+    """
+    Split text into chunks of whole sentences of at most max_chars
+    (a longer sentence is split between words).
+    Args:
+        text (str): Text to split
+        max_chars (int): Target chunk length
+    Returns:
+        list: Non-empty chunks, in order
+    """
+    pieces = []
+    for sentence in _SENTENCE_END.split(' '.join(text.split())):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars + 1)  # A space right at the limit still counts
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+class TTSService:
+    """Chunked, cached and streamed synthesis over one backend"""
+
+    def __init__(self, backend, cache=None, chunk_chars=200, max_concurrency=4):
+        """
+        Args:
+            backend (object): Synthesis backend (see TTS_BACKENDS)
+            cache (TieredCache): Cache of per-chunk audio, or None
+            chunk_chars (int): Target chunk length
+            max_concurrency (int): Chunks synthesized at the same time per request
+        """
+        self.backend = backend
+        self.cache = cache
+        self.chunk_chars = chunk_chars
+        self.max_concurrency = max(1, max_concurrency)
+
+    def synthesize_chunk(self, text, lang, voice=None):
+        """
+        Get one chunk's audio from the cache or the backend.
+        Returns:
+            bytes: Encoded audio of the chunk
+        """
+        key = make_cache_key('tts', self.backend.name, text, lang, voice) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        with component_duration.time('tts'):
+            audio = self.backend.synthesize(text, lang, voice)
+
+        if key is not None:
+            self.cache.set(key, audio)
+        return audio
+
+    def stream(self, text, lang='en', voice=None):
+        """
+        Synthesize text, streaming audio in order as chunks become ready.
+        The first chunk is synthesized before this returns, so invalid input
+        and backend failures raise here rather than in the middle of a response.
+        Args:
+            text (str): Text to speak
+            lang (str): Language code
+            voice (str): Backend-specific voice, or None for the default
+        Returns:
+            iterator: Audio bytes, one piece per chunk
+        """
+        for name in (lang, voice):
+            if name is not None and not _NAME_PATTERN.match(name):
+                raise ValueError(f"Invalid language or voice '{name}'")
+        chunks = split_sentences(text, self.chunk_chars)
+        if not chunks:
+            raise ValueError("No text to synthesize")
+
+        pending = deque()
+        upcoming = iter(chunks)
+
+        def fill():
+            while len(pending) < self.max_concurrency:
+                chunk = next(upcoming, None)
+                if chunk is None:
+                    return
+                pending.append(submit(self.synthesize_chunk, chunk, lang, voice))
+
+        fill()
+        try:
+            first = self.backend.stream_piece(pending.popleft().result(), True)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        fill()
+        return self._iter_pieces(first, pending, fill)
+
+    def _iter_pieces(self, first, pending, fill):
+        try:
+            yield first
+            while pending:
+                audio = pending.popleft().result()
+                fill()
+                yield self.backend.stream_piece(audio, False)
+        except Exception as e:
+            # Headers are sent already; end the stream early instead of failing it
+            logger.error(f"Error synthesizing speech: {str(e)}")
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def get_cache_stats(self):
+        """
+        Get hit, miss and eviction counters of the TTS cache
+        Returns:
+            dict: Cache statistics, or None if the cache is disabled
+        """
+        return self.cache.get_stats() if self.cache is not None else None
+
+tts_cache = None
+if TTS_CACHE_ENABLED:
+    tts_cache = TieredCache(
+        LRUCache(TTS_CACHE_MEMORY_ENTRIES),
+        SQLiteCache(os.path.join(CACHE_DIR, 'tts.sqlite3'), TTS_CACHE_MAX_BYTES)
+    )
+
+tts_service = TTSService(get_backend(TTS_BACKEND), tts_cache, TTS_CHUNK_CHARS, TTS_MAX_CONCURRENCY)
+register_cache('tts', tts_service.get_cache_stats)
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(*parts):
+    """
+    Build a stable cache key from arbitrary JSON-serializable parts.
+    Args:
+        *parts: Values that together identify a cached result
+    Returns:
+        str: Hex digest of the parts
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _expires_at(ttl):
+    """Absolute expiry time for a time-to-live in seconds (None never expires)"""
+    return time.time() + ttl if ttl else None
+
+class LRUCache:
+    """Bounded, thread-safe in-process cache with least-recently-used eviction"""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        """
+        Args:
+            max_entries (int): Maximum number of entries
+            ttl (float): Optional time-to-live of each entry, in seconds
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key):
+        """
+        Look up a key and mark it as recently used.
+        Args:
+            key (str): Cache key
+        Returns:
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entries if full.
+        Args:
+            key (str): Cache key
+            value: Value to store
+        """
+        with self._lock:
+            self._data[key] = (value, _expires_at(self.ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self):
+        """
+        Get hit, miss and eviction counters.
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._data)
+        stats['max_entries'] = self.max_entries
+        return stats
+
+class SQLiteCache:
+    """Persistent cache in a single SQLite file with size-based LRU eviction"""
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, ttl=None):
+        """
+        Args:
+            path (str): SQLite database file
+            max_bytes (int): Maximum total size of stored values
+            ttl (float): Optional time-to-live of each entry, in seconds
+        """
+        self.path = path
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    is_bytes INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    expires_at REAL
+                )
+            """)
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(cache)')]
+            if 'expires_at' not in columns:
+                self._conn.execute('ALTER TABLE cache ADD COLUMN expires_at REAL')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache (last_access)')
+            self._conn.commit()
+            row = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()
+            self._total_bytes = row[0]
+
+    def get(self, key):
+        """
+        Look up a key and refresh its access time.
+        Args:
+            key (str): Cache key
+        Returns:
+            The cached value, or None on a miss
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT value, is_bytes, size, expires_at FROM cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    self._stats['misses'] += 1
+                    return None
+                value, is_bytes, size, expires_at = row
+                now = time.time()
+                if expires_at is not None and expires_at <= now:
+                    self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                    self._conn.commit()
+                    self._total_bytes -= size
+                    self._stats['expirations'] += 1
+                    self._stats['misses'] += 1
+                    return None
+                self._conn.execute('UPDATE cache SET last_access = ? WHERE key = ?', (now, key))
+                self._conn.commit()
+                self._stats['hits'] += 1
+            return bytes(value) if is_bytes else json.loads(value)
+        except Exception as e:
+            logger.error(f"Error reading from disk cache: {str(e)}")
+            return None
+
+    def set(self, key, value):
+        """
+        Store a value, evicting least recently used entries above max_bytes.
+        Args:
+            key (str): Cache key
+            value: Bytes or a JSON-serializable value
+        """
+        try:
+            is_bytes = isinstance(value, (bytes, bytearray))
+            blob = bytes(value) if is_bytes else json.dumps(value).encode('utf-8')
+            size = len(blob)
+            if size > self.max_bytes:
+                return
+
+            with self._lock:
+                old = self._conn.execute('SELECT size FROM cache WHERE key = ?', (key,)).fetchone()
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO cache (key, value, is_bytes, size, last_access, expires_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, blob, int(is_bytes), size, time.time(), _expires_at(self.ttl))
+                )
+                self._total_bytes += size - (old[0] if old else 0)
+                self._evict()
+                self._conn.commit()
+        except Exception as e:
+            logger.error(f"Error writing to disk cache: {str(e)}")
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits in max_bytes (lock held)"""
+        if self._total_bytes > self.max_bytes and self.ttl:
+            expired = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE expires_at <= ?', (time.time(),)
+            ).fetchone()
+            if expired[0]:
+                self._conn.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+                self._total_bytes -= expired[1]
+                self._stats['expirations'] += expired[0]
+
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                'SELECT key, size FROM cache ORDER BY last_access ASC LIMIT 64'
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self._total_bytes -= size
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._conn.execute('DELETE FROM cache')
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def get_stats(self):
+        """
+        Get hit, miss and eviction counters.
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            stats['bytes'] = self._total_bytes
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+class TieredCache:
+    """In-process LRU tier in front of a persistent disk tier"""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        """
+        Look up a key in memory first, then on disk (promoting disk hits).
+        Args:
+            key (str): Cache key
+        Returns:
+            The cached value, or None on a miss
+        """
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+
+        with self._lock:
+            self._stats['hits' if value is not None else 'misses'] += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Store a value in both tiers.
+        Args:
+            key (str): Cache key
+            value: Value to store
+        """
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        """Remove all entries from both tiers"""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def get_stats(self):
+        """
+        Get overall and per-tier hit, miss and eviction counters.
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['memory'] = self.memory.get_stats()
+        stats['disk'] = self.disk.get_stats() if self.disk is not None else None
+        return stats
@@ -49,4 +49,4 @@ def validate_image(input_data):
         import logging
         logger = logging.getLogger(__name__)
         logger.error(f"Error validating image: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
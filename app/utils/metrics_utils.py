@@ -0,0 +1,295 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters, gauges and fixed-bucket histograms keyed by label values. An
+observation is a dict lookup, a bisect and an increment under the metric's
+lock, cheap enough to leave on for every request. Values derived from state
+that is kept elsewhere (cache counters, client statistics) are read by
+collector callbacks at scrape time instead of being mirrored on every update.
+"""
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from flask import request, g
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans sub-millisecond text stages to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        """
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+            labels (tuple): Label names; values are passed positionally in the same order
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, label_values):
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.labels}, got {label_values}")
+        return tuple(str(value) for value in label_values)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in sorted(values.items())
+        ]
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    kind = 'gauge'
+
+    def inc(self, *label_values, amount=1):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in sorted(values.items())
+        ]
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed upper bounds"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        key = self._key(label_values)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observe the wall time of the with-block, in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        lines = self.header()
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, key, ('le', _format_value(float(bound))))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Named metrics plus scrape-time collectors"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def register_collector(self, collector):
+        """
+        Add a scrape-time collector.
+        Args:
+            collector (callable): Returns an iterable of (name, kind, help text, [(labels dict, value), ...])
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text format.
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {str(e)}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+# Process-wide registry and the metrics the services record into
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status')
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time to produce the response (headers, for streamed responses)', ('route', 'method')
+)
+http_in_flight = registry.gauge('http_requests_in_flight', 'Requests being handled', ('route',))
+errors = registry.counter('errors_total', 'Error responses and failed service results by error code', ('source', 'code'))
+stage_duration = registry.histogram(
+    'pipeline_stage_duration_seconds', 'Wall time of analysis pipeline stages', ('pipeline', 'stage')
+)
+stage_failures = registry.counter(
+    'pipeline_stage_failures_total', 'Pipeline stages that raised or were skipped', ('pipeline', 'stage', 'outcome')
+)
+component_duration = registry.histogram(
+    'component_duration_seconds', 'Wall time of shared components (BLIP generate, TTS, upload ingestion)', ('component',)
+)
+llm_request_duration = registry.histogram(
+    'llm_request_duration_seconds', 'Uncached LLM completions by provider and purpose', ('provider', 'purpose')
+)
+llm_tokens = registry.counter(
+    'llm_tokens_total', 'LLM tokens by model and kind (prompt or completion)', ('model', 'kind')
+)
+
+# Caches reported at scrape time: name -> callable returning TieredCache-style stats
+_caches = {}
+
+def register_cache(name, get_stats):
+    """
+    Report a cache's hit and miss counters on /metrics.
+    Args:
+        name (str): Value of the cache label
+        get_stats (callable): Returns a dict with 'hits' and 'misses', or None if disabled
+    """
+    _caches[name] = get_stats
+
+def _collect_caches():
+    stats = {}
+    for name, get_stats in list(_caches.items()):
+        cache_stats = get_stats()
+        if cache_stats is not None:
+            stats[name] = cache_stats
+    lookups = {name: cache_stats['hits'] + cache_stats['misses'] for name, cache_stats in stats.items()}
+    yield 'cache_hits_total', 'counter', 'Cache lookups that hit', [
+        ({'cache': name}, cache_stats['hits']) for name, cache_stats in stats.items()
+    ]
+    yield 'cache_misses_total', 'counter', 'Cache lookups that missed', [
+        ({'cache': name}, cache_stats['misses']) for name, cache_stats in stats.items()
+    ]
+    yield 'cache_hit_ratio', 'gauge', 'Hits over lookups since start', [
+        ({'cache': name}, cache_stats['hits'] / lookups[name] if lookups[name] else 0.0) for name, cache_stats in stats.items()
+    ]
+
+registry.register_collector(_collect_caches)
+
+def _route_label():
+    # The URL rule, not the path, so ids in paths do not create new series
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def init_request_metrics(app):
+    """
+    Record per-route latency, status, in-flight and error-code metrics for every request.
+    Args:
+        app (Flask): Application to instrument
+    """
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_route = _route_label()
+        http_in_flight.inc(g.metrics_route)
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        route = g.metrics_route
+        http_request_duration.observe(time.perf_counter() - started, route, request.method)
+        http_requests.inc(route, request.method, response.status_code)
+        if response.status_code >= 400 and response.is_json and not response.is_streamed:
+            body = response.get_json(silent=True)
+            if isinstance(body, dict):
+                errors.inc('http', body.get('error_code') or body.get('code') or f"HTTP_{response.status_code}")
+        return response
+
+    @app.teardown_request
+    def _end_request_metrics(exc):
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            http_in_flight.dec(route)
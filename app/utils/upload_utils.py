@@ -0,0 +1,137 @@
+import io
+import time
+import hashlib
+import tempfile
+from flask import Request
+from PIL import Image
+from config.config import UPLOAD_SPOOL_MAX_MEMORY
+from app.utils.metrics_utils import component_duration
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """Spooled buffer that hashes bytes as they are appended, so nothing reads them back to hash them"""
+
+    def __init__(self, max_size=0, mode='rb+'):
+        super().__init__(max_size=max_size, mode=mode)
+        self._digest = hashlib.sha256()
+        self.size = 0  # Bytes appended and hashed
+        self.appended = True  # False once a write lands anywhere but the end
+
+    def write(self, data):
+        if self.appended and self.tell() == self.size:
+            self._digest.update(data)
+            self.size += len(data)
+        else:
+            self.appended = False
+        return super().write(data)
+
+    @property
+    def sha256(self):
+        """SHA-256 hex digest of the contents, or None if they were not written strictly in order"""
+        return self._digest.hexdigest() if self.appended else None
+
+class SpoolingRequest(Request):
+    """
+    Request whose multipart file parts are buffered in memory and only
+    spill to an anonymous temp file above UPLOAD_SPOOL_MAX_MEMORY.
+    Parts are hashed while the form is parsed.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile(max_size=UPLOAD_SPOOL_MAX_MEMORY)
+
+class Upload:
+    """An uploaded image's bytes, read from the buffer they arrived in"""
+
+    def __init__(self, stream, filename, sha256, size):
+        """
+        Args:
+            stream: Seekable binary stream holding the upload
+            filename (str): Client-supplied filename
+            sha256 (str): SHA-256 hex digest of the bytes
+            size (int): Number of bytes
+        """
+        self.stream = stream
+        self.filename = filename
+        self.sha256 = sha256
+        self.size = size
+
+    @property
+    def spilled(self):
+        """Whether the bytes live in a temp file rather than in memory"""
+        return bool(getattr(self.stream, '_rolled', False))
+
+    def open_image(self):
+        """
+        Open the upload as an image without copying it.
+        Pixel data is decoded lazily by PIL, straight from the buffer.
+        Returns:
+            PIL.Image: The opened image
+        """
+        self.stream.seek(0)
+        return Image.open(self.stream)
+
+    def read(self):
+        """Return all of the uploaded bytes"""
+        self.stream.seek(0)
+        return self.stream.read()
+
+    def close(self):
+        """Release the buffer (and its temp file, if it spilled)"""
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def ingest_upload(file, chunk_size=64 * 1024):
+    """
+    Hash an uploaded file in place, without writing it anywhere.
+    Parts buffered by SpoolingRequest were hashed as they arrived, so they are not read again.
+    Args:
+        file (FileStorage): Uploaded file
+        chunk_size (int): Number of bytes to read at a time
+    Returns:
+        Upload: The upload, backed by the request's own buffer
+    """
+    started = time.perf_counter()
+    stream = file.stream
+    if not stream.seekable():
+        # Fall back to copying into a spooled buffer, hashing on the way
+        spooled = HashingSpooledFile(max_size=UPLOAD_SPOOL_MAX_MEMORY)
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            spooled.write(chunk)
+        stream = spooled
+
+    if isinstance(stream, HashingSpooledFile) and stream.sha256 is not None:
+        stream.seek(0)
+        component_duration.observe(time.perf_counter() - started, 'upload_ingest')
+        return Upload(stream, file.filename, stream.sha256, stream.size)
+
+    digest = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    component_duration.observe(time.perf_counter() - started, 'upload_ingest')
+    return Upload(stream, file.filename, digest.hexdigest(), size)
+
+def ingest_bytes(data, filename=None):
+    """
+    Wrap image bytes that are already in memory.
+    Args:
+        data (bytes): Image bytes
+        filename (str): Optional original filename
+    Returns:
+        Upload: The upload, backed by an in-memory buffer
+    """
+    return Upload(io.BytesIO(data), filename, hashlib.sha256(data).hexdigest(), len(data))
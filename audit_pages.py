@@ -0,0 +1,77 @@
+"""
+Generate alt text for every <img> missing it across an HTML page or a site directory.
+
+Images are deduplicated across all pages, so each distinct source is loaded
+and captioned once. Relative srcs resolve to files next to the page
+(root-relative ones against the site directory), or against --base-url if
+given. Absolute http(s) srcs are downloaded.
+
+Usage:
+    python audit_pages.py site/ --out patched/            # write patched copies of every page
+    python audit_pages.py page.html --json alt_text.json  # write the src -> alt text mapping
+    python audit_pages.py site/ [--base-url https://example.com/] [--concurrency 8] [--caption-tier balanced]
+"""
+import os
+import sys
+import json
+import argparse
+
+def iter_pages(path):
+    """(path, HTML) of the page, or of every .html/.htm file under a directory"""
+    if os.path.isfile(path):
+        paths = [path]
+    else:
+        paths = sorted(
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(path)
+            for name in names if name.lower().endswith(('.html', '.htm'))
+        )
+    for page_path in paths:
+        with open(page_path, encoding='utf-8', errors='replace') as f:
+            yield page_path, f.read()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='HTML file or directory of pages')
+    parser.add_argument('--base-url', help='URL relative image srcs resolve against, instead of local files')
+    parser.add_argument('--out', help='Directory for patched copies of the pages (same relative paths)')
+    parser.add_argument('--json', help='Write the src -> alt text mapping, errors and counts to this file')
+    parser.add_argument('--concurrency', type=int, help='Images loaded and captioned at a time')
+    parser.add_argument('--caption-tier', help='fast, balanced or quality')
+    args = parser.parse_args()
+
+    from config.config import AUDIT_CONCURRENCY
+    from app.services.audit_service import audit_pages, patch_html
+
+    root_dir = os.path.abspath(args.path if os.path.isdir(args.path) else os.path.dirname(args.path))
+    pages = [(os.path.abspath(page_path), html) for page_path, html in iter_pages(args.path)]
+    report = audit_pages(
+        pages, base_url=args.base_url, root_dir=root_dir,
+        concurrency=args.concurrency or AUDIT_CONCURRENCY, tier=args.caption_tier
+    )
+
+    if args.out:
+        for page in report['pages']:
+            target = os.path.join(args.out, os.path.relpath(page['path'], root_dir))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(patch_html(page['html'], page['tags'], page['alt_texts']))
+
+    summary = {'alt_text': report['alt_text'], 'errors': report['errors'], 'counts': report['counts']}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+    elif not args.out:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+
+    counts = report['counts']
+    print(
+        f"{counts['pages']} pages, {counts['images_missing_alt']} images missing alt text, "
+        f"{counts['distinct_images']} distinct; {counts['captioned']} captioned ({counts['cached']} cached), "
+        f"{counts['failed']} failed",
+        file=sys.stderr
+    )
+
+if __name__ == '__main__':
+    main()
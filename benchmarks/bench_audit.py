@@ -0,0 +1,87 @@
+"""
+Time a site-wide alt-text audit at different concurrency levels.
+
+A synthetic site of --pages pages is audited. Each page shows --per-page
+images drawn from --distinct images served by the local fake image server
+(with --latency-ms per request), so most <img> tags repeat. BLIP is the tiny
+random model from bench_utils and the caption and image URL caches are
+disabled, so every run does the full work.
+
+Usage:
+    python benchmarks/bench_audit.py [--pages 50] [--per-page 10] [--distinct 60] [--latency-ms 50]
+                                     [--concurrency 1,4,8,16] [--json out.json]
+"""
+import json
+import time
+import random
+import argparse
+
+from bench_utils import tiny_blip
+from fake_image_server import FakeImageServer
+
+def build_site(base_url, pages, per_page, distinct, seed=0):
+    """(None, HTML) pages whose images repeat across the site"""
+    rng = random.Random(seed)
+    site = []
+    for page in range(pages):
+        tags = ''.join(
+            f'<img src="{base_url}/images/{rng.randrange(distinct)}.jpg?mp=0.1">\n' for _ in range(per_page)
+        )
+        site.append((None, f"<html><body><h1>Page {page}</h1>\n{tags}</body></html>"))
+    return site
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--per-page', type=int, default=10, help='Images per page')
+    parser.add_argument('--distinct', type=int, default=60, help='Distinct images across the site')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Image server delay per request')
+    parser.add_argument('--concurrency', default='1,4,8,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    import config.config as config
+    config.CAPTION_CACHE_ENABLED = False
+    config.IMAGE_FETCH_CACHE_ENABLED = False
+    config.IMAGE_FETCH_ALLOW_PRIVATE = True  # The fake image server is on localhost
+    server = FakeImageServer(latency_ms=args.latency_ms).start()
+
+    from app.services.image_service import image_processor
+    from app.services.audit_service import audit_pages
+    image_processor.models.processor, image_processor.models.model = tiny_blip()
+
+    site = build_site(server.base_url, args.pages, args.per_page, args.distinct)
+    # Warm the image server's JPEG generation and the model before timing
+    audit_pages(site[:1], concurrency=4)
+
+    results = []
+    for concurrency in [int(value) for value in args.concurrency.split(',')]:
+        requests_before = server.stats['requests']
+        started = time.perf_counter()
+        report = audit_pages(site, concurrency=concurrency)
+        elapsed = time.perf_counter() - started
+        results.append({
+            'concurrency': concurrency,
+            'seconds': round(elapsed, 2),
+            'img_tags': report['counts']['images_missing_alt'],
+            'distinct': report['counts']['distinct_images'],
+            'fetches': server.stats['requests'] - requests_before,
+            'tags_per_s': round(report['counts']['images_missing_alt'] / elapsed, 1)
+        })
+    server.stop()
+
+    header = f"{'concurrency':>11} {'seconds':>8} {'img tags':>9} {'distinct':>9} {'fetches':>8} {'tags/s':>8}"
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        print(
+            f"{row['concurrency']:>11} {row['seconds']:>8.2f} {row['img_tags']:>9} {row['distinct']:>9} "
+            f"{row['fetches']:>8} {row['tags_per_s']:>8.1f}"
+        )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
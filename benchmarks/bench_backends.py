@@ -0,0 +1,145 @@
+"""
+Compare the BLIP CPU inference backends against the fp32 eager baseline.
+
+Each backend runs in a fresh process with the same thread count and reports:
+
+    load_ms      model load (and conversion, on a cold artifact cache)
+    model_mb     RSS growth from loading the model
+    p50_ms       median latency of one single-image caption
+    img_per_s    throughput of batched captioning
+    exact        fraction of captions identical to the eager baseline
+    token_f1     mean token-overlap F1 of the captions against the baseline
+    batch_exact  the same as exact, for the captions of the batched run
+
+Run it twice to see both the cold (converting) and warm (cached artifact) load times.
+
+Usage:
+    python benchmarks/bench_backends.py [--backends eager,int8,traced] [--threads 4] [--images 8] [--batch 4]
+"""
+import time
+import json
+import argparse
+import tempfile
+from collections import Counter
+
+from bench_utils import synthetic_photo, sample_photos, current_rss_mb, run_isolated
+
+def test_images(count):
+    """Real sample photos first, topped up with synthetic ones"""
+    images = sample_photos()[:count]
+    seed = 0
+    while len(images) < count:
+        images.append(synthetic_photo(0.3, seed=seed))
+        seed += 1
+    return images
+
+def token_f1(caption, reference):
+    """Token-overlap F1 between two captions"""
+    tokens, ref_tokens = caption.split(), reference.split()
+    common = sum((Counter(tokens) & Counter(ref_tokens)).values())
+    if not common:
+        return 0.0
+    precision, recall = common / len(tokens), common / len(ref_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+def _measure(model_name, backend, artifact_dir, threads, count, batch_size, repeat):
+    """Child process: load one backend, caption the test images and time it"""
+    import torch
+    from transformers import BlipProcessor
+    from app.services.blip_backends import load_blip_model, set_num_threads
+
+    set_num_threads(threads)
+    images = test_images(count)
+    processor = BlipProcessor.from_pretrained(model_name)
+
+    baseline_mb = current_rss_mb()
+    started = time.perf_counter()
+    model, from_cache = load_blip_model(model_name, backend, artifact_dir)
+    load_ms = (time.perf_counter() - started) * 1000.0
+    model_mb = current_rss_mb() - baseline_mb
+
+    def caption(batch):
+        inputs = processor(images=batch, return_tensors='pt')
+        with torch.no_grad():
+            out = model.generate(**inputs)
+        return [processor.decode(tokens, skip_special_tokens=True) for tokens in out]
+
+    caption(images[:1])
+
+    latencies = []
+    captions = []
+    for _ in range(repeat):
+        captions = []
+        for image in images:
+            started = time.perf_counter()
+            captions.extend(caption([image]))
+            latencies.append((time.perf_counter() - started) * 1000.0)
+    latencies.sort()
+
+    started = time.perf_counter()
+    batch_captions = []
+    for start in range(0, len(images), batch_size):
+        batch_captions.extend(caption(images[start:start + batch_size]))
+    throughput = len(images) / (time.perf_counter() - started)
+
+    return {
+        'backend': backend,
+        'threads': torch.get_num_threads(),
+        'artifact_from_cache': from_cache,
+        'load_ms': load_ms,
+        'model_mb': model_mb,
+        'p50_ms': latencies[len(latencies) // 2],
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'img_per_s': throughput,
+        'rss_mb': current_rss_mb(),
+        'captions': captions,
+        'batch_captions': batch_captions
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='Salesforce/blip-image-captioning-base', help='Local or hub BLIP model')
+    parser.add_argument('--backends', default='eager,int8,traced', help='Comma-separated backends; eager is always the baseline')
+    parser.add_argument('--artifact-dir', help='Converted model cache (default: a temporary directory, so loads are cold)')
+    parser.add_argument('--threads', type=int, default=0, help='torch intra-op threads; 0 keeps the default')
+    parser.add_argument('--images', type=int, default=8, help='Number of test images')
+    parser.add_argument('--batch', type=int, default=4, help='Batch size for the throughput run')
+    parser.add_argument('--repeat', type=int, default=2, help='Latency passes over the test images')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    backends = [name for name in args.backends.split(',') if name]
+    if 'eager' not in backends:
+        backends.insert(0, 'eager')
+    artifact_dir = args.artifact_dir or tempfile.mkdtemp(prefix='blip-artifacts-')
+
+    results = [
+        run_isolated(_measure, args.model, backend, artifact_dir, args.threads, args.images, args.batch, args.repeat)
+        for backend in backends
+    ]
+    reference = next(row for row in results if row['backend'] == 'eager')
+
+    header = (
+        f"{'backend':>8} {'threads':>7} {'cached':>6} {'load_ms':>9} {'model_mb':>9} "
+        f"{'p50_ms':>8} {'p95_ms':>8} {'img_per_s':>9} {'exact':>6} {'token_f1':>8} {'batch_exact':>11}"
+    )
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        pairs = list(zip(row['captions'], reference['captions']))
+        row['exact'] = sum(caption == ref for caption, ref in pairs) / len(pairs)
+        row['token_f1'] = sum(token_f1(caption, ref) for caption, ref in pairs) / len(pairs)
+        batch_pairs = list(zip(row['batch_captions'], reference['batch_captions']))
+        row['batch_exact'] = sum(caption == ref for caption, ref in batch_pairs) / len(batch_pairs)
+        print(
+            f"{row['backend']:>8} {row['threads']:>7} {str(row['artifact_from_cache']):>6} {row['load_ms']:>9.0f} "
+            f"{row['model_mb']:>9.0f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['img_per_s']:>9.2f} "
+            f"{row['exact']:>6.2f} {row['token_f1']:>8.2f} {row['batch_exact']:>11.2f}"
+        )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Peak memory of reading large multi-frame DICOM files, frame by frame.
+
+Synthetic 16-bit CT-like files are generated on disk (streamed, so the
+generator itself stays small). Each file is then read in a fresh process in
+two ways: windowing every frame to 8 bits through DicomVolume (memory-mapped
+pixel data), and the pydicom baseline of loading the whole pixel array first.
+Peak RSS of the DicomVolume run should stay flat as files grow; the baseline
+grows with the file.
+
+Usage:
+    python benchmarks/bench_dicom.py [--frames 50,200,800] [--size 512] [--dir /tmp] [--json out.json]
+"""
+import os
+import json
+import time
+import struct
+import argparse
+import tempfile
+import numpy as np
+
+from bench_utils import run_isolated, peak_rss_mb, current_rss_mb
+
+def write_synthetic_dicom(path, frames, size, seed=0):
+    """
+    Write a multi-frame 16-bit MONOCHROME2 file, one frame at a time.
+    The header is written by pydicom without PixelData; the pixel data
+    element (explicit VR OW) is then appended by hand.
+    """
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.2.1'  # Enhanced CT Image Storage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.preamble = b'\0' * 128
+    ds.is_little_endian, ds.is_implicit_VR = True, False
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = 'CT'
+    ds.BodyPartExamined = 'CHEST'
+    ds.Rows = ds.Columns = size
+    ds.NumberOfFrames = frames
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = 'MONOCHROME2'
+    ds.BitsAllocated, ds.BitsStored, ds.HighBit = 16, 12, 11
+    ds.PixelRepresentation = 0
+    ds.RescaleSlope, ds.RescaleIntercept = 1, -1024
+    ds.WindowCenter, ds.WindowWidth = 40, 400
+    ds.save_as(path, write_like_original=False)
+
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size]
+    body = ((yy - size / 2) ** 2 + (xx - size / 2) ** 2) < (size * 0.4) ** 2
+    length = frames * size * size * 2
+    with open(path, 'ab') as f:
+        f.write(b'\xe0\x7f\x10\x00' + b'OW\x00\x00' + struct.pack('<I', length))
+        for index in range(frames):
+            frame = np.where(body, 1064, 24) + rng.integers(0, 40, (size, size)) + index % 64
+            f.write(frame.astype('<u2').tobytes())
+
+def read_mapped(path):
+    """Window every frame through DicomVolume; (seconds, peak RSS MB, RSS after MB)"""
+    from app.services.dicom_service import DicomVolume
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    with DicomVolume(path) as volume:
+        for index in range(volume.frames):
+            volume.frame_image(index)
+    return time.perf_counter() - started, peak_rss_mb() - baseline, current_rss_mb()
+
+def read_pixel_array(path):
+    """Load the whole pixel array with pydicom, then window every frame; same measurements"""
+    import pydicom
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    ds = pydicom.dcmread(path)
+    pixels = ds.pixel_array
+    for frame in pixels:
+        values = frame.astype(np.float32) - 1024
+        np.clip((values + 160) / 400 * 255, 0, 255).astype(np.uint8)
+    return time.perf_counter() - started, peak_rss_mb() - baseline, current_rss_mb()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', default='50,200,800', help='Comma-separated frame counts')
+    parser.add_argument('--size', type=int, default=512, help='Rows and columns per frame')
+    parser.add_argument('--dir', default=tempfile.gettempdir(), help='Where the synthetic files are written')
+    parser.add_argument('--skip-baseline', action='store_true', help='Only run DicomVolume')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for frames in [int(value) for value in args.frames.split(',')]:
+        path = os.path.join(args.dir, f"bench_dicom_{frames}x{args.size}.dcm")
+        write_synthetic_dicom(path, frames, args.size)
+        file_mb = os.path.getsize(path) / (1024 * 1024)
+        try:
+            readers = [('mapped', read_mapped)] + ([] if args.skip_baseline else [('pixel_array', read_pixel_array)])
+            for name, reader in readers:
+                seconds, peak_mb, rss_mb = run_isolated(reader, path)
+                results.append({
+                    'frames': frames,
+                    'file_mb': round(file_mb, 1),
+                    'reader': name,
+                    'seconds': round(seconds, 2),
+                    'peak_delta_mb': round(peak_mb, 1),
+                    'rss_after_mb': round(rss_mb, 1)
+                })
+        finally:
+            os.remove(path)
+
+    header = f"{'frames':>7} {'file MB':>8} {'reader':>12} {'seconds':>8} {'peak +MB':>9} {'RSS after':>10}"
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        print(
+            f"{row['frames']:>7} {row['file_mb']:>8.1f} {row['reader']:>12} {row['seconds']:>8.2f} "
+            f"{row['peak_delta_mb']:>9.1f} {row['rss_after_mb']:>10.1f}"
+        )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
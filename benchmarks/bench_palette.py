@@ -0,0 +1,116 @@
+"""
+Compare the palette modes used by advanced color analysis.
+
+For each synthetic image size, every mode is timed and scored against the
+full-resolution K-means reference:
+
+    quant_err   mean RGB distance from a fixed pixel sample to its nearest palette color
+    ref_dist    mean RGB distance from each reference color to the nearest mode color
+    share_diff  mean absolute percentage difference between those matched colors
+
+Usage:
+    python benchmarks/bench_palette.py [--megapixels 0.5,2,12] [--repeat 3] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.palette_service import PALETTE_MODES, extract_palette
+
+N_COLORS = 5
+EVAL_PIXELS = 50000
+
+def synthetic_image(megapixels, seed=0):
+    """Photo-like test image: colored regions, a gradient and sensor noise"""
+    rng = np.random.default_rng(seed)
+    width = int(np.sqrt(megapixels * 1e6 * 4 / 3))
+    height = int(width * 3 / 4)
+
+    base = np.array([[34, 139, 34], [135, 206, 235], [210, 180, 140], [178, 34, 34], [245, 245, 245]], dtype=np.float32)
+    region = (np.arange(width)[None, :] * 5 // width + np.arange(height)[:, None] * 2 // height) % len(base)
+    image = base[region]
+    image += np.linspace(-25, 25, width, dtype=np.float32)[None, :, None]
+    image += rng.normal(0, 12, size=image.shape).astype(np.float32)
+    return Image.fromarray(np.clip(image, 0, 255).astype(np.uint8), 'RGB')
+
+def quantization_error(pixels, colors):
+    """Mean distance from each pixel to its nearest palette color"""
+    distances = np.linalg.norm(pixels[:, None, :] - colors[None, :, :], axis=2)
+    return float(distances.min(axis=1).mean())
+
+def reference_error(ref_colors, ref_percentages, colors, percentages):
+    """Mean nearest-color distance and share difference against the reference palette"""
+    distances = np.linalg.norm(ref_colors[:, None, :] - colors[None, :, :], axis=2)
+    nearest = distances.argmin(axis=1)
+    color_distance = float(distances.min(axis=1).mean())
+    share_diff = float(np.abs(ref_percentages - percentages[nearest]).mean())
+    return color_distance, share_diff
+
+def time_mode(image, image_array, mode, repeat):
+    """Best-of-repeat wall time of one mode, and its last palette"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        colors, percentages = extract_palette(image, N_COLORS, mode=mode, image_array=image_array)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000.0, colors, percentages
+
+def run(megapixels_list, repeat):
+    results = []
+    for megapixels in megapixels_list:
+        image = synthetic_image(megapixels)
+        image_array = np.array(image)
+        pixels = image_array.reshape(-1, 3).astype(np.float64)
+        sample = pixels[np.random.default_rng(1).choice(len(pixels), min(EVAL_PIXELS, len(pixels)), replace=False)]
+
+        # The reference is slow, so it is only timed once
+        ref_ms, ref_colors, ref_percentages = time_mode(image, image_array, 'kmeans', 1)
+        for mode in PALETTE_MODES:
+            if mode == 'kmeans':
+                elapsed_ms, colors, percentages = ref_ms, ref_colors, ref_percentages
+            else:
+                elapsed_ms, colors, percentages = time_mode(image, image_array, mode, repeat)
+            ref_dist, share_diff = reference_error(ref_colors, ref_percentages, colors, percentages)
+            results.append({
+                'megapixels': megapixels,
+                'size': list(image.size),
+                'mode': mode,
+                'ms': round(elapsed_ms, 2),
+                'speedup': round(ref_ms / elapsed_ms, 1) if elapsed_ms else None,
+                'quant_err': round(quantization_error(sample, colors), 2),
+                'ref_dist': round(ref_dist, 2),
+                'share_diff': round(share_diff, 2)
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', default='0.5,2', help='Comma-separated image sizes in megapixels')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per fast mode (best is reported)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = run([float(value) for value in args.megapixels.split(',')], args.repeat)
+
+    header = f"{'MP':>5} {'size':>11} {'mode':>10} {'ms':>10} {'speedup':>8} {'quant_err':>10} {'ref_dist':>9} {'share_diff':>11}"
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        size = f"{row['size'][0]}x{row['size'][1]}"
+        print(
+            f"{row['megapixels']:>5} {size:>11} {row['mode']:>10} {row['ms']:>10.1f} {row['speedup']:>8} "
+            f"{row['quant_err']:>10.2f} {row['ref_dist']:>9.2f} {row['share_diff']:>11.2f}"
+        )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Compare the 'full' and 'reduced' caption preprocessing modes on large photos.
+
+Each measurement runs in a fresh process, decoding a JPEG from memory and
+preprocessing it, and reports:
+
+    cpu_ms      CPU time of open + preprocess + BLIP input transform
+    peak_mb     growth of the process's peak RSS over its pre-decode baseline
+    input_diff  mean absolute difference of the BLIP pixel_values against
+                'full' mode (normalized units; 'none' = no enhancement, for scale)
+
+With --model, the captions of both modes are generated and printed as well.
+
+Usage:
+    python benchmarks/bench_preprocess.py [--megapixels 12,24] [--model Salesforce/blip-image-captioning-base]
+"""
+import io
+import time
+import json
+import argparse
+import numpy as np
+from PIL import Image
+
+from bench_utils import synthetic_jpeg, peak_rss_mb, run_isolated
+
+MODES = ('full', 'reduced')
+
+def make_processor(mode):
+    """ImageProcessor using the given preprocessing mode, without the caption cache"""
+    import config.config as config
+    config.CAPTION_CACHE_ENABLED = False
+    from app.services.image_service import ImageProcessor
+
+    processor = ImageProcessor()
+    if mode == 'none':
+        processor.preprocess_image = lambda image: image.convert('RGB')
+    else:
+        processor.preprocess_settings['mode'] = mode
+        processor.preprocess_settings['target_size'] = config.PREPROCESS_TARGET_SIZE if mode == 'reduced' else None
+    return processor
+
+def _measure(mode, data):
+    """Child process: preprocess one image and report time, memory and BLIP inputs"""
+    from transformers import BlipImageProcessor
+
+    processor = make_processor(mode)
+    blip_inputs = BlipImageProcessor()
+
+    baseline_mb = peak_rss_mb()
+    started = time.process_time()
+    image = processor.preprocess_image(Image.open(io.BytesIO(data)))
+    pixel_values = blip_inputs(images=image, return_tensors='np')['pixel_values']
+    cpu_ms = (time.process_time() - started) * 1000.0
+    return {
+        'cpu_ms': cpu_ms,
+        'peak_mb': peak_rss_mb() - baseline_mb,
+        'processed_size': list(image.size),
+        'pixel_values': pixel_values
+    }
+
+def captions(model_name, data):
+    """Captions of the same image under each mode"""
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+
+    blip_processor = BlipProcessor.from_pretrained(model_name)
+    model = BlipForConditionalGeneration.from_pretrained(model_name).eval()
+    results = {}
+    for mode in MODES:
+        image = make_processor(mode).preprocess_image(Image.open(io.BytesIO(data)))
+        inputs = blip_processor(images=image, return_tensors='pt')
+        results[mode] = blip_processor.decode(model.generate(**inputs)[0], skip_special_tokens=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', default='12,24', help='Comma-separated image sizes in megapixels')
+    parser.add_argument('--model', help='Local or hub BLIP model; also compares generated captions')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'MP':>5} {'mode':>8} {'processed':>11} {'cpu_ms':>9} {'peak_mb':>9} {'input_diff':>11}")
+    for megapixels in [float(value) for value in args.megapixels.split(',')]:
+        data = synthetic_jpeg(megapixels)
+        measured = {mode: run_isolated(_measure, mode, data) for mode in ('none',) + MODES}
+        reference = measured['full']['pixel_values']
+        for mode, row in measured.items():
+            diff = float(np.abs(row.pop('pixel_values') - reference).mean())
+            size = f"{row['processed_size'][0]}x{row['processed_size'][1]}"
+            print(f"{megapixels:>5} {mode:>8} {size:>11} {row['cpu_ms']:>9.1f} {row['peak_mb']:>9.1f} {diff:>11.4f}")
+            results.append(dict(row, megapixels=megapixels, mode=mode, input_diff=diff))
+
+        if args.model:
+            for mode, caption in captions(args.model, data).items():
+                print(f"      {mode:>8} caption: {caption}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
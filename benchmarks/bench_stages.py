@@ -0,0 +1,212 @@
+"""
+Per-stage micro-benchmarks of the analysis services, runnable offline.
+
+Image stages run over synthetic JPEGs of each size; text stages over a fixed
+text corpus. BLIP is a randomly initialized two-layer model (bench_utils.tiny_blip),
+so generate() exercises the real batching and decoding path without weights,
+and LLM calls go to a local fake OpenAI server with a fixed latency. The
+caption and LLM caches are disabled.
+
+    decode_validate         ingest_bytes + validate_image + full decode
+    preprocess_image        ImageProcessor.preprocess_image (includes the decode it triggers)
+    validate_image_quality  ImageProcessor.validate_image_quality (includes its decode)
+    blip_generate           ImageProcessor._generate_captions on a preprocessed image
+    analyze_colors          AdvancedImageProcessor.analyze_colors on a loaded image
+    analyze_sentiment       text_service.analyze_sentiment
+    extract_keywords        seo_service.extract_keywords
+    extract_sections        seo_service._extract_sections
+    llm_context             text_service.generate_context against the fake server
+    llm_seo                 seo_service.generate_seo_description (two concurrent calls)
+
+Results go to a JSON file that a later run can be compared against with --compare.
+
+Usage:
+    python benchmarks/bench_stages.py [--megapixels 0.5,2,8] [--images 3] [--repeat 3] [--stages ...]
+                                      [--llm-latency-ms 50] [--json out.json] [--compare baseline.json]
+"""
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+from PIL import Image
+
+from bench_utils import synthetic_jpeg, summarize, tiny_blip, start_fake_llm
+
+IMAGE_STAGES = ('decode_validate', 'preprocess_image', 'validate_image_quality', 'blip_generate', 'analyze_colors')
+TEXT_STAGES = ('analyze_sentiment', 'extract_keywords', 'extract_sections', 'llm_context', 'llm_seo')
+
+TEXTS = [
+    "a golden retriever running across a sunny park with a red ball in its mouth",
+    "a dimly lit kitchen with a broken window and dirty dishes piled in the sink",
+    "a modern stainless steel coffee maker with a glass carafe on a marble countertop",
+    "two children laughing while building a sandcastle on a crowded beach at sunset"
+]
+
+DESCRIPTION = """About:
+• Brewing system with a 12-cup glass carafe and programmable 24-hour timer
+• Stainless steel housing with a heat-resistant handle
+
+Technical:
+• Dimensions: 10 x 8 x 14 inches, weight 6.2 lbs
+• Power: 900 W, 120 V, auto shut-off after 2 hours
+
+Additional:
+• Includes a permanent filter and measuring scoop
+• Compatible with standard #4 cone filters"""
+
+def build_services(args):
+    """Import the services with caches off, the fake LLM running and the tiny BLIP model installed"""
+    import config.config as config
+    config.CAPTION_CACHE_ENABLED = False
+    config.LLM_CACHE_ENABLED = False
+    server = start_fake_llm(args.llm_latency_ms)
+
+    from app.services.image_service import image_processor
+    image_processor.models.processor, image_processor.models.model = tiny_blip()
+    return server, image_processor
+
+def image_stage(name, image_processor, args):
+    """(setup, run) pair for an image stage; setup(data) is not timed"""
+    from app.utils.upload_utils import ingest_bytes
+    from app.utils.file_utils import validate_image
+    from app.services.advanced_image_service import AdvancedImageProcessor
+
+    def decode_validate(data):
+        upload = ingest_bytes(data)
+        if validate_image(upload.stream) is None:
+            raise ValueError("Invalid image")
+        upload.open_image().load()
+
+    def loaded_processor(data):
+        processor = AdvancedImageProcessor(color_mode=args.color_mode)
+        processor.load_image(io.BytesIO(data))
+        return processor
+
+    tier = args.tier or image_processor.default_tier
+    return {
+        'decode_validate': (lambda data: data, decode_validate),
+        'preprocess_image': (lambda data: Image.open(io.BytesIO(data)), image_processor.preprocess_image),
+        'validate_image_quality': (lambda data: Image.open(io.BytesIO(data)), image_processor.validate_image_quality),
+        'blip_generate': (
+            lambda data: image_processor.preprocess_image(Image.open(io.BytesIO(data))),
+            lambda image: image_processor._generate_captions([(image, tier)])
+        ),
+        'analyze_colors': (loaded_processor, lambda processor: processor.analyze_colors())
+    }[name]
+
+def text_stage(name):
+    """(inputs, run) pair for a text stage; run raises if the service reports a failure"""
+    from app.services.text_service import analyze_sentiment, generate_context
+    from app.services.seo_service import extract_keywords, _extract_sections, generate_seo_description
+
+    def checked(result):
+        if isinstance(result, dict) and not result.get('success', True):
+            raise RuntimeError(result.get('error'))
+        return result
+
+    return {
+        'analyze_sentiment': (TEXTS, lambda text: checked(analyze_sentiment(text))),
+        'extract_keywords': (TEXTS + [DESCRIPTION], extract_keywords),
+        'extract_sections': ([DESCRIPTION], _extract_sections),
+        'llm_context': (TEXTS, lambda text: checked(generate_context(text, use_cache=False))),
+        'llm_seo': (TEXTS, lambda text: checked(generate_seo_description(text, text, use_cache=False)))
+    }[name]
+
+def time_stage(inputs, setup, run, repeat):
+    """
+    Time run(setup(x)) for every input, repeat times, after one untimed warmup call.
+    Returns:
+        tuple: (latencies in ms, first error or None)
+    """
+    latencies = []
+    try:
+        run(setup(inputs[0]))
+        for _ in range(repeat):
+            for item in inputs:
+                arg = setup(item)
+                started = time.perf_counter()
+                run(arg)
+                latencies.append((time.perf_counter() - started) * 1000.0)
+    except Exception as e:
+        return latencies, repr(e)
+    return latencies, None
+
+def environment(args):
+    import torch
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'args': vars(args),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+def print_results(rows, baseline=None):
+    baseline = {(row['stage'], row['megapixels']): row for row in (baseline or [])}
+    header = f"{'stage':>22} {'mp':>5} {'n':>4} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'vs_base':>8}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        if row['error']:
+            print(f"{row['stage']:>22} {str(row['megapixels'] or '-'):>5}  error: {row['error']}")
+            continue
+        base = baseline.get((row['stage'], row['megapixels']))
+        ratio = f"{row['p50_ms'] / base['p50_ms']:.2f}x" if base and base.get('p50_ms') else '-'
+        print(
+            f"{row['stage']:>22} {str(row['megapixels'] or '-'):>5} {row['n']:>4} {row['mean_ms']:>9.2f} "
+            f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {ratio:>8}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', default='0.5,2,8', help='Comma-separated image sizes in megapixels')
+    parser.add_argument('--images', type=int, default=3, help='Synthetic images per size')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the inputs of each stage')
+    parser.add_argument('--stages', default=','.join(IMAGE_STAGES + TEXT_STAGES), help='Comma-separated stages to run')
+    parser.add_argument('--tier', help='Caption tier for blip_generate (default: the configured default tier)')
+    parser.add_argument('--color-mode', help='Palette mode for analyze_colors (default: COLOR_ANALYSIS_MODE)')
+    parser.add_argument('--llm-latency-ms', type=float, default=50.0, help='Latency of the fake LLM server')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Earlier --json output to compare p50 latencies against')
+    args = parser.parse_args()
+
+    stages = [name for name in args.stages.split(',') if name]
+    unknown = set(stages) - set(IMAGE_STAGES + TEXT_STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    sizes = [float(mp) for mp in args.megapixels.split(',') if mp]
+
+    server, image_processor = build_services(args)
+    rows = []
+    try:
+        for megapixels in sizes:
+            corpus = [synthetic_jpeg(megapixels, seed=seed) for seed in range(args.images)]
+            for name in stages:
+                if name in IMAGE_STAGES:
+                    setup, run = image_stage(name, image_processor, args)
+                    latencies, error = time_stage(corpus, setup, run, args.repeat)
+                    rows.append(dict(stage=name, megapixels=megapixels, error=error, **summarize(latencies)))
+        for name in stages:
+            if name in TEXT_STAGES:
+                inputs, run = text_stage(name)
+                latencies, error = time_stage(inputs, lambda text: text, run, args.repeat)
+                rows.append(dict(stage=name, megapixels=None, error=error, **summarize(latencies)))
+    finally:
+        server.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_results(rows, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(args), 'results': rows}, f, indent=2)
+    return 1 if any(row['error'] for row in rows) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Time-to-first-audio and total time of text-to-speech strategies.
+
+A paragraph of alt text is synthesized as:
+
+    whole       one backend call for the whole text (the old route)
+    sequential  sentence chunks, one at a time
+    concurrent  sentence chunks, --concurrency at a time (the route's default)
+    cached      concurrent again with every chunk already in the cache
+
+The default 'fake' backend sleeps a fixed overhead plus a per-character time
+and returns silent WAV audio, so the run needs neither network nor espeak;
+--backend espeak or gtts time the real engines.
+
+Usage:
+    python benchmarks/bench_tts.py [--backend fake|espeak|gtts] [--sentences 6] [--chunk-chars 80] [--concurrency 4]
+                                   [--overhead-ms 150] [--per-char-ms 1] [--repeat 3] [--json out.json]
+"""
+import io
+import json
+import time
+import wave
+import argparse
+
+from bench_utils import summarize
+
+SENTENCES = [
+    "A golden retriever runs across a sunny park with a red ball in its mouth.",
+    "Behind it, two children sit on a wooden bench eating ice cream.",
+    "The grass is freshly cut and a row of oak trees lines the path.",
+    "A cyclist in a yellow jacket passes on the left side of the frame.",
+    "In the distance, a fountain sprays water over a small pond.",
+    "Soft afternoon light casts long shadows across the lawn."
+]
+
+def fake_backend(overhead_ms, per_char_ms):
+    """Backend with synthetic latency, built on the espeak backend's WAV streaming"""
+    from app.services.tts_service import EspeakBackend
+
+    class FakeBackend(EspeakBackend):
+        name = 'fake'
+
+        def synthesize(self, text, lang, voice=None):
+            time.sleep((overhead_ms + per_char_ms * len(text)) / 1000.0)
+            audio = io.BytesIO()
+            with wave.open(audio, 'wb') as writer:
+                writer.setnchannels(1)
+                writer.setsampwidth(2)
+                writer.setframerate(22050)
+                writer.writeframes(b'\x00\x00' * (22050 * len(text) // 15))  # About 15 characters per second
+            return audio.getvalue()
+
+    return FakeBackend()
+
+def time_stream(service, text):
+    """Milliseconds to the first piece and to the end of the stream, and the bytes streamed"""
+    started = time.perf_counter()
+    pieces = service.stream(text, 'en')
+    first_ms = None
+    size = 0
+    for piece in pieces:
+        if first_ms is None:
+            first_ms = (time.perf_counter() - started) * 1000.0
+        size += len(piece)
+    return first_ms, (time.perf_counter() - started) * 1000.0, size
+
+def run(args):
+    from app.services.tts_service import TTSService, get_backend
+    from app.utils.cache_utils import LRUCache, TieredCache
+
+    backend = fake_backend(args.overhead_ms, args.per_char_ms) if args.backend == 'fake' else get_backend(args.backend)
+    text = ' '.join((SENTENCES * (args.sentences // len(SENTENCES) + 1))[:args.sentences])
+    strategies = {
+        'whole': TTSService(backend, None, chunk_chars=len(text), max_concurrency=1),
+        'sequential': TTSService(backend, None, chunk_chars=args.chunk_chars, max_concurrency=1),
+        'concurrent': TTSService(backend, None, chunk_chars=args.chunk_chars, max_concurrency=args.concurrency)
+    }
+    cached = TTSService(backend, TieredCache(LRUCache(1024)), args.chunk_chars, args.concurrency)
+    time_stream(cached, text)
+    strategies['cached'] = cached
+
+    results = []
+    for name, service in strategies.items():
+        runs = [time_stream(service, text) for _ in range(args.repeat)]
+        results.append({
+            'strategy': name,
+            'first_audio': summarize([first_ms for first_ms, _, _ in runs]),
+            'total': summarize([total_ms for _, total_ms, _ in runs]),
+            'bytes': runs[-1][2]
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', default='fake', help='fake, espeak or gtts')
+    parser.add_argument('--sentences', type=int, default=6, help='Sentences in the spoken text')
+    parser.add_argument('--chunk-chars', type=int, default=80, help='Target chunk length')
+    parser.add_argument('--concurrency', type=int, default=4, help='Chunks synthesized at the same time')
+    parser.add_argument('--overhead-ms', type=float, default=150.0, help='Fake backend: fixed time per call')
+    parser.add_argument('--per-char-ms', type=float, default=1.0, help='Fake backend: time per character')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per strategy')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(args)
+
+    header = f"{'strategy':>11} {'first p50 ms':>13} {'total p50 ms':>13} {'bytes':>10}"
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        print(f"{row['strategy']:>11} {row['first_audio']['p50_ms']:>13.1f} {row['total']['p50_ms']:>13.1f} {row['bytes']:>10}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Helpers shared by the benchmark scripts"""
+import io
+import os
+import sys
+import resource
+import multiprocessing
+import numpy as np
+from PIL import Image
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+def synthetic_photo(megapixels, seed=0):
+    """Smooth photo-like test image with sensor noise, 4:3"""
+    rng = np.random.default_rng(seed)
+    width = int(np.sqrt(megapixels * 1e6 * 4 / 3))
+    height = int(width * 3 / 4)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    phase = seed * 0.7
+    image = np.stack([
+        128 + 100 * np.sin(x / 90.0 + phase) * np.cos(y / 130.0),
+        100 + 80 * np.cos((x + y) / 170.0 + phase),
+        90 + 60 * np.sin(y / 60.0 - phase)
+    ], axis=2)
+    image += rng.normal(0, 8, size=image.shape).astype(np.float32)
+    return Image.fromarray(np.clip(image, 0, 255).astype(np.uint8), 'RGB')
+
+def synthetic_jpeg(megapixels, seed=0, quality=90):
+    """JPEG bytes of synthetic_photo"""
+    buffer = io.BytesIO()
+    synthetic_photo(megapixels, seed).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+def sample_photos():
+    """Real photos bundled with scikit-learn, if it is installed"""
+    try:
+        from sklearn.datasets import load_sample_images
+    except ImportError:
+        return []
+    return [Image.open(path).convert('RGB') for path in load_sample_images().filenames]
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def current_rss_mb():
+    """Current resident set size of this process, in MB (Linux; falls back to the peak elsewhere)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        return peak_rss_mb()
+
+def _child(queue, fn, args):
+    try:
+        queue.put(('ok', fn(*args)))
+    except Exception as e:
+        queue.put(('error', repr(e)))
+
+def run_isolated(fn, *args):
+    """
+    Run fn(*args) in a fresh process so memory and thread settings do not leak between runs.
+    fn must be a module-level function; its return value must be picklable.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_child, args=(queue, fn, args))
+    process.start()
+    status, value = queue.get()
+    process.join()
+    if status == 'error':
+        raise RuntimeError(value)
+    return value
+
+def summarize(latencies):
+    """Count, mean, min, p50 and p95 of a list of latencies in ms"""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {'n': 0, 'mean_ms': None, 'min_ms': None, 'p50_ms': None, 'p95_ms': None}
+    return {
+        'n': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered),
+        'min_ms': ordered[0],
+        'p50_ms': ordered[len(ordered) // 2],
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    }
+
+class TinyBlipProcessor:
+    """Stand-in for BlipProcessor: the real image transform, token ids decoded as placeholder words"""
+
+    def __init__(self, image_size=64):
+        from transformers import BlipImageProcessor
+        self.image_processor = BlipImageProcessor(size={'height': image_size, 'width': image_size})
+
+    def __call__(self, images, return_tensors='pt'):
+        return self.image_processor(images=images, return_tensors=return_tensors)
+
+    def decode(self, tokens, skip_special_tokens=True):
+        return ' '.join(f"w{int(token)}" for token in tokens if int(token) > 2)
+
+def tiny_blip(seed=0, image_size=64):
+    """
+    Randomly initialized two-layer BLIP captioner and matching processor.
+    Runs the real generate() code path in milliseconds without downloading weights;
+    the captions are meaningless.
+    Returns:
+        tuple: (TinyBlipProcessor, BlipForConditionalGeneration)
+    """
+    import torch
+    from transformers import BlipConfig, BlipForConditionalGeneration
+
+    config = BlipConfig(
+        vision_config={
+            'hidden_size': 32, 'intermediate_size': 64, 'num_hidden_layers': 2, 'num_attention_heads': 2,
+            'image_size': image_size, 'patch_size': 16
+        },
+        text_config={
+            'vocab_size': 1000, 'hidden_size': 32, 'intermediate_size': 64, 'num_hidden_layers': 2,
+            'num_attention_heads': 2, 'encoder_hidden_size': 32, 'max_position_embeddings': 128,
+            'bos_token_id': 1, 'sep_token_id': 2, 'eos_token_id': 2, 'pad_token_id': 0
+        }
+    )
+    torch.manual_seed(seed)
+    return TinyBlipProcessor(image_size), BlipForConditionalGeneration(config).eval()
+
+def start_fake_llm(latency_ms=50.0, fail_rate=0.0):
+    """
+    Start a local fake OpenAI server and point the app's LLM client at it.
+    Must be called before the app's LLM services are imported.
+    Returns:
+        FakeOpenAIServer: The running server; call stop() when done
+    """
+    from fake_openai_server import FakeOpenAIServer
+    import config.config as config
+
+    server = FakeOpenAIServer(latency_ms=latency_ms, fail_rate=fail_rate).start()
+    config.LLM_BASE_URL = server.base_url
+    config.OPENAI_API_KEY = config.OPENAI_API_KEY or 'fake-key'
+    return server
@@ -0,0 +1,130 @@
+"""
+Local HTTP server of synthetic images.
+
+    GET /images/<name>.jpg?mp=0.5   synthetic JPEG (the name seeds the image),
+                                    with an ETag and Last-Modified; conditional
+                                    requests get a 304
+
+Used to exercise the image URL fetcher (pooling, size caps, timeouts and
+revalidation) without the network.
+
+Usage:
+    python benchmarks/fake_image_server.py [--port 8766] [--latency-ms 50]
+"""
+import os
+import time
+import zlib
+import argparse
+import threading
+from email.utils import formatdate
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench_utils import synthetic_jpeg
+
+# Fixed, so validators stay the same across restarts
+LAST_MODIFIED = formatdate(1700000000, usegmt=True)
+
+class FakeImageServer:
+    """Threaded fake server; usable from scripts via start()/stop()"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0.0):
+        """
+        Args:
+            host (str): Interface to bind
+            port (int): Port to bind; 0 picks a free one
+            latency_ms (float): Delay before each response
+        """
+        self.latency_ms = latency_ms
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0, 'bytes_sent': 0}
+        self._images = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def image(self, name, megapixels):
+        """JPEG bytes and ETag of a named image, generated once"""
+        key = (name, megapixels)
+        with self.lock:
+            if key not in self._images:
+                data = synthetic_jpeg(megapixels, seed=zlib.crc32(name.encode('utf-8')) % 1000)
+                self._images[key] = (data, f'"{zlib.crc32(data):08x}"')
+            return self._images[key]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.stats['bytes_sent'] += len(body)
+
+            def do_GET(self):
+                with server.lock:
+                    server.stats['requests'] += 1
+                time.sleep(server.latency_ms / 1000.0)
+                parts = urlsplit(self.path)
+                if parts.path.startswith('/images/'):
+                    self._image(parts)
+                else:
+                    self._send(404, b'Not found')
+
+            def _image(self, parts):
+                megapixels = float(parse_qs(parts.query).get('mp', ['0.3'])[0])
+                data, etag = server.image(os.path.basename(parts.path), megapixels)
+                headers = {'ETag': etag, 'Last-Modified': LAST_MODIFIED}
+                if self.headers.get('If-None-Match') == etag or self.headers.get('If-Modified-Since') == LAST_MODIFIED:
+                    with server.lock:
+                        server.stats['not_modified'] += 1
+                    self._send(304, headers=headers)
+                    return
+                self._send(200, data, dict(headers, **{'Content-Type': 'image/jpeg'}))
+
+        return Handler
+
+    def start(self):
+        """Serve in a background thread; returns self"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Response delay per request')
+    args = parser.parse_args()
+
+    server = FakeImageServer(args.host, args.port, args.latency_ms)
+    print(f"Fake image server on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Local fake of the OpenAI chat completions API.
+
+Serves POST /v1/chat/completions (plain and stream=True) with a fixed
+latency and injectable failures, so the LLM client's pooling, retries,
+timeouts and concurrency cap can be exercised without the real API.
+Point the app at it with LLM_BASE_URL=http://127.0.0.1:8765/v1.
+
+Usage:
+    python benchmarks/fake_openai_server.py [--port 8765] [--latency-ms 200] [--fail-rate 0.1] [--fail-status 429]
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeOpenAIServer:
+    """Threaded fake server; usable from scripts via start()/stop()"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=50.0, fail_rate=0.0, fail_status=429,
+                 tokens=('A', ' generated', ' description', ' of', ' the', ' image.'), seed=0):
+        """
+        Args:
+            host (str): Interface to bind
+            port (int): Port to bind; 0 picks a free one
+            latency_ms (float): Delay before the response (spread over the chunks when streaming)
+            fail_rate (float): Fraction of requests answered with fail_status
+            fail_status (int): HTTP status of injected failures
+            tokens (tuple): Pieces of the generated reply
+            seed (int): Seed of the failure injection
+        """
+        self.latency_ms = latency_ms
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.tokens = tokens
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'failures': 0, 'in_flight': 0, 'max_in_flight': 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _should_fail(self):
+        with self.lock:
+            return self.random.random() < self.fail_rate
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are separate writes; without this, Nagle adds ~40 ms per response
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if self.path.rstrip('/') != '/v1/chat/completions':
+                    self._send_json(404, {'error': {'message': f"Unknown path {self.path}"}})
+                    return
+                with server.lock:
+                    server.stats['requests'] += 1
+                    server.stats['in_flight'] += 1
+                    server.stats['max_in_flight'] = max(server.stats['max_in_flight'], server.stats['in_flight'])
+                try:
+                    if server._should_fail():
+                        with server.lock:
+                            server.stats['failures'] += 1
+                        headers = {'Retry-After': '0'} if server.fail_status == 429 else None
+                        self._send_json(server.fail_status, {'error': {'message': 'Injected failure'}}, headers)
+                    elif request.get('stream'):
+                        self._stream(request)
+                    else:
+                        time.sleep(server.latency_ms / 1000.0)
+                        self._send_json(200, {
+                            'object': 'chat.completion',
+                            'model': request.get('model'),
+                            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(server.tokens)},
+                                         'finish_reason': 'stop'}],
+                            'usage': self._usage(request)
+                        })
+                finally:
+                    with server.lock:
+                        server.stats['in_flight'] -= 1
+
+            def _usage(self, request):
+                # Word counts stand in for a tokenizer
+                prompt_tokens = sum(len(str(message.get('content', '')).split()) for message in request.get('messages', []))
+                return {'prompt_tokens': prompt_tokens, 'completion_tokens': len(server.tokens),
+                        'total_tokens': prompt_tokens + len(server.tokens)}
+
+            def _stream(self, request):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                delay = server.latency_ms / 1000.0 / max(1, len(server.tokens))
+                for token in server.tokens:
+                    time.sleep(delay)
+                    chunk = {'object': 'chat.completion.chunk', 'model': request.get('model'),
+                             'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
+
+    def start(self):
+        """Serve in a background thread; returns self"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='Response delay per request')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--fail-status', type=int, default=429, help='HTTP status of injected failures')
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency_ms, args.fail_rate, args.fail_status)
+    print(f"Fake OpenAI API on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == '__main__':
+    main()
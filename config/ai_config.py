@@ -1,17 +1,6 @@
 """
 Centralized configuration for AI services
 """
-import openai
-from config.config import OPENAI_API_KEY
-
-def configure_ai():
-    """Configure AI services with appropriate API keys and settings"""
-    openai.api_key = OPENAI_API_KEY
-
-def get_openai_client():
-    """Get configured OpenAI client"""
-    configure_ai()
-    return openai
 
 # Standard model configurations
 GPT_CONFIG = {
@@ -9,10 +9,122 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
     
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB max request size by default
 
 # OpenAI Config
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
 # Model Config
-BLIP_MODEL = "Salesforce/blip-image-captioning-base" 
\ No newline at end of file
+BLIP_MODEL = "Salesforce/blip-image-captioning-base"
+BLIP_BACKEND = os.environ.get('BLIP_BACKEND', 'eager')  # eager (fp32), int8 (dynamic quantization) or traced (TorchScript vision encoder)
+BLIP_NUM_THREADS = int(os.environ.get('BLIP_NUM_THREADS', 0))  # torch intra-op threads; 0 uses one per core
+BLIP_ARTIFACT_DIR = os.environ.get('BLIP_ARTIFACT_DIR', os.path.join(os.environ.get('CACHE_DIR', 'cache'), 'blip'))  # Converted models
+
+# Preprocessing Config
+PREPROCESS_MODE = os.environ.get('PREPROCESS_MODE', 'reduced')  # 'reduced' decodes near model input size, 'full' keeps every pixel
+PREPROCESS_TARGET_SIZE = int(os.environ.get('PREPROCESS_TARGET_SIZE', 768))  # Shorter side kept by 'reduced' (2x BLIP's 384 input)
+
+# Caption Batching Config
+CAPTION_BATCH_SIZE = int(os.environ.get('CAPTION_BATCH_SIZE', 8))  # Max images per generate call
+CAPTION_BATCH_WAIT_MS = float(os.environ.get('CAPTION_BATCH_WAIT_MS', 20))  # Max time to wait for a batch to fill
+
+# Caption Tier Config
+CAPTION_DEFAULT_TIER = os.environ.get('CAPTION_DEFAULT_TIER', 'balanced')  # fast, balanced or quality; routes may pick their own
+
+# Caption Cache Config
+CACHE_DIR = os.environ.get('CACHE_DIR', 'cache')
+CAPTION_CACHE_ENABLED = os.environ.get('CAPTION_CACHE_ENABLED', '1') == '1'
+CAPTION_CACHE_MEMORY_ENTRIES = int(os.environ.get('CAPTION_CACHE_MEMORY_ENTRIES', 1024))
+CAPTION_CACHE_MAX_BYTES = int(os.environ.get('CAPTION_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # Disk tier size cap
+
+# LLM Response Cache Config
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', '1') == '1'
+LLM_CACHE_TTL = float(os.environ.get('LLM_CACHE_TTL', 7 * 24 * 3600))  # Seconds before a cached response expires
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get('LLM_CACHE_MEMORY_ENTRIES', 2048))
+LLM_CACHE_MAX_BYTES = int(os.environ.get('LLM_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# LLM HTTP Client Config
+LLM_BASE_URL = os.environ.get('LLM_BASE_URL', 'https://api.openai.com/v1')  # Any OpenAI-compatible server
+LLM_REQUEST_TIMEOUT = float(os.environ.get('LLM_REQUEST_TIMEOUT', 30))  # Seconds per HTTP attempt
+LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 3))  # Retries on 429, 5xx and connection errors
+LLM_BACKOFF_BASE = float(os.environ.get('LLM_BACKOFF_BASE', 0.5))  # Seconds, doubled per retry, fully jittered
+LLM_BACKOFF_MAX = float(os.environ.get('LLM_BACKOFF_MAX', 8))
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))  # In-flight LLM requests per process
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 16))  # Pooled HTTP connections
+
+# Metrics Config
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'  # Request instrumentation and the /metrics endpoint
+
+# LLM Provider Routing Config
+# Purpose -> provider (openai or local), e.g. "context=local,enhance_context=local"; unlisted purposes use openai
+LLM_PROVIDER_ROUTES = dict(
+    route.strip().split('=', 1) for route in os.environ.get('LLM_PROVIDER_ROUTES', '').split(',') if '=' in route
+)
+LLM_LOCAL_MODEL = os.environ.get('LLM_LOCAL_MODEL', 'google/flan-t5-base')  # Seq2seq model for the local provider
+LLM_LOCAL_MAX_INPUT_TOKENS = int(os.environ.get('LLM_LOCAL_MAX_INPUT_TOKENS', 512))
+
+# Shared Executor Config
+EXECUTOR_MAX_WORKERS = int(os.environ.get('EXECUTOR_MAX_WORKERS', 16))
+LLM_CALL_TIMEOUT = float(os.environ.get('LLM_CALL_TIMEOUT', 60))  # Seconds per concurrent LLM call
+
+# Bulk Analysis Config
+BULK_CONCURRENCY = int(os.environ.get('BULK_CONCURRENCY', 4))  # Images analyzed at the same time per request
+BULK_MAX_FILES = int(os.environ.get('BULK_MAX_FILES', 1000))
+BULK_MAX_IMAGE_BYTES = int(os.environ.get('BULK_MAX_IMAGE_BYTES', 16 * 1024 * 1024))  # Per image, also caps zip members
+
+# Async Job Config
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', os.path.join('data', 'jobs.sqlite3'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # Local worker pool size
+JOB_MAX_QUEUED = int(os.environ.get('JOB_MAX_QUEUED', 100))  # Submissions are rejected above this
+JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 24 * 3600))  # Seconds finished results are kept
+JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', 3600))  # Running jobs older than this are requeued at startup
+JOB_MAX_WAIT = float(os.environ.get('JOB_MAX_WAIT', 30))  # Longest allowed long-poll, in seconds
+
+# BLIP Model Lifecycle Config
+BLIP_WARMUP_ON_START = os.environ.get('BLIP_WARMUP_ON_START', '0') == '1'  # Load the model when the app starts
+BLIP_WARMUP_INFERENCE = os.environ.get('BLIP_WARMUP_INFERENCE', '1') == '1'  # Run a synthetic caption after loading
+BLIP_IDLE_UNLOAD_SECONDS = float(os.environ.get('BLIP_IDLE_UNLOAD_SECONDS', 0))  # 0 keeps the model loaded
+
+# Color Analysis Config
+COLOR_ANALYSIS_MODE = os.environ.get('COLOR_ANALYSIS_MODE', 'sampled')  # kmeans, sampled, median_cut or histogram
+
+# Upload Ingestion Config
+UPLOAD_SPOOL_MAX_MEMORY = int(os.environ.get('UPLOAD_SPOOL_MAX_MEMORY', 8 * 1024 * 1024))  # Larger uploads spill to a temp file
+
+# Profiling Config
+PROFILE_TOKENS = tuple(
+    token.strip() for token in os.environ.get('PROFILE_TOKENS', '').split(',') if token.strip()
+)  # Callers sending one of these in X-Profile (or ?profile=) get their request profiled
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # Share of other requests profiled at random
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))  # Stack sampling interval
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(CACHE_DIR, 'profiles'))
+PROFILE_MAX_STORED = int(os.environ.get('PROFILE_MAX_STORED', 200))  # Oldest profiles are deleted above this
+
+# Text-to-Speech Config
+TTS_BACKEND = os.environ.get('TTS_BACKEND', 'gtts')  # gtts (network) or espeak (local, offline)
+TTS_ESPEAK_BINARY = os.environ.get('TTS_ESPEAK_BINARY', 'espeak-ng')
+TTS_CHUNK_CHARS = int(os.environ.get('TTS_CHUNK_CHARS', 200))  # Sentences are grouped into chunks of about this length
+TTS_MAX_CONCURRENCY = int(os.environ.get('TTS_MAX_CONCURRENCY', 4))  # Chunks synthesized at the same time per request
+TTS_CACHE_ENABLED = os.environ.get('TTS_CACHE_ENABLED', '1') == '1'
+TTS_CACHE_MEMORY_ENTRIES = int(os.environ.get('TTS_CACHE_MEMORY_ENTRIES', 256))
+TTS_CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MAX_BYTES', 128 * 1024 * 1024))  # Disk tier size cap
+
+# Image URL Fetch Config
+IMAGE_FETCH_TIMEOUT = float(os.environ.get('IMAGE_FETCH_TIMEOUT', 20))  # Seconds for a whole download, body included
+IMAGE_FETCH_CONNECT_TIMEOUT = float(os.environ.get('IMAGE_FETCH_CONNECT_TIMEOUT', 5))
+IMAGE_FETCH_MAX_BYTES = int(os.environ.get('IMAGE_FETCH_MAX_BYTES', MAX_CONTENT_LENGTH))  # Larger images are rejected mid-stream
+IMAGE_FETCH_MAX_CONNECTIONS = int(os.environ.get('IMAGE_FETCH_MAX_CONNECTIONS', 20))
+IMAGE_FETCH_MAX_REDIRECTS = int(os.environ.get('IMAGE_FETCH_MAX_REDIRECTS', 5))
+IMAGE_FETCH_CACHE_ENABLED = os.environ.get('IMAGE_FETCH_CACHE_ENABLED', '1') == '1'  # Revalidate cached URLs with ETag/Last-Modified
+IMAGE_FETCH_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_FETCH_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+IMAGE_FETCH_CACHE_MAX_BODY = int(os.environ.get('IMAGE_FETCH_CACHE_MAX_BODY', 2 * 1024 * 1024))  # Larger images are fetched again instead of cached
+IMAGE_FETCH_ALLOW_PRIVATE = os.environ.get('IMAGE_FETCH_ALLOW_PRIVATE', '0') == '1'  # Allow private, loopback and link-local hosts (local testing only)
+
+# Accessibility Audit Config
+AUDIT_CONCURRENCY = int(os.environ.get('AUDIT_CONCURRENCY', 8))  # Images fetched and captioned at a time per audit
+AUDIT_MAX_IMAGES = int(os.environ.get('AUDIT_MAX_IMAGES', 2000))  # Distinct images captioned per audit
+
+# DICOM Config
+DICOM_MAX_FRAMES = int(os.environ.get('DICOM_MAX_FRAMES', 8))  # Frames sampled per multi-frame file when caption_frames is requested
+DICOM_FRAME_CONCURRENCY = int(os.environ.get('DICOM_FRAME_CONCURRENCY', 4))  # Sampled frames held and captioned at a time
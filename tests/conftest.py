@@ -0,0 +1,15 @@
+"""
+Shared test setup.
+
+Caches and the job store are created when their modules are imported, so
+they are pointed at a temporary directory before any app module loads.
+"""
+import os
+import sys
+import tempfile
+
+_data_dir = tempfile.mkdtemp(prefix='image-analysis-tests-')
+os.environ.setdefault('CACHE_DIR', os.path.join(_data_dir, 'cache'))
+os.environ.setdefault('JOB_STORE_PATH', os.path.join(_data_dir, 'jobs.sqlite3'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,45 @@
+from app.services.audit_service import find_images_missing_alt, patch_html, _with_alt
+
+PAGE = (
+    '<html><body>\n'
+    '<img src="a.jpg">\n'
+    '<IMG SRC="b.png" alt="" class="hero"/>\n'
+    '<img src="c.gif" alt="Already described">\n'
+    '<img src="d.jpg" role="presentation">\n'
+    '<p title="alt">text</p><img src=\'a.jpg\' title="alt" alt>\n'
+    '</body></html>\n'
+)
+
+def test_only_images_lacking_alt_text_are_found():
+    tags, base_href = find_images_missing_alt(PAGE)
+
+    assert [tag['src'] for tag in tags] == ['a.jpg', 'b.png', 'a.jpg']
+    assert [tag['has_alt'] for tag in tags] == [False, True, True]
+    assert all(PAGE[tag['start']:tag['end']] == tag['text'] for tag in tags)
+    assert base_href is None
+
+def test_patch_rewrites_only_the_img_tags():
+    tags, _ = find_images_missing_alt(PAGE)
+    patched = patch_html(PAGE, tags, {'a.jpg': 'A "red" car', 'b.png': 'A beach'})
+
+    assert patched == (
+        '<html><body>\n'
+        '<img src="a.jpg" alt="A &quot;red&quot; car">\n'
+        '<IMG SRC="b.png" alt="A beach" class="hero"/>\n'
+        '<img src="c.gif" alt="Already described">\n'
+        '<img src="d.jpg" role="presentation">\n'
+        '<p title="alt">text</p><img src=\'a.jpg\' title="alt" alt="A &quot;red&quot; car">\n'
+        '</body></html>\n'
+    )
+
+def test_images_without_a_caption_are_left_alone():
+    tags, _ = find_images_missing_alt(PAGE)
+    assert patch_html(PAGE, tags, {}) == PAGE
+    assert patch_html(PAGE, tags, {'b.png': 'A beach'}).count('alt="A beach"') == 1
+
+def test_with_alt_adds_or_replaces_the_attribute():
+    assert _with_alt('<img src="x.jpg">', 'A dog', False) == '<img src="x.jpg" alt="A dog">'
+    assert _with_alt('<img src="x.jpg" />', 'A dog', False) == '<img src="x.jpg" alt="A dog"/>'
+    assert _with_alt("<img alt='' src=x.jpg>", 'A dog', True) == '<img alt="A dog" src=x.jpg>'
+    assert _with_alt('<img data-alt="alt" ALT src="x.jpg">', 'A dog', True) == '<img data-alt="alt" alt="A dog" src="x.jpg">'
+    assert _with_alt('<img src="x.jpg">', '<b>&', False) == '<img src="x.jpg" alt="&lt;b&gt;&amp;">'
@@ -0,0 +1,93 @@
+import pytest
+from app.utils import cache_utils
+from app.utils.cache_utils import LRUCache, SQLiteCache, TieredCache, make_cache_key
+
+class FakeClock:
+    """Stands in for time.time() so TTL expiry needs no sleeping"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_utils.time, 'time', clock)
+    return clock
+
+def test_cache_keys_are_stable_and_order_sensitive():
+    assert make_cache_key('a', {'x': 1, 'y': 2}) == make_cache_key('a', {'y': 2, 'x': 1})
+    assert make_cache_key('a', 'b') != make_cache_key('b', 'a')
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the least recently used
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.get_stats()['evictions'] == 1
+
+def test_lru_expires_entries_after_ttl(clock):
+    cache = LRUCache(max_entries=10, ttl=60)
+    cache.set('a', 1)
+    clock.now += 59
+    assert cache.get('a') == 1
+    clock.now += 2
+    assert cache.get('a') is None
+    assert cache.get_stats()['expirations'] == 1
+
+def test_sqlite_evicts_by_size_and_access_time(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'), max_bytes=25)
+    cache.set('a', b'x' * 10)
+    clock.now += 1
+    cache.set('b', b'y' * 10)
+    clock.now += 1
+    assert cache.get('a') == b'x' * 10  # Refreshes 'a', so 'b' goes first
+    clock.now += 1
+    cache.set('c', b'z' * 10)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'x' * 10 and cache.get('c') == b'z' * 10
+    assert cache.get_stats()['bytes'] == 20
+    cache.set('huge', b'!' * 26)  # Larger than the whole cache: not stored
+    assert cache.get('huge') is None
+
+def test_sqlite_expires_entries_and_survives_reopening(tmp_path, clock):
+    path = str(tmp_path / 'cache.sqlite3')
+    SQLiteCache(path, ttl=60).set('a', {'alt_text': 'a cat'})
+    cache = SQLiteCache(path, ttl=60)
+    assert cache.get('a') == {'alt_text': 'a cat'}
+    clock.now += 61
+    assert cache.get('a') is None
+    assert cache.get_stats()['entries'] == 0
+
+def test_tiered_cache_promotes_disk_hits_to_memory(tmp_path):
+    disk = SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+    disk.set('a', {'value': 1})
+    cache = TieredCache(LRUCache(max_entries=10), disk)
+
+    assert cache.memory.get('a') is None
+    assert cache.get('a') == {'value': 1}
+    assert cache.memory.get('a') == {'value': 1}
+    disk.clear()
+    assert cache.get('a') == {'value': 1}  # Now served from memory
+    assert cache.get('missing') is None
+
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+
+def test_tiered_cache_writes_through_to_disk(tmp_path):
+    disk = SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+    cache = TieredCache(LRUCache(max_entries=1), disk)
+    cache.set('a', 1)
+    cache.set('b', 2)  # Evicts 'a' from memory only
+
+    assert cache.memory.get('a') is None
+    assert cache.get('a') == 1
+    cache.clear()
+    assert cache.get('a') is None and cache.get('b') is None
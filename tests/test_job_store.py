@@ -0,0 +1,50 @@
+import json
+from app.services.job_service import JobStore, QUEUED, RUNNING, SUCCEEDED
+
+def _store_with_job(tmp_path, job_id='job-1'):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    store.create(job_id, 'advanced', 'a.jpg', b'payload', {'caption_tier': 'fast'})
+    return store
+
+def test_claim_moves_a_queued_job_to_running(tmp_path):
+    store = _store_with_job(tmp_path)
+    job_type, filename, payload, options = store.claim('job-1')
+
+    assert (job_type, filename, bytes(payload)) == ('advanced', 'a.jpg', b'payload')
+    assert json.loads(options) == {'caption_tier': 'fast'}
+    job = store.get('job-1')
+    assert job['status'] == RUNNING and job['started_at'] is not None
+    assert store.queued_ids() == []
+
+def test_a_job_is_claimed_once_across_processes(tmp_path):
+    store = _store_with_job(tmp_path)
+    other = JobStore(store.path)  # Another process's connection to the same file
+
+    assert other.claim('job-1') is not None
+    assert store.claim('job-1') is None
+    assert other.claim('job-1') is None
+    assert store.claim('no-such-job') is None
+
+def test_finished_jobs_cannot_be_claimed(tmp_path):
+    store = _store_with_job(tmp_path)
+    store.claim('job-1')
+    store.finish('job-1', SUCCEEDED, result={'success': True}, http_status=200, ttl=60)
+
+    assert store.claim('job-1') is None
+    assert store.requeue_stale(0) == 0
+    assert store.get('job-1')['result'] == {'success': True}
+
+def test_requeue_stale_only_requeues_old_running_jobs(tmp_path):
+    store = _store_with_job(tmp_path)
+    store.create('job-2', 'medical', 'b.dcm', b'payload')
+    store.claim('job-1')
+
+    assert store.requeue_stale(3600) == 0
+    assert store.get('job-1')['status'] == RUNNING
+
+    assert store.requeue_stale(0) == 1
+    job = store.get('job-1')
+    assert job['status'] == QUEUED and job['started_at'] is None
+    assert store.queued_ids() == ['job-1', 'job-2']
+    assert store.claim('job-1') is not None
+    assert store.count_active() == 2
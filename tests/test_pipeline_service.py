@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import Future
+import pytest
+from app.services import pipeline_service
+from app.services.pipeline_service import Pipeline, Stage, current_stage
+
+def _recorder(log, name, value=None, error=None):
+    """Stage function that logs its name (and the current stage) before returning or raising"""
+    def fn(results):
+        log.append((name, current_stage.get()))
+        if error is not None:
+            raise error
+        return value if value is not None else name
+    return fn
+
+def test_stages_run_after_their_dependencies():
+    log = []
+    pipeline = Pipeline([
+        Stage('c', _recorder(log, 'c'), ['a', 'b']),
+        Stage('a', _recorder(log, 'a'), ['x']),
+        Stage('b', _recorder(log, 'b'), ['a']),
+        Stage('d', lambda results: results['c'] + results['x'], ['c'])
+    ], inputs=['x'])
+    run = pipeline.run(x='!')
+
+    order = [name for name, _ in log]
+    assert order.index('a') < order.index('b') < order.index('c')
+    assert run.results == {'a': 'a', 'b': 'b', 'c': 'c', 'd': 'c!'}
+    assert run.errors == {}
+    assert set(run.timings_ms) == {'a', 'b', 'c', 'd'}
+    # Each stage sees its own name in the context variable
+    assert all(name == stage for name, stage in log)
+
+def test_failure_skips_dependents_only():
+    log = []
+    pipeline = Pipeline([
+        Stage('broken', _recorder(log, 'broken', error=RuntimeError('boom'))),
+        Stage('child', _recorder(log, 'child'), ['broken']),
+        Stage('grandchild', _recorder(log, 'grandchild'), ['child']),
+        Stage('unrelated', _recorder(log, 'unrelated'))
+    ])
+    events = []
+    run = pipeline.execute({}, listener=lambda name, value, error, elapsed_ms: events.append((name, error)))
+
+    assert [name for name, _ in log if name != 'unrelated'] == ['broken']
+    assert run.ok('unrelated') and not run.ok('broken')
+    assert str(run.errors['broken']) == 'boom'
+    assert 'broken failed' in str(run.errors['child'])
+    assert 'child failed' in str(run.errors['grandchild'])
+    assert {name for name, error in events if error is not None} == {'broken', 'child', 'grandchild'}
+
+def test_unstarted_stages_run_in_the_calling_thread(monkeypatch):
+    # Futures no worker ever picks up: the coordinator must cancel and run them itself
+    monkeypatch.setattr(pipeline_service, 'submit', lambda fn, *args, **kwargs: Future())
+    threads = []
+    pipeline = Pipeline([
+        Stage('a', lambda results: threads.append(threading.current_thread()) or 1),
+        Stage('b', lambda results: threads.append(threading.current_thread()) or results['a'] + 1, ['a'])
+    ])
+    run = pipeline.run()
+
+    assert run.results == {'a': 1, 'b': 2}
+    assert threads == [threading.current_thread()] * 2
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match='unknown'):
+        Pipeline([Stage('a', len, ['missing'])])
+    with pytest.raises(ValueError, match='cycle'):
+        Pipeline([Stage('a', len, ['b']), Stage('b', len, ['a'])])
+    with pytest.raises(ValueError, match='unique'):
+        Pipeline([Stage('a', len), Stage('a', len)])
+    with pytest.raises(ValueError, match='Missing'):
+        Pipeline([Stage('a', len, ['x'])], inputs=['x']).run()
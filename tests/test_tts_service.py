@@ -0,0 +1,24 @@
+from app.services.tts_service import split_sentences
+
+def test_short_sentences_are_packed_into_chunks():
+    text = 'One. Two! Three? Four; five: six.'
+    assert split_sentences(text, max_chars=12) == ['One. Two!', 'Three? Four;', 'five: six.']
+    assert split_sentences(text, max_chars=200) == [text]
+
+def test_whitespace_is_normalized():
+    assert split_sentences('  A  cat.\n\nA   dog.\t', max_chars=200) == ['A cat. A dog.']
+    assert split_sentences('   ') == []
+    assert split_sentences('') == []
+
+def test_long_sentences_are_split_between_words():
+    text = 'the quick brown fox jumps over the lazy dog'
+    chunks = split_sentences(text, max_chars=15)
+
+    assert all(len(chunk) <= 15 for chunk in chunks)
+    assert ' '.join(chunks) == text
+    assert chunks[0] == 'the quick brown'
+
+def test_words_longer_than_a_chunk_are_cut():
+    chunks = split_sentences('a ' + 'x' * 25, max_chars=10)
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert ''.join(chunks).replace(' ', '') == 'a' + 'x' * 25